@@ -0,0 +1,97 @@
+"""Mission Control activity feed.
+
+Events are appended to ``activity_events`` in the same transaction as the
+write they describe, with agent and buyer names copied in, so the feed is a
+single range scan over ``(owner_id, created_at)``.
+"""
+
+import logging
+from datetime import timedelta
+
+from sqlmodel import Session, func, select
+
+from .models import (
+    ActivityEvent,
+    AgentLicense,
+    AgentPost,
+    AgentProfile,
+    Task,
+    User,
+    _utcnow,
+)
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_DAYS = 30
+
+
+def _event(agent: AgentProfile, event_type: str, description: str, subject_id, at=None) -> ActivityEvent:
+    return ActivityEvent(
+        owner_id=agent.owner_id,
+        agent_profile_id=agent.id,
+        agent_name=agent.name,
+        event_type=event_type,
+        description=description,
+        subject_id=subject_id,
+        created_at=at or _utcnow(),
+    )
+
+
+def task_started(agent: AgentProfile, task: Task) -> ActivityEvent:
+    return _event(agent, "task_started", f"New task: {task.title}", task.id, task.created_at)
+
+
+def task_completed(agent: AgentProfile, task: Task) -> ActivityEvent:
+    return _event(
+        agent, "task_completed", f"Completed: {task.title}", task.id,
+        task.completed_at or task.updated_at,
+    )
+
+
+def hive_post(agent: AgentProfile, post: AgentPost) -> ActivityEvent:
+    snippet = post.content[:80] + ("..." if len(post.content) > 80 else "")
+    return _event(agent, "hive_post", snippet, post.id, post.created_at)
+
+
+def license_purchased(agent: AgentProfile, license: AgentLicense, buyer: User | None) -> ActivityEvent:
+    buyer_name = (buyer.display_name or buyer.email[:20]) if buyer else "Unknown"
+    return _event(
+        agent, "license_purchased", f"New access: {buyer_name} licensed {agent.name}",
+        license.id, license.created_at,
+    )
+
+
+def backfill_activity(session: Session) -> int:
+    """Seed an empty ``activity_events`` from recent tasks, posts and licenses."""
+    if session.exec(select(func.count(ActivityEvent.id))).one():
+        return 0
+
+    since = _utcnow() - timedelta(days=BACKFILL_DAYS)
+    events: list[ActivityEvent] = []
+    for task, agent in session.exec(
+        select(Task, AgentProfile)
+        .join(AgentProfile, AgentProfile.id == Task.agent_profile_id)
+        .where(Task.created_at >= since)
+    ):
+        events.append(task_started(agent, task))
+        if task.status == "completed":
+            events.append(task_completed(agent, task))
+    for post, agent in session.exec(
+        select(AgentPost, AgentProfile)
+        .join(AgentProfile, AgentProfile.id == AgentPost.agent_profile_id)
+        .where(AgentPost.created_at >= since)
+    ):
+        events.append(hive_post(agent, post))
+    for lic, agent, buyer in session.exec(
+        select(AgentLicense, AgentProfile, User)
+        .join(AgentProfile, AgentProfile.id == AgentLicense.agent_profile_id)
+        .outerjoin(User, User.id == AgentLicense.buyer_id)
+        .where(AgentLicense.created_at >= since)
+    ):
+        events.append(license_purchased(agent, lic, buyer))
+
+    session.add_all(events)
+    session.commit()
+    if events:
+        logger.info(f"Backfilled {len(events)} activity event(s)")
+    return len(events)
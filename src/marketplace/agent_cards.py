@@ -0,0 +1,105 @@
+"""Precomputed A2A Agent Cards.
+
+Every ``AgentProfile`` stores its rendered card in ``a2a_card``, refreshed by
+mapper events whenever the profile is inserted or updated, so registry
+endpoints read a single JSON column instead of rebuilding cards per request.
+Rows written before the column existed are filled in by a background job.
+"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from .database import get_engine
+from .models import AgentProfile
+from .presence import presence_fields
+from .scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+RAILWAY_URL = "https://swarm-api.railway.app"  # override via env if needed
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def build_agent_card(agent: AgentProfile) -> dict:
+    skills = [
+        {
+            "id": cap.lower().replace(" ", "-"),
+            "name": cap,
+            "description": f"{agent.name} can handle: {cap}",
+        }
+        for cap in (agent.capabilities or [])
+    ] or [
+        {
+            "id": "general",
+            "name": "General Assistant",
+            "description": agent.tagline or agent.description or "",
+        }
+    ]
+
+    return {
+        "name": agent.name,
+        "description": agent.tagline or agent.description or "",
+        "url": f"{RAILWAY_URL}/a2a/agents/{agent.id}",
+        "version": "1.0",
+        "capabilities": {
+            "streaming": False,
+            "pushNotifications": bool(agent.webhook_url),
+        },
+        "skills": skills,
+        "defaultInputModes": ["text/plain"],
+        "defaultOutputModes": ["text/plain"],
+        "swarm_meta": {
+            "agent_id": str(agent.id),
+            "slug": agent.slug,
+            "category": agent.category,
+            "is_docked": agent.is_docked,
+            "status": agent.status,
+        },
+    }
+
+
+def card_for(agent: AgentProfile) -> dict:
+    return agent.a2a_card or build_agent_card(agent)
+
+
+def card_with_presence(agent: AgentProfile, seen_at: datetime | None) -> dict:
+    """``card_for`` plus live ``online``/``last_seen_at`` in ``swarm_meta``."""
+    card = card_for(agent)
+    meta = {**card.get("swarm_meta", {}), **presence_fields(seen_at)}
+    return {**card, "swarm_meta": meta}
+
+
+def is_listed(agent: AgentProfile) -> bool:
+    """Whether the agent appears in the public A2A registry."""
+    return agent.status == "active" and bool(agent.is_docked)
+
+
+@event.listens_for(AgentProfile, "before_insert")
+@event.listens_for(AgentProfile, "before_update")
+def _refresh_card(mapper, connection, target: AgentProfile) -> None:
+    target.a2a_card = build_agent_card(target)
+
+
+@periodic(3600)
+def _backfill_cards_job() -> None:
+    filled = 0
+    with Session(get_engine()) as session:
+        while True:
+            batch = session.exec(
+                select(AgentProfile)
+                .where(AgentProfile.a2a_card == None)  # noqa: E711
+                .limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not batch:
+                break
+            for agent in batch:
+                agent.a2a_card = build_agent_card(agent)
+                session.add(agent)
+            session.commit()
+            filled += len(batch)
+    if filled:
+        logger.info(f"Backfilled A2A cards for {filled} agent(s)")
@@ -0,0 +1,172 @@
+"""Agent API key authentication (``X-Agent-Key``).
+
+Keys are stored as SHA-256 hashes behind a unique index. Resolved keys are
+cached in process for ``CACHE_TTL_SECONDS``, keyed by hash, so an agent
+posting or polling in a loop costs one primary-key read of its profile per
+request. Revoking a key evicts it here at once; other replicas stop
+accepting it when their entry expires.
+
+``last_used_at`` is not written per request: uses are noted in memory and
+flushed in one bulk ``UPDATE`` every ``LAST_USED_FLUSH_SECONDS``, so each key
+is written at most once per interval.
+"""
+
+import hashlib
+import logging
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import bindparam, update
+from sqlmodel import Session, select
+
+from .database import get_engine
+from .models import AgentApiKey, AgentProfile, _utcnow
+from .scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = 30
+CACHE_MAX_ENTRIES = 10_000
+LAST_USED_FLUSH_SECONDS = 60
+
+
+def hash_key(raw: str) -> str:
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def generate_agent_key() -> tuple[str, str, str]:
+    """Returns (raw_key, key_hash, key_prefix)."""
+    raw = "swrm_agent_" + secrets.token_urlsafe(32)
+    return raw, hash_key(raw), raw[:8]
+
+
+# ── Key cache ────────────────────────────────────────────────────────
+
+
+class KeySnapshot(NamedTuple):
+    key_id: uuid.UUID
+    agent_id: uuid.UUID
+    agent_status: str | None  # as of caching; None if the agent is gone
+
+
+class _KeyCache:
+    def __init__(self):
+        self._entries: dict[str, tuple[float, KeySnapshot]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key_hash: str) -> KeySnapshot | None:
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key_hash]
+                return None
+            return entry[1]
+
+    def put(self, key_hash: str, snapshot: KeySnapshot) -> None:
+        with self._lock:
+            if len(self._entries) >= CACHE_MAX_ENTRIES:
+                now = time.monotonic()
+                self._entries = {h: e for h, e in self._entries.items() if e[0] >= now}
+                if len(self._entries) >= CACHE_MAX_ENTRIES:
+                    self._entries.clear()
+            self._entries[key_hash] = (time.monotonic() + CACHE_TTL_SECONDS, snapshot)
+
+    def evict(self, key_hash: str) -> None:
+        with self._lock:
+            self._entries.pop(key_hash, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = _KeyCache()
+
+
+def forget_key(key_hash: str) -> None:
+    """Stop accepting a revoked key on this replica straight away."""
+    _cache.evict(key_hash)
+
+
+def _lookup(key_hash: str, session: Session) -> KeySnapshot | None:
+    snapshot = _cache.get(key_hash)
+    if snapshot is None:
+        row = session.exec(
+            select(AgentApiKey.id, AgentApiKey.agent_id, AgentProfile.status)
+            .outerjoin(AgentProfile, AgentProfile.id == AgentApiKey.agent_id)
+            .where(
+                AgentApiKey.key_hash == key_hash,
+                AgentApiKey.is_active == True,  # noqa: E712
+            )
+        ).first()
+        if row is None:
+            return None
+        snapshot = KeySnapshot(*row)
+        _cache.put(key_hash, snapshot)
+    return snapshot
+
+
+# ── last_used_at ─────────────────────────────────────────────────────
+
+
+_last_used: dict[uuid.UUID, datetime] = {}
+_last_used_lock = threading.Lock()
+
+
+def _note_use(key_id: uuid.UUID) -> None:
+    with _last_used_lock:
+        _last_used[key_id] = _utcnow()
+
+
+def flush_last_used() -> int:
+    """Write noted key uses to ``agent_api_keys``. Returns keys updated."""
+    global _last_used
+    with _last_used_lock:
+        pending, _last_used = _last_used, {}
+    if not pending:
+        return 0
+    stmt = (
+        update(AgentApiKey.__table__)
+        .where(AgentApiKey.__table__.c.id == bindparam("key_id"))
+        .values(last_used_at=bindparam("used_at"))
+    )
+    try:
+        with get_engine().begin() as conn:
+            conn.execute(stmt, [{"key_id": k, "used_at": v} for k, v in sorted(pending.items())])
+    except Exception:
+        # Put them back for the next flush, keeping any newer use noted meanwhile
+        with _last_used_lock:
+            for key_id, used_at in pending.items():
+                _last_used[key_id] = max(used_at, _last_used.get(key_id, used_at))
+        raise
+    return len(pending)
+
+
+@periodic(LAST_USED_FLUSH_SECONDS, run_on_startup=False)
+def _flush_last_used_job() -> None:
+    flush_last_used()
+
+
+# ── Authentication ───────────────────────────────────────────────────
+
+
+def key_snapshot(raw_key: str | None, session: Session) -> KeySnapshot | None:
+    """Resolve an ``X-Agent-Key`` value; None if it is unknown or revoked."""
+    if not raw_key:
+        return None
+    snapshot = _lookup(hash_key(raw_key), session)
+    if snapshot is not None:
+        _note_use(snapshot.key_id)
+    return snapshot
+
+
+def agent_for_key(raw_key: str | None, session: Session) -> AgentProfile | None:
+    """The agent ``raw_key`` belongs to, or None if the key is unknown or revoked."""
+    snapshot = key_snapshot(raw_key, session)
+    return session.get(AgentProfile, snapshot.agent_id) if snapshot else None
@@ -0,0 +1,157 @@
+"""Content-addressed storage for large payloads (task results, job outputs).
+
+Payloads are stored gzip-compressed under the SHA-256 of their uncompressed
+bytes, so storing the same content twice keeps one copy. Rows hold only the
+reference (``sha256:<hex>``) and a short summary; the full payload is
+streamed back on demand. ``stream(ref, compressed=True)`` yields the stored
+gzip bytes as-is, so an endpoint can serve them with ``Content-Encoding:
+gzip`` without decompressing.
+
+Offloading is off unless ``BLOB_STORE_BACKEND`` names a backend; writers
+check ``enabled()`` and otherwise keep payloads inline. A configured backend
+must be durable and shared by every process that reads or writes blobs (the
+API and ``worker.py``): the built-in ``local`` backend writes under
+``BLOB_STORE_DIR``, which must be a persistent volume mounted in both. Other
+backends plug in with ``register_backend``.
+"""
+
+import gzip
+import hashlib
+import os
+import tempfile
+import zlib
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from functools import lru_cache
+from pathlib import Path
+
+from .config import get_settings
+
+# Payloads up to this size stay inline in their row
+INLINE_MAX_BYTES = 8192
+CHUNK_SIZE = 64 * 1024
+_PREFIX = "sha256:"
+
+
+class BlobNotFound(KeyError):
+    pass
+
+
+class BlobStore(ABC):
+    """Backend interface: gzip bytes in and out, keyed by hex digest."""
+
+    @abstractmethod
+    def exists(self, digest: str) -> bool: ...
+
+    @abstractmethod
+    def write(self, digest: str, compressed: bytes) -> None: ...
+
+    @abstractmethod
+    def read_chunks(self, digest: str) -> Iterator[bytes]: ...
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / digest[2:4] / f"{digest}.gz"
+
+    def exists(self, digest: str) -> bool:
+        return self._path(digest).exists()
+
+    def write(self, digest: str, compressed: bytes) -> None:
+        path = self._path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def read_chunks(self, digest: str) -> Iterator[bytes]:
+        try:
+            f = self._path(digest).open("rb")
+        except FileNotFoundError:
+            raise BlobNotFound(digest) from None
+        with f:
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+
+
+_BACKENDS: dict[str, Callable[[], BlobStore]] = {
+    "local": lambda: LocalBlobStore(get_settings().blob_store_dir),
+}
+
+
+def register_backend(name: str, factory: Callable[[], BlobStore]) -> None:
+    _BACKENDS[name] = factory
+    get_store.cache_clear()
+
+
+def enabled() -> bool:
+    """Whether a blob backend is configured; without one, payloads stay inline."""
+    return bool(get_settings().blob_store_backend)
+
+
+@lru_cache
+def get_store() -> BlobStore:
+    name = get_settings().blob_store_backend
+    if not name:
+        raise BlobNotFound("no blob store configured")
+    return _BACKENDS[name]()
+
+
+def _digest(ref: str) -> str:
+    if not ref.startswith(_PREFIX):
+        raise BlobNotFound(ref)
+    return ref[len(_PREFIX):]
+
+
+def put(data: bytes) -> str:
+    """Store ``data`` unless an identical payload is already stored. Returns its ref."""
+    digest = hashlib.sha256(data).hexdigest()
+    store = get_store()
+    if not store.exists(digest):
+        # mtime=0 keeps the compressed bytes identical for identical content
+        store.write(digest, gzip.compress(data, compresslevel=6, mtime=0))
+    return _PREFIX + digest
+
+
+def stream(ref: str, compressed: bool = False) -> Iterator[bytes]:
+    """The payload behind ``ref`` in chunks, gzip-encoded if ``compressed``.
+
+    The first chunk is read before returning, so a missing blob raises
+    ``BlobNotFound`` here rather than halfway through a response.
+    """
+    chunks = get_store().read_chunks(_digest(ref))
+    first = next(chunks, b"")
+
+    def raw() -> Iterator[bytes]:
+        yield first
+        yield from chunks
+
+    if compressed:
+        return raw()
+    return _decompress(raw())
+
+
+def _decompress(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if out := decoder.decompress(chunk):
+            yield out
+    if tail := decoder.flush():
+        yield tail
+
+
+def read(ref: str) -> bytes:
+    return b"".join(stream(ref))
+
+
+def preview(text: str, limit: int = 200) -> str:
+    """A short excerpt to keep inline beside a stored payload."""
+    return text[:limit] + ("..." if len(text) > limit else "")
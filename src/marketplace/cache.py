@@ -0,0 +1,261 @@
+"""HTTP response cache for public, read-mostly catalogue endpoints.
+
+Bodies are cached serialised, together with a strong ETag, under a key made
+of the request URL plus a generation number for every table the response was
+built from. Committing a write to one of those tables bumps its generation,
+so stale entries are simply never looked up again and age out via TTL.
+
+Only writes to columns the cached responses render count: ``users`` is bumped
+for owner names alone, and hot counters updated on every chat message or task
+(``_UNTRACKED_COLUMNS``) never bump a table. Those counters are served up to
+the TTL stale.
+
+Entries live in Redis when ``REDIS_URL`` is configured, so every API replica
+shares the same cache and generations. Without it they live in process
+memory, where writes committed by other processes are never seen; local
+entries are then kept only for ``response_cache_max_age_seconds``, the
+staleness clients are already allowed.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession
+
+from .config import get_settings
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+MAX_MEMORY_ENTRIES = 1024
+_KEY_PREFIX = "respcache:"
+
+# Tables whose cached renderings use only these columns
+_RENDERED_COLUMNS = {
+    "users": frozenset({"display_name", "email"}),
+}
+# Columns written too often to invalidate on, or never rendered
+_UNTRACKED_COLUMNS = {
+    "agent_profiles": frozenset({
+        "total_earned_credits", "total_earned_cents", "total_hires", "tasks_completed",
+        "active_task_count", "last_seen_at", "webhook_last_ping",
+    }),
+}
+
+
+class _MemoryBackend:
+    def __init__(self, max_entries: int = MAX_MEMORY_ENTRIES):
+        self._entries: OrderedDict[str, tuple[float, str, dict, bytes]] = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+
+    def generations(self, tags: list[str]) -> list[int]:
+        return [self._generations.get(t, 0) for t in tags]
+
+    def bump(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for t in tags:
+                self._generations[t] = self._generations.get(t, 0) + 1
+
+    def get(self, key: str) -> tuple[str, dict, bytes] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, etag, headers, body = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return etag, headers, body
+
+    def set(self, key: str, etag: str, headers: dict, body: bytes, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, etag, headers, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+
+class _RedisBackend:
+    def __init__(self, client):
+        self.client = client
+
+    def generations(self, tags: list[str]) -> list[int]:
+        values = self.client.mget([f"{_KEY_PREFIX}gen:{t}" for t in tags])
+        return [int(v or 0) for v in values]
+
+    def bump(self, tags: Iterable[str]) -> None:
+        pipe = self.client.pipeline()
+        for t in tags:
+            pipe.incr(f"{_KEY_PREFIX}gen:{t}")
+        pipe.execute()
+
+    def get(self, key: str) -> tuple[str, dict, bytes] | None:
+        raw = self.client.get(_KEY_PREFIX + key)
+        if raw is None:
+            return None
+        meta, _, body = raw.partition(b"\n")
+        meta = json.loads(meta)
+        return meta["etag"], meta["headers"], body
+
+    def set(self, key: str, etag: str, headers: dict, body: bytes, ttl: int) -> None:
+        meta = json.dumps({"etag": etag, "headers": headers}).encode()
+        self.client.set(_KEY_PREFIX + key, meta + b"\n" + body, ex=ttl)
+
+    def clear(self) -> None:
+        pass
+
+
+_memory_backend = _MemoryBackend()
+
+
+def _backend():
+    client = get_redis()
+    return _RedisBackend(client) if client is not None else _memory_backend
+
+
+def invalidate(*tags: str) -> None:
+    """Invalidate every cached response built from the given tables."""
+    if not tags:
+        return
+    try:
+        _backend().bump(tags)
+    except Exception as e:
+        # Fall back to the local cache so this replica at least stays fresh
+        logger.warning(f"Response cache invalidation failed: {e}")
+        _memory_backend.bump(tags)
+
+
+def clear() -> None:
+    _memory_backend.clear()
+
+
+def mark_dirty(session, *tables: str) -> None:
+    """Invalidate ``tables`` when ``session`` commits.
+
+    ORM writes are tracked automatically; use this for Core ``UPDATE`` /
+    ``INSERT`` statements that bypass the unit of work.
+    """
+    session.info.setdefault("response_cache_dirty", set()).update(tables)
+
+
+def _etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (t.strip().removeprefix("W/") for t in if_none_match.split(","))
+
+
+def cached_json(
+    request: Request,
+    tags: Iterable[str],
+    build: Callable[[], object],
+    max_age: int | None = None,
+    headers_for: Callable[[object], dict[str, str]] | None = None,
+) -> Response:
+    """Serve ``build()`` as JSON through the response cache.
+
+    ``tags`` are the table names the body is derived from; ``build`` only runs
+    on a cache miss. ``headers_for`` derives extra response headers (e.g.
+    pagination links) from the built payload; they are cached with the body.
+    Answers ``If-None-Match`` with 304 when the ETag matches.
+    """
+    settings = get_settings()
+    tags = sorted(tags)
+    if max_age is None:
+        max_age = settings.response_cache_max_age_seconds
+
+    backend = _backend()
+    key = None
+    entry = None
+    try:
+        gens = backend.generations(tags)
+        key = f"{request.url.path}?{request.url.query}|" + ",".join(
+            f"{t}:{g}" for t, g in zip(tags, gens)
+        )
+        entry = backend.get(key)
+    except Exception as e:
+        logger.warning(f"Response cache lookup failed: {e}")
+
+    if entry is None:
+        payload = build()
+        extra = headers_for(payload) if headers_for else {}
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+        etag = _etag_for(body)
+        if key is not None:
+            ttl = settings.response_cache_ttl_seconds
+            if backend is _memory_backend:
+                # Only this process's writes bump local generations
+                ttl = min(ttl, max_age)
+            try:
+                backend.set(key, etag, extra, body, ttl)
+            except Exception as e:
+                logger.warning(f"Response cache store failed: {e}")
+    else:
+        etag, extra, body = entry
+
+    headers = {**extra, "ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# ── Invalidation on commit ───────────────────────────────────────────
+
+
+def _renders_change(table: str, obj) -> bool:
+    """Whether an update to ``obj`` touched a column cached responses render."""
+    rendered = _RENDERED_COLUMNS.get(table)
+    untracked = _UNTRACKED_COLUMNS.get(table, frozenset())
+    for attr in inspect(obj).attrs:
+        if rendered is not None and attr.key not in rendered:
+            continue
+        if attr.key not in untracked and attr.history.has_changes():
+            return True
+    return False
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_dirty_tables(session, flush_context):
+    # Attribute history is still intact here; it is reset after this hook
+    tables = session.info.setdefault("response_cache_dirty", set())
+    for obj in (*session.new, *session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            tables.add(table)
+    for obj in session.dirty:
+        table = getattr(obj, "__tablename__", None)
+        if table and table not in tables and _renders_change(table, obj):
+            tables.add(table)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _invalidate_on_commit(session):
+    tables = session.info.pop("response_cache_dirty", None)
+    if tables:
+        invalidate(*tables)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("response_cache_dirty", None)
@@ -0,0 +1,181 @@
+"""Concurrency slots: how many tasks an agent works on at once.
+
+``agent_profiles.active_task_count`` is only changed by single conditional
+``UPDATE`` statements, never read-modify-write in Python:
+
+* ``reserve`` increments it only while it is below ``max_concurrent_tasks``,
+  so concurrent assignments serialise on the agent row and cannot overshoot;
+* a task that took a slot records it in ``tasks.slot_expires_at``, and
+  ``release`` clears that column before decrementing, so a slot is given
+  back at most once however many paths (result callback, dead-lettered
+  dispatch, deadline expiry) try to release it.
+
+A slot is leased until the task's deadline, or for ``OPEN_ENDED_LEASE`` for
+tasks without a real one (A2A tasks carry a placeholder deadline in 2099).
+The reconciler frees slots whose
+lease ran out and recomputes every agent's count, under its row lock, from
+the tasks still holding one, which also corrects any drift left by a crash
+between the two statements.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, case, func, select, update
+from sqlmodel import Session
+
+from .database import get_engine
+from .models import AgentProfile, Task, _utcnow
+from .scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL_SECONDS = 300
+OPEN_ENDED_LEASE = timedelta(hours=24)
+# Deadlines at or past this are placeholders, not real deadlines
+_PLACEHOLDER_DEADLINE = datetime(2099, 1, 1)
+_RECONCILE_CHUNK = 500
+
+
+def reserve(
+    session: Session,
+    agent: AgentProfile,
+    task: Task,
+    enforce: bool = True,
+    lease: timedelta | None = None,
+) -> bool:
+    """Take one of ``agent``'s slots for ``task``. False when the agent is full.
+
+    With ``enforce=False`` the slot is taken even past the limit, for work
+    the agent already accepted once (a rejected result sent back for rework).
+    ``lease`` bounds how long the slot is held when it ends before the deadline.
+    """
+    stmt = update(AgentProfile).where(AgentProfile.id == agent.id)
+    if enforce:
+        stmt = stmt.where(AgentProfile.active_task_count < AgentProfile.max_concurrent_tasks)
+    stmt = stmt.values(active_task_count=AgentProfile.active_task_count + 1)
+    if session.execute(stmt).rowcount != 1:
+        return False
+    task.slot_expires_at = task.deadline
+    if lease is not None:
+        task.slot_expires_at = min(task.deadline, _utcnow() + lease)
+    return True
+
+
+def release(session: Session, task: Task) -> None:
+    """Give back the slot ``task`` holds, if it still holds one."""
+    if task.slot_expires_at is None or task.agent_profile_id is None:
+        return
+    cleared = session.execute(
+        update(Task)
+        .where(Task.id == task.id, Task.slot_expires_at.is_not(None))
+        .values(slot_expires_at=None)
+    ).rowcount
+    if cleared:
+        session.execute(
+            update(AgentProfile)
+            .where(AgentProfile.id == task.agent_profile_id, AgentProfile.active_task_count > 0)
+            .values(active_task_count=AgentProfile.active_task_count - 1)
+        )
+
+
+def release_many(session: Session, released: dict) -> None:
+    """Give back ``released[agent_id]`` slots per agent in one statement.
+
+    For bulk transitions that already cleared ``slot_expires_at`` on rows
+    they hold locked, so each count is exactly the slots those rows held.
+    """
+    if not released:
+        return
+    table = AgentProfile.__table__
+    remaining = table.c.active_task_count - bindparam("released")
+    session.execute(
+        update(table)
+        .where(table.c.id == bindparam("agent_id"))
+        .values(active_task_count=case((remaining < 0, 0), else_=remaining)),
+        [{"agent_id": agent_id, "released": n} for agent_id, n in sorted(released.items())],
+    )
+
+
+# ── Reconciler ───────────────────────────────────────────────────────
+
+
+def reconcile(session: Session) -> int:
+    """Free expired slot leases and recount every agent. Returns agents corrected.
+
+    Agents are recounted a chunk at a time with their rows locked first, in id
+    order like ``release_many``: a ``reserve`` racing the recount has then
+    either committed its task, which the count sees, or waits for it.
+    """
+    session.execute(
+        update(Task)
+        .where(Task.slot_expires_at < _utcnow())
+        .values(slot_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+
+    corrected = 0
+    after = None
+    while True:
+        query = select(AgentProfile.id, AgentProfile.active_task_count).order_by(AgentProfile.id)
+        if after is not None:
+            query = query.where(AgentProfile.id > after)
+        agents = session.execute(query.limit(_RECONCILE_CHUNK).with_for_update()).all()
+        if not agents:
+            break
+        after = agents[-1].id
+        held = dict(session.execute(
+            select(Task.agent_profile_id, func.count(Task.id))
+            .where(
+                Task.agent_profile_id.in_([a.id for a in agents]),
+                Task.slot_expires_at.is_not(None),
+            )
+            .group_by(Task.agent_profile_id)
+        ).all())
+        wrong = [
+            {"agent_id": a.id, "held": held.get(a.id, 0)}
+            for a in agents
+            if a.active_task_count != held.get(a.id, 0)
+        ]
+        if wrong:
+            table = AgentProfile.__table__
+            session.execute(
+                update(table)
+                .where(table.c.id == bindparam("agent_id"))
+                .values(active_task_count=bindparam("held")),
+                wrong,
+            )
+            corrected += len(wrong)
+        session.commit()
+        if len(agents) < _RECONCILE_CHUNK:
+            break
+    return corrected
+
+
+def backfill_slots(engine) -> None:
+    """Give in-flight tasks from before slot tracking the slot they hold."""
+    now = _utcnow()
+    with Session(engine) as session:
+        session.execute(
+            update(Task)
+            .where(
+                Task.agent_profile_id.is_not(None),
+                Task.status.in_(("posted", "assigned", "dispatched", "accepted", "in_progress")),
+                Task.deadline > now,
+            )
+            .values(slot_expires_at=case(
+                (Task.deadline >= _PLACEHOLDER_DEADLINE, now + OPEN_ENDED_LEASE),
+                else_=Task.deadline,
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+
+
+@periodic(RECONCILE_INTERVAL_SECONDS)
+def _reconcile_job() -> None:
+    with Session(get_engine()) as session:
+        corrected = reconcile(session)
+    if corrected:
+        logger.info(f"Corrected active task counts for {corrected} agent(s)")
@@ -5,6 +5,7 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     database_url: str = "sqlite:///marketplace.db"
+    redis_url: str = ""  # optional; enables shared caches across API replicas
     jwt_secret: str = "dev-jwt-secret-change-in-production"
     log_level: str = "INFO"
     base_url: str = "http://localhost:8000"
@@ -15,6 +16,16 @@ class Settings(BaseSettings):
     stripe_connect_client_id: str = ""
     anthropic_api_key: str = ""  # Original Anthropic key
     anthropic_api_2: str = ""  # Platform-level fallback key for agent chat
+    response_cache_ttl_seconds: int = 300
+    response_cache_max_age_seconds: int = 30
+    background_jobs_enabled: bool = True  # periodic reconciliation/flush jobs in the API process
+    like_counts_buffered: bool = False  # batch likes_count updates (see likes.py)
+    embedder: str = "hashed-tfidf"
+    vector_index_dir: str = "data/vector_index"
+    # Off by default: large payloads stay inline. Only set a backend that is
+    # durable and shared with worker.py (for "local", a mounted volume).
+    blob_store_backend: str = ""  # see blobs.py
+    blob_store_dir: str = "data/blobs"
 
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
@@ -0,0 +1,287 @@
+"""Time-bucketed creator earnings.
+
+``creator_earnings`` gets a row per proxied call, so totals and charts are
+served from ``earnings_rollups`` instead. A periodic job folds closed hours
+into hourly rows and complete days into daily rows, advancing a watermark for
+each in ``rollup_watermarks``. Readers combine the daily rows, the hourly rows
+after the daily watermark and the raw rows after the hourly watermark (the
+open bucket), so results are exact without waiting for the job.
+"""
+
+import logging
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, literal, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlmodel import Session, col, func, select
+
+from .database import get_engine
+from .models import CreatorEarnings, EarningsRollup, RollupWatermark, _utcnow
+from .scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+HOUR = "hour"
+DAY = "day"
+HOUR_MARK = "earnings_hour"
+DAY_MARK = "earnings_day"
+INTERVALS = ("day", "week", "month")
+
+ROLLUP_INTERVAL_SECONDS = 300
+# An hour is rolled up only this long after it closed, so earnings from
+# transactions still committing at the boundary are not left behind.
+SETTLE_SECONDS = 300
+_EPOCH = datetime(1970, 1, 1)
+
+
+# ── Timestamp truncation ─────────────────────────────────────────────
+
+
+class _trunc(FunctionElement):
+    type = DateTime()
+    inherit_cache = True
+    unit = ""
+
+
+class trunc_hour(_trunc):
+    unit = HOUR
+    inherit_cache = True
+
+
+class trunc_day(_trunc):
+    unit = DAY
+    inherit_cache = True
+
+
+@compiles(_trunc)
+def _compile_trunc(element, compiler, **kw):
+    return f"date_trunc('{element.unit}', {compiler.process(element.clauses, **kw)})"
+
+
+@compiles(_trunc, "sqlite")
+def _compile_trunc_sqlite(element, compiler, **kw):
+    fmt = "%Y-%m-%d %H:00:00" if element.unit == HOUR else "%Y-%m-%d 00:00:00"
+    return f"strftime('{fmt}', {compiler.process(element.clauses, **kw)})"
+
+
+def _floor(ts: datetime, unit: str) -> datetime:
+    ts = ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0) if unit == DAY else ts
+
+
+# ── Rollup job ───────────────────────────────────────────────────────
+
+
+def _sums(model):
+    return (
+        func.sum(model.gross_credits),
+        func.sum(model.platform_fee_credits),
+        func.sum(model.net_credits),
+    )
+
+
+def _set_mark(session: Session, marks: dict, name: str, until: datetime) -> None:
+    mark = marks.get(name) or RollupWatermark(name=name, rolled_until=until)
+    mark.rolled_until = until
+    session.add(mark)
+
+
+def roll_up_earnings(session: Session) -> int:
+    """Fold closed hours and complete days into rollup rows. Returns rows written."""
+    # Row locks serialise replicas running the job at the same time
+    marks = {
+        m.name: m
+        for m in session.exec(
+            select(RollupWatermark)
+            .where(col(RollupWatermark.name).in_([HOUR_MARK, DAY_MARK]))
+            .with_for_update()
+        ).all()
+    }
+    written = 0
+
+    hour_from = marks[HOUR_MARK].rolled_until if HOUR_MARK in marks else None
+    if hour_from is None:
+        first = session.exec(select(func.min(CreatorEarnings.created_at))).one()
+        if first is None:
+            return 0
+        hour_from = _floor(first, HOUR)
+    hour_until = _floor(_utcnow() - timedelta(seconds=SETTLE_SECONDS), HOUR)
+    if hour_until > hour_from:
+        E = CreatorEarnings
+        bucket = trunc_hour(E.created_at)
+        rows = session.exec(
+            select(E.owner_id, E.agent_profile_id, bucket, *_sums(E), func.count(E.id))
+            .where(E.created_at >= hour_from, E.created_at < hour_until)
+            .group_by(E.owner_id, E.agent_profile_id, bucket)
+        ).all()
+        for owner_id, agent_id, start, gross, fee, net, count in rows:
+            session.add(EarningsRollup(
+                period=HOUR, owner_id=owner_id, agent_profile_id=agent_id, bucket_start=start,
+                gross_credits=gross or 0, platform_fee_credits=fee or 0,
+                net_credits=net or 0, earnings_count=count,
+            ))
+        written += len(rows)
+        _set_mark(session, marks, HOUR_MARK, hour_until)
+        hour_from = hour_until
+
+    R = EarningsRollup
+    day_from = marks[DAY_MARK].rolled_until if DAY_MARK in marks else None
+    if day_from is None:
+        session.flush()
+        first = session.exec(select(func.min(R.bucket_start)).where(R.period == HOUR)).one()
+        day_from = _floor(first, DAY) if first else _floor(hour_from, DAY)
+    day_until = _floor(hour_from, DAY)
+    if day_until > day_from:
+        bucket = trunc_day(R.bucket_start)
+        session.flush()
+        rows = session.exec(
+            select(R.owner_id, R.agent_profile_id, bucket, *_sums(R), func.sum(R.earnings_count))
+            .where(R.period == HOUR, R.bucket_start >= day_from, R.bucket_start < day_until)
+            .group_by(R.owner_id, R.agent_profile_id, bucket)
+        ).all()
+        for owner_id, agent_id, start, gross, fee, net, count in rows:
+            session.add(EarningsRollup(
+                period=DAY, owner_id=owner_id, agent_profile_id=agent_id, bucket_start=start,
+                gross_credits=gross or 0, platform_fee_credits=fee or 0,
+                net_credits=net or 0, earnings_count=count or 0,
+            ))
+        written += len(rows)
+        _set_mark(session, marks, DAY_MARK, day_until)
+
+    session.commit()
+    return written
+
+
+@periodic(ROLLUP_INTERVAL_SECONDS)
+def _rollup_job() -> None:
+    with Session(get_engine()) as session:
+        try:
+            written = roll_up_earnings(session)
+        except IntegrityError:
+            # Another replica rolled the same buckets first
+            session.rollback()
+            return
+    if written:
+        logger.info(f"Rolled up {written} earnings bucket(s)")
+
+
+# ── Readers ──────────────────────────────────────────────────────────
+
+
+def _mark(name: str):
+    return func.coalesce(
+        select(RollupWatermark.rolled_until)
+        .where(RollupWatermark.name == name)
+        .scalar_subquery(),
+        _EPOCH,
+    )
+
+
+def earnings_source(owner_id: uuid.UUID, since: datetime | None = None):
+    """Every earning of ``owner_id`` exactly once, as a subquery.
+
+    Columns: ``agent_profile_id``, ``day``, ``gross_credits``,
+    ``platform_fee_credits``, ``net_credits``, ``earnings_count``. ``since``
+    must be a day boundary.
+    """
+    R, E = EarningsRollup, CreatorEarnings
+    day_mark, hour_mark = _mark(DAY_MARK), _mark(HOUR_MARK)
+
+    days = select(
+        R.agent_profile_id, R.bucket_start.label("day"),
+        R.gross_credits, R.platform_fee_credits, R.net_credits, R.earnings_count,
+    ).where(R.owner_id == owner_id, R.period == DAY)
+    hours = select(
+        R.agent_profile_id, trunc_day(R.bucket_start),
+        R.gross_credits, R.platform_fee_credits, R.net_credits, R.earnings_count,
+    ).where(
+        R.owner_id == owner_id,
+        R.period == HOUR,
+        R.bucket_start >= day_mark,
+        R.bucket_start < hour_mark,
+    )
+    open_rows = select(
+        E.agent_profile_id, trunc_day(E.created_at),
+        E.gross_credits, E.platform_fee_credits, E.net_credits, literal(1),
+    ).where(E.owner_id == owner_id, E.created_at >= hour_mark)
+
+    if since is not None:
+        days = days.where(R.bucket_start >= since)
+        hours = hours.where(R.bucket_start >= since)
+        open_rows = open_rows.where(E.created_at >= since)
+    return union_all(days, hours, open_rows).subquery()
+
+
+def total_net_credits(owner_id: uuid.UUID):
+    """Scalar subquery: all-time net credits earned by ``owner_id``."""
+    src = earnings_source(owner_id)
+    return select(func.coalesce(func.sum(src.c.net_credits), 0)).scalar_subquery()
+
+
+def net_credits_by_agent(owner_id: uuid.UUID):
+    """Subquery of (``agent_id``, ``value``): all-time net credits per agent."""
+    src = earnings_source(owner_id)
+    return (
+        select(src.c.agent_profile_id.label("agent_id"), func.sum(src.c.net_credits).label("value"))
+        .group_by(src.c.agent_profile_id)
+        .subquery()
+    )
+
+
+def _period_start(day: datetime, interval: str) -> datetime:
+    day = _floor(day, DAY)
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _step_back(start: datetime, interval: str) -> datetime:
+    if interval == "month":
+        return (start - timedelta(days=1)).replace(day=1)
+    return start - timedelta(days=7 if interval == "week" else 1)
+
+
+def earnings_series(
+    session: Session, owner_id: uuid.UUID, interval: str, periods: int
+) -> list[dict]:
+    """Earnings per day/week/month for the last ``periods`` periods, oldest first."""
+    starts = [_period_start(_utcnow(), interval)]
+    for _ in range(periods - 1):
+        starts.append(_step_back(starts[-1], interval))
+    starts.reverse()
+
+    src = earnings_source(owner_id, since=starts[0])
+    rows = session.exec(
+        select(
+            src.c.day,
+            func.sum(src.c.gross_credits),
+            func.sum(src.c.platform_fee_credits),
+            func.sum(src.c.net_credits),
+            func.sum(src.c.earnings_count),
+        ).group_by(src.c.day)
+    ).all()
+
+    buckets = {s: [0, 0, 0, 0] for s in starts}
+    for day, gross, fee, net, count in rows:
+        b = buckets.get(_period_start(day, interval))
+        if b is None:
+            continue
+        b[0] += gross or 0
+        b[1] += fee or 0
+        b[2] += net or 0
+        b[3] += count or 0
+    return [
+        {
+            "period_start": start.isoformat(),
+            "gross_credits": b[0],
+            "platform_fee_credits": b[1],
+            "net_credits": b[2],
+            "earnings_count": b[3],
+        }
+        for start, b in buckets.items()
+    ]
@@ -0,0 +1,102 @@
+"""Text embedders for agent semantic search.
+
+An embedder turns texts into fixed-width float32 vectors. The default,
+``HashedTfidfEmbedder``, needs no model or network: it hashes word unigrams
+and bigrams into buckets (the "hashing trick") with sublinear term frequency.
+Its vectors are raw TF counts and it asks the index to apply IDF weights,
+which the index derives from its own corpus (see vector_index.py).
+
+Other embedders (e.g. a hosted embedding model) can be plugged in through
+``register_embedder`` and selected with the ``EMBEDDER`` setting.
+"""
+
+import re
+import zlib
+from collections.abc import Callable, Sequence
+from typing import Protocol
+
+import numpy as np
+
+from .config import get_settings
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Very common words carry no signal about what an agent does
+_STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have i in is it its me my of on "
+    "or our that the this to we with you your will i'm".split()
+)
+
+
+class Embedder(Protocol):
+    name: str
+    dim: int
+    # True when vectors are term counts that should be IDF-weighted by the index
+    reweight_idf: bool
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Return a (len(texts), dim) float32 matrix."""
+        ...
+
+
+def tokenize(text: str) -> list[str]:
+    words = [
+        w for w in _TOKEN_RE.findall(text.lower()) if w not in _STOPWORDS and not w.isdigit()
+    ]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class HashedTfidfEmbedder:
+    name = "hashed-tfidf"
+    reweight_idf = True
+
+    def __init__(self, dim: int = 2048):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            if not tokens:
+                continue
+            buckets = np.fromiter(
+                (zlib.crc32(t.encode()) % self.dim for t in tokens),
+                dtype=np.int64,
+                count=len(tokens),
+            )
+            counts = np.bincount(buckets, minlength=self.dim).astype(np.float32)
+            nz = counts > 0
+            out[row, nz] = 1.0 + np.log(counts[nz])
+        return out
+
+
+_EMBEDDERS: dict[str, Callable[[], Embedder]] = {
+    HashedTfidfEmbedder.name: HashedTfidfEmbedder,
+}
+
+
+def register_embedder(name: str, factory: Callable[[], Embedder]) -> None:
+    _EMBEDDERS[name] = factory
+
+
+def get_embedder() -> Embedder:
+    name = get_settings().embedder
+    if name not in _EMBEDDERS:
+        raise ValueError(f"Unknown embedder {name!r}. Registered: {sorted(_EMBEDDERS)}")
+    return _EMBEDDERS[name]()
+
+
+def agent_document(agent) -> str:
+    """Text used to embed an agent. Name, tags and capabilities count double."""
+    labels = " ".join([*(agent.capabilities or []), *(agent.tags or [])])
+    return "\n".join(
+        [
+            agent.name,
+            agent.name,
+            agent.tagline or "",
+            agent.description or "",
+            labels,
+            labels,
+            agent.category.replace("-", " "),
+        ]
+    )
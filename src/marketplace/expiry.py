@@ -0,0 +1,118 @@
+"""Expiring tasks that run past their deadline.
+
+A periodic sweep walks ``ix_tasks_status_deadline`` for open tasks whose
+deadline has passed and moves them to ``expired`` a batch at a time: one
+``UPDATE`` for the tasks, one bulk insert of ``TaskEvent`` rows, one
+statement giving back the agents' concurrency slots (capacity.py), one
+cancelling their unsent webhooks (outbox.py), and a notification to each
+buyer. Rows are claimed with ``SKIP LOCKED`` so
+replicas sweeping at the same time split the work.
+"""
+
+import logging
+import uuid
+from collections import Counter
+
+from sqlalchemy import text, update
+from sqlmodel import Session, select
+
+from . import capacity, outbox, push
+from .database import get_engine
+from .models import AgentProfile, Task, TaskEvent, _utcnow
+from .scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ("posted", "assigned", "dispatched", "accepted", "in_progress")
+SWEEP_INTERVAL_SECONDS = 60
+BATCH_SIZE = 500
+
+_INSERT_NOTIFICATION = text("""
+    INSERT INTO notifications (id, user_id, type, title, body)
+    VALUES (:id, :user_id, 'task_expired', :title, :body)
+""")
+
+
+def _notify_buyers(session: Session, rows: list, now) -> None:
+    # The notifications table is created by Postgres-only DDL in main.py
+    notifications = [
+        {
+            "id": uuid.uuid4(),
+            "user_id": row.buyer_id,
+            "title": "Task expired",
+            "body": f'Your task "{row.title}" passed its deadline before it was completed.',
+        }
+        for row in rows
+    ]
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(_INSERT_NOTIFICATION, notifications)
+        for n in notifications:
+            push.publish(session, [n["user_id"]], "notification.created", {
+                "id": n["id"], "type": "task_expired", "title": n["title"],
+                "job_id": None, "created_at": now,
+            })
+    for row in rows:
+        push.publish(session, [row.buyer_id, row.owner_id], "task.status", {
+            "task_id": row.id,
+            "agent_profile_id": row.agent_profile_id,
+            "status": "expired",
+            "previous_status": row.status,
+        })
+
+
+def expire_batch(session: Session, limit: int = BATCH_SIZE) -> int:
+    """Expire up to ``limit`` overdue open tasks. Returns tasks expired."""
+    now = _utcnow()
+    rows = session.exec(
+        select(
+            Task.id, Task.buyer_id, Task.agent_profile_id, Task.status, Task.title,
+            Task.slot_expires_at, AgentProfile.owner_id,
+        )
+        .outerjoin(AgentProfile, AgentProfile.id == Task.agent_profile_id)
+        .where(Task.status.in_(OPEN_STATUSES), Task.deadline < now)
+        .order_by(Task.deadline)
+        .limit(limit)
+        .with_for_update(of=Task, skip_locked=True)
+    ).all()
+    if not rows:
+        return 0
+
+    task_ids = [row.id for row in rows]
+    session.execute(
+        update(Task)
+        .where(Task.id.in_(task_ids))
+        .values(
+            status="expired",
+            updated_at=now,
+            lease_id=None,
+            leased_until=None,
+            slot_expires_at=None,
+            next_match_at=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    # Don't send an agent work on a task that is already dead
+    outbox.cancel_for_tasks(session, task_ids, "task expired")
+    capacity.release_many(session, Counter(
+        row.agent_profile_id for row in rows if row.slot_expires_at is not None
+    ))
+    session.add_all([
+        TaskEvent(task_id=row.id, event_type="expired", event_data={"previous_status": row.status})
+        for row in rows
+    ])
+    _notify_buyers(session, rows, now)
+    session.commit()
+    return len(rows)
+
+
+@periodic(SWEEP_INTERVAL_SECONDS)
+def _expire_job() -> None:
+    expired = 0
+    with Session(get_engine()) as session:
+        while True:
+            n = expire_batch(session)
+            expired += n
+            if n < BATCH_SIZE:
+                break
+    if expired:
+        logger.info(f"Expired {expired} overdue task(s)")
@@ -3,7 +3,8 @@ from datetime import UTC, datetime, timedelta
 
 from sqlmodel import Session, select
 
-from .models import AgentLicense, AgentPricingPlan, AgentProfile
+from . import activity
+from .models import AgentLicense, AgentPricingPlan, AgentProfile, User
 
 
 def generate_license_key() -> str:
@@ -38,6 +39,9 @@ def create_license(
         period_start=now,
     )
     session.add(license)
+    agent = session.get(AgentProfile, agent_profile_id)
+    if agent:
+        session.add(activity.license_purchased(agent, license, session.get(User, buyer_id)))
     session.commit()
     session.refresh(license)
     return license
@@ -0,0 +1,221 @@
+"""Hive post likes and their counters.
+
+A like is unique per (post, liker), enforced by unique indexes, so toggling
+is a ``DELETE`` followed, when nothing was deleted, by an ``INSERT``; a
+concurrent duplicate fails on the index instead of double counting.
+``agent_posts.likes_count`` moves by atomic ``UPDATE ... SET likes_count =
+likes_count + n`` statements.
+
+With ``like_counts_buffered`` enabled, deltas are instead summed in memory
+once their transaction commits and flushed every few seconds, one
+``UPDATE`` per post, so a viral post's row is written a few times a minute
+rather than once per like. Counters then lag by up to a flush interval, and
+deltas still buffered when a process dies are lost.
+"""
+
+import logging
+import threading
+import uuid
+from collections import defaultdict
+
+from sqlalchemy import case, event, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, col, delete, func, select
+
+from .cache import mark_dirty
+from .config import get_settings
+from .database import get_engine
+from .models import AgentPost, AgentPostLike
+from .scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = 5
+
+
+def _liker_filter(user_id: uuid.UUID | None, agent_id: uuid.UUID | None):
+    if user_id is not None:
+        return AgentPostLike.liker_user_id == user_id
+    return AgentPostLike.liker_agent_id == agent_id
+
+
+def _bump_statement(post_id: uuid.UUID, delta: int):
+    new_count = AgentPost.likes_count + delta
+    return (
+        update(AgentPost)
+        .where(AgentPost.id == post_id)
+        .values(likes_count=case((new_count < 0, 0), else_=new_count))
+    )
+
+
+# ── Buffered counters ────────────────────────────────────────────────
+
+
+class LikeBuffer:
+    """Pending like-count deltas per post, shared by the process's threads."""
+
+    def __init__(self):
+        self._deltas: dict[uuid.UUID, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, deltas: dict[uuid.UUID, int]) -> None:
+        with self._lock:
+            for post_id, delta in deltas.items():
+                self._deltas[post_id] += delta
+
+    def pending(self, post_id: uuid.UUID) -> int:
+        with self._lock:
+            return self._deltas.get(post_id, 0)
+
+    def take(self) -> dict[uuid.UUID, int]:
+        with self._lock:
+            deltas = {k: v for k, v in self._deltas.items() if v}
+            self._deltas.clear()
+        return deltas
+
+
+buffer = LikeBuffer()
+
+
+def _buffered() -> bool:
+    return get_settings().like_counts_buffered
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _buffer_on_commit(session):
+    deltas = session.info.pop("like_deltas", None)
+    if deltas:
+        buffer.add(deltas)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("like_deltas", None)
+
+
+def flush_like_counts() -> int:
+    """Write buffered deltas to ``agent_posts``. Returns posts updated."""
+    deltas = buffer.take()
+    if not deltas:
+        return 0
+    try:
+        with Session(get_engine()) as session:
+            # Fixed order keeps concurrent flushes from deadlocking
+            for post_id in sorted(deltas):
+                session.execute(_bump_statement(post_id, deltas[post_id]))
+            mark_dirty(session, "agent_posts")
+            session.commit()
+    except Exception:
+        buffer.add(deltas)  # retried on the next flush
+        raise
+    return len(deltas)
+
+
+@periodic(FLUSH_INTERVAL_SECONDS, run_on_startup=False)
+def _flush_job() -> None:
+    flush_like_counts()
+
+
+# ── Likes ────────────────────────────────────────────────────────────
+
+
+def _add_to_count(session: Session, post_id: uuid.UUID, delta: int) -> None:
+    if _buffered():
+        deltas = session.info.setdefault("like_deltas", defaultdict(int))
+        deltas[post_id] += delta
+    else:
+        session.execute(_bump_statement(post_id, delta))
+        mark_dirty(session, "agent_posts")
+
+
+def toggle_like(
+    session: Session,
+    post_id: uuid.UUID,
+    user_id: uuid.UUID | None = None,
+    agent_id: uuid.UUID | None = None,
+) -> bool:
+    """Like or unlike ``post_id`` as a user or an agent. Returns whether it is now liked.
+
+    The counter change joins the caller's transaction; commit to apply it.
+    """
+    removed = session.execute(
+        delete(AgentPostLike).where(
+            AgentPostLike.post_id == post_id, _liker_filter(user_id, agent_id)
+        )
+    ).rowcount
+    if removed:
+        _add_to_count(session, post_id, -removed)
+        return False
+
+    try:
+        with session.begin_nested():
+            session.add(
+                AgentPostLike(post_id=post_id, liker_user_id=user_id, liker_agent_id=agent_id)
+            )
+    except IntegrityError:
+        # A concurrent request from the same liker got there first
+        return True
+    _add_to_count(session, post_id, 1)
+    return True
+
+
+def like_count(session: Session, post_id: uuid.UUID) -> int:
+    """Current count for ``post_id``, including this process's unflushed likes."""
+    count = session.exec(select(AgentPost.likes_count).where(AgentPost.id == post_id)).one()
+    return max(0, (count or 0) + buffer.pending(post_id))
+
+
+def liked_post_ids(
+    session: Session,
+    post_ids: list[uuid.UUID],
+    user_id: uuid.UUID | None = None,
+    agent_id: uuid.UUID | None = None,
+) -> set[uuid.UUID]:
+    """Which of ``post_ids`` the user or agent has liked, in one query."""
+    if not post_ids or (user_id is None and agent_id is None):
+        return set()
+    return set(
+        session.exec(
+            select(AgentPostLike.post_id).where(
+                col(AgentPostLike.post_id).in_(post_ids), _liker_filter(user_id, agent_id)
+            )
+        ).all()
+    )
+
+
+# ── Maintenance ──────────────────────────────────────────────────────
+
+
+def dedupe_likes(session: Session) -> int:
+    """Drop duplicate likes left by the old check-then-insert toggle.
+
+    Runs before the unique indexes are created; affected posts get their
+    counters recomputed. Returns the number of likes removed.
+    """
+    L = AgentPostLike
+    groups = session.exec(
+        select(L.post_id, L.liker_user_id, L.liker_agent_id)
+        .group_by(L.post_id, L.liker_user_id, L.liker_agent_id)
+        .having(func.count(L.id) > 1)
+    ).all()
+    removed = 0
+    for post_id, user_id, agent_id in groups:
+        likes = session.exec(
+            select(L)
+            .where(L.post_id == post_id, L.liker_user_id == user_id, L.liker_agent_id == agent_id)
+            .order_by(L.created_at)
+        ).all()
+        for like in likes[1:]:
+            session.delete(like)
+            removed += 1
+    if groups:
+        session.flush()
+        for post_id in {g[0] for g in groups}:
+            count = session.exec(select(func.count(L.id)).where(L.post_id == post_id)).one()
+            session.execute(
+                update(AgentPost).where(AgentPost.id == post_id).values(likes_count=count)
+            )
+        session.commit()
+        logger.info(f"Removed {removed} duplicate like(s)")
+    return removed
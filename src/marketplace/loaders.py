@@ -0,0 +1,69 @@
+"""Request-scoped batch loading of related rows.
+
+List endpoints enrich every row with its agent / owner / buyer. Doing that
+with ``session.get`` per row costs one query per row; ``BatchLoader`` instead
+collects the ids a page needs and resolves them with a single ``IN`` query per
+model the first time any of them is read.
+"""
+
+from collections.abc import Iterable
+from typing import Any, TypeVar
+
+from sqlmodel import Session, SQLModel, col, select
+
+ModelT = TypeVar("ModelT", bound=SQLModel)
+
+
+class BatchLoader:
+    """DataLoader-style cache of primary key -> row, keyed by model class."""
+
+    def __init__(self, session: Session):
+        self.session = session
+        self._cache: dict[type, dict[Any, Any]] = {}
+        self._pending: dict[type, set] = {}
+
+    def load(self, model: type[ModelT], ids: Iterable[Any]) -> "BatchLoader":
+        """Queue ids for ``model``; they are fetched together on the next ``get``."""
+        cached = self._cache.setdefault(model, {})
+        pending = self._pending.setdefault(model, set())
+        for id_ in ids:
+            if id_ is not None and id_ not in cached:
+                pending.add(id_)
+        return self
+
+    def get(self, model: type[ModelT], id_: Any) -> ModelT | None:
+        if id_ is None:
+            return None
+        cached = self._cache.setdefault(model, {})
+        if id_ not in cached:
+            self.load(model, [id_])
+            self._dispatch(model)
+        return cached.get(id_)
+
+    def get_many(self, model: type[ModelT], ids: Iterable[Any]) -> dict[Any, ModelT]:
+        ids = list(ids)
+        self.load(model, ids)
+        self._dispatch(model)
+        cached = self._cache[model]
+        return {i: cached[i] for i in ids if cached.get(i) is not None}
+
+    def _dispatch(self, model: type) -> None:
+        pending = self._pending.get(model)
+        if not pending:
+            return
+        self._pending[model] = set()
+        cached = self._cache.setdefault(model, {})
+
+        if len(pending) == 1:
+            # session.get consults the identity map before hitting the DB
+            (id_,) = pending
+            cached[id_] = self.session.get(model, id_)
+            return
+
+        rows = self.session.exec(
+            select(model).where(col(model.id).in_(pending))  # type: ignore[attr-defined]
+        ).all()
+        for row in rows:
+            cached[row.id] = row  # type: ignore[attr-defined]
+        for id_ in pending:
+            cached.setdefault(id_, None)
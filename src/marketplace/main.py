@@ -2,13 +2,19 @@ import logging
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import SQLModel
+from sqlmodel import Session, SQLModel
 
 from .config import get_settings
 from .database import get_engine
 from .routers import agents, auth_routes, chat, messages, payments, posts, proxy, tasks
 from .routers import selfdock, hive, a2a, mission_control, connect, assistant
 from .routers import jobs as jobs_router_mod, notifications as notifications_router_mod
+from .routers import events, work
+# Imported for their periodic jobs and event listeners
+from . import (  # noqa: F401
+    agent_cards, agent_keys, capacity, earnings, expiry, likes, matching, outbox, presence, push,
+    scheduler, stats, tags, trending, vector_index, work_queue,
+)
 
 settings = get_settings()
 
@@ -48,6 +54,8 @@ app.include_router(connect.router)
 app.include_router(assistant.router)
 app.include_router(jobs_router_mod.router)
 app.include_router(notifications_router_mod.router)
+app.include_router(events.router)
+app.include_router(work.router)
 
 
 @app.on_event("startup")
@@ -132,6 +140,29 @@ def on_startup():
         "last_seen_at": "TIMESTAMP",
     })
 
+    _migrate_table("agent_profiles", {
+        "a2a_card": "JSON",
+    })
+
+    _migrate_table("conversations", {
+        "last_message_preview": "VARCHAR",
+        "last_sender_id": "UUID",
+        "unread_by_owner": "INTEGER DEFAULT 0",
+        "unread_by_initiator": "INTEGER DEFAULT 0",
+    })
+    messages.backfill_conversation_summaries(engine)
+
+    task_columns = {c["name"] for c in inspect(engine).get_columns("tasks")}
+    _migrate_table("tasks", {
+        "lease_id": "UUID",
+        "leased_until": "TIMESTAMP",
+        "slot_expires_at": "TIMESTAMP",
+        "next_match_at": "TIMESTAMP",
+        "result_ref": "VARCHAR",
+    })
+    if "slot_expires_at" not in task_columns:
+        capacity.backfill_slots(engine)
+
     # Phase 2 — automation columns on agent_profiles
     _migrate_table("agent_profiles", {
         "agent_mode": "VARCHAR(20) DEFAULT 'chat'",
@@ -203,6 +234,10 @@ def on_startup():
             conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_job_runs_job ON job_runs(job_id)
             """))
+            # Outputs over blobs.INLINE_MAX_BYTES are stored by reference
+            conn.execute(text("""
+                ALTER TABLE job_runs ADD COLUMN IF NOT EXISTS result_ref VARCHAR
+            """))
             conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications(user_id, read)
             """))
@@ -242,7 +277,48 @@ def on_startup():
         # SQLite or table already exists
         pass
 
+    # The like unique indexes need duplicates from the old toggle gone first
+    with Session(engine) as session:
+        likes.dedupe_likes(session)
+
+    # create_all skips indexes on tables that already exist
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(engine, checkfirst=True)
+            except Exception as e:
+                logging.warning(f"Index migration skip {index.name}: {e}")
+
+    # Seed the Mission Control feed and the tag index the first time they exist
+    from .activity import backfill_activity
+
+    with Session(engine) as session:
+        backfill_activity(session)
+        tags.ensure_tag_index(session)
+
+
+@app.on_event("startup")
+async def start_background_jobs():
+    if settings.background_jobs_enabled:
+        scheduler.start()
+    # Always on: task dispatch and A2A pushes are only ever sent by the outbox
+    outbox.start()
+    push.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await scheduler.stop()
+    await outbox.stop()
+    push.stop()
+    likes.flush_like_counts()
+    agent_keys.flush_last_used()
+    presence.flush_presence()
+
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "webhooks": outbox.metrics.snapshot(in_flight=outbox.dispatcher.in_flight()),
+    }
@@ -0,0 +1,333 @@
+"""Routing open tasks to agents.
+
+Tasks posted without an ``agent_profile_id`` are matched here. Each process
+keeps an ``AgentIndex`` of docked agents' routing attributes (category,
+accepted task types, capability and tag terms, historical completion
+latency), refreshed incrementally from ``agent_profiles.updated_at`` like
+vector_index.py. A periodic job then drains open tasks in batches:
+
+* a batch is claimed with ``FOR UPDATE SKIP LOCKED``, so replicas split the
+  backlog instead of racing for it;
+* the index narrows each task to eligible agents by category, and one query
+  loads their live load for the whole batch;
+* candidates are scored on term overlap, spare capacity, heartbeat
+  freshness and speed, and the best one with a free slot is picked;
+* slots are then taken through ``capacity.reserve`` in agent-id order, so
+  replicas lock agent rows in the same order and cannot deadlock.
+
+Tasks nobody can take yet are retried after ``RETRY_SECONDS``; a task whose
+pick was filled by another replica meanwhile is retried on the next pass.
+"""
+
+import logging
+import math
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlmodel import Session, col, or_, select
+
+from . import activity, capacity, outbox, presence
+from .database import get_engine
+from .models import AgentProfile, Task, TaskEvent, _utcnow
+from .pagination import after_cursor
+from .scheduler import periodic
+from .webhook import task_dispatch_body
+
+logger = logging.getLogger(__name__)
+
+MATCH_INTERVAL_SECONDS = 5
+BATCH_SIZE = 500
+RETRY_SECONDS = 60
+INDEX_SYNC_SECONDS = 30
+# Rows stamped this recently may still be uncommitted; re-read them next sync
+SYNC_SETTLE_SECONDS = 5
+LATENCY_REFRESH_SECONDS = 300
+LATENCY_WINDOW_DAYS = 30
+# Completion time that earns half of the speed score
+REFERENCE_LATENCY_SECONDS = 3600
+_SYNC_BATCH = 1000
+_ID_CHUNK = 1000
+
+WEIGHTS = {"overlap": 0.4, "load": 0.25, "freshness": 0.2, "speed": 0.15}
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#.-]{2,}")
+
+
+def _terms(values) -> set[str]:
+    return {str(v).strip().lower() for v in values or [] if str(v).strip()}
+
+
+def task_terms(task: Task) -> set[str]:
+    """What a task asks for: its declared capabilities and tags, else its title."""
+    constraints = task.constraints_json or {}
+    terms = _terms(constraints.get("capabilities")) | _terms(constraints.get("tags"))
+    return terms or set(_WORD.findall(task.title.lower()))
+
+
+# ── Agent index ──────────────────────────────────────────────────────
+
+
+@dataclass
+class AgentEntry:
+    id: uuid.UUID
+    category: str
+    accepted_task_types: frozenset[str]
+    # Declared capabilities and tags, lowercased
+    terms: frozenset[str] = field(default_factory=frozenset)
+
+    @property
+    def routing_keys(self) -> frozenset[str]:
+        """Task categories the agent takes: its own plus any it accepts."""
+        return self.accepted_task_types | {self.category}
+
+
+def _routable(agent: AgentProfile) -> bool:
+    return bool(agent.is_docked) and agent.status == "active"
+
+
+class AgentIndex:
+    """Routing attributes of every routable agent, grouped by task category."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: dict[uuid.UUID, AgentEntry] = {}
+        self._by_type: dict[str, set[uuid.UUID]] = defaultdict(set)
+        self._latency: dict[uuid.UUID, float] = {}
+        self.synced_at: datetime | None = None
+        self._last_sync = 0.0
+        self._last_latency = 0.0
+
+    def _remove(self, agent_id: uuid.UUID) -> None:
+        entry = self._entries.pop(agent_id, None)
+        if entry is not None:
+            for key in entry.routing_keys:
+                self._by_type[key].discard(agent_id)
+
+    def _add(self, agent: AgentProfile) -> None:
+        entry = AgentEntry(
+            id=agent.id,
+            category=agent.category.lower(),
+            accepted_task_types=frozenset(_terms(agent.accepted_task_types)),
+            terms=frozenset(_terms(agent.capabilities) | _terms(agent.tags)),
+        )
+        self._entries[agent.id] = entry
+        for key in entry.routing_keys:
+            self._by_type[key].add(agent.id)
+
+    def sync(self, session: Session) -> int:
+        """Apply agents changed since the last sync. Returns rows touched."""
+        settled = _utcnow() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+        with self._lock:
+            query = select(AgentProfile).order_by(col(AgentProfile.updated_at), col(AgentProfile.id))
+            if self.synced_at is not None:
+                # >= so rows sharing the watermark timestamp are never skipped
+                query = query.where(AgentProfile.updated_at >= self.synced_at)
+            touched, last, watermark = 0, None, self.synced_at
+            while True:
+                # Keyset pages, as in vector_index.py, so mid-sync updates skip nothing
+                page = query
+                if last is not None:
+                    page = page.where(
+                        after_cursor(AgentProfile.updated_at, AgentProfile.id, last.updated_at, last.id)
+                    )
+                batch = session.exec(page.limit(_SYNC_BATCH)).all()
+                if not batch:
+                    break
+                last = batch[-1]
+                for agent in batch:
+                    self._remove(agent.id)
+                    if _routable(agent):
+                        self._add(agent)
+                touched += len(batch)
+                watermark = last.updated_at
+            if watermark is not None:
+                watermark = min(watermark, settled)
+                if self.synced_at is not None:
+                    watermark = max(watermark, self.synced_at)
+            self.synced_at = watermark or datetime.min
+            self._last_sync = time.monotonic()
+            return touched
+
+    def refresh_latency(self, session: Session) -> None:
+        """Average dispatch-to-completion time per agent over the recent window."""
+        if session.get_bind().dialect.name == "postgresql":
+            seconds = func.extract("epoch", Task.completed_at - Task.dispatched_at)
+        else:
+            seconds = (func.julianday(Task.completed_at) - func.julianday(Task.dispatched_at)) * 86400
+        rows = session.exec(
+            select(Task.agent_profile_id, func.avg(seconds))
+            .where(
+                Task.status == "completed",
+                Task.completed_at >= _utcnow() - timedelta(days=LATENCY_WINDOW_DAYS),
+                Task.dispatched_at.is_not(None),
+            )
+            .group_by(Task.agent_profile_id)
+        ).all()
+        with self._lock:
+            self._latency = {agent_id: float(avg) for agent_id, avg in rows if avg is not None}
+            self._last_latency = time.monotonic()
+
+    def refresh_if_stale(self, session: Session) -> None:
+        now = time.monotonic()
+        if now - self._last_sync >= INDEX_SYNC_SECONDS:
+            self.sync(session)
+        if now - self._last_latency >= LATENCY_REFRESH_SECONDS:
+            self.refresh_latency(session)
+
+    def candidates(self, category: str) -> list[AgentEntry]:
+        with self._lock:
+            return [self._entries[i] for i in self._by_type.get(category.lower(), ())]
+
+    def latency(self, agent_id: uuid.UUID) -> float | None:
+        return self._latency.get(agent_id)
+
+
+index = AgentIndex()
+
+
+# ── Scoring ──────────────────────────────────────────────────────────
+
+
+def score(
+    terms: set[str],
+    entry: AgentEntry,
+    active: int,
+    limit: int,
+    seen_at: datetime | None,
+    latency: float | None,
+) -> float:
+    overlap = len(terms & entry.terms) / len(terms) if terms else 0.0
+    load = 1 - active / limit if limit > 0 else 0.0
+    if presence.is_online(seen_at):
+        freshness = 1.0
+    elif seen_at is None:
+        freshness = 0.0
+    else:
+        freshness = math.exp(-(_utcnow() - seen_at).total_seconds() / 3600)
+    speed = 0.5 if latency is None else REFERENCE_LATENCY_SECONDS / (REFERENCE_LATENCY_SECONDS + latency)
+    return (
+        WEIGHTS["overlap"] * overlap
+        + WEIGHTS["load"] * load
+        + WEIGHTS["freshness"] * freshness
+        + WEIGHTS["speed"] * speed
+    )
+
+
+# ── Matching ─────────────────────────────────────────────────────────
+
+
+def _load_agents(session: Session, agent_ids: set[uuid.UUID]) -> dict[uuid.UUID, AgentProfile]:
+    """Candidates with a free slot right now, in chunked ``IN`` queries."""
+    ids = list(agent_ids)
+    agents = {}
+    for start in range(0, len(ids), _ID_CHUNK):
+        for agent in session.exec(
+            select(AgentProfile).where(
+                col(AgentProfile.id).in_(ids[start : start + _ID_CHUNK]),
+                AgentProfile.is_docked,
+                AgentProfile.status == "active",
+                AgentProfile.active_task_count < AgentProfile.max_concurrent_tasks,
+            )
+        ):
+            agents[agent.id] = agent
+    return agents
+
+
+def _assign(session: Session, task: Task, agent: AgentProfile, match_score: float) -> None:
+    task.agent_profile_id = agent.id
+    task.status = "assigned"
+    task.next_match_at = None
+    task.updated_at = _utcnow()
+    session.add(task)
+    session.add(TaskEvent(
+        task_id=task.id,
+        event_type="assigned",
+        event_data={"agent_id": str(agent.id), "matched": True, "score": round(match_score, 4)},
+    ))
+    session.add(activity.task_started(agent, task))
+    if agent.webhook_url:
+        outbox.enqueue(session, agent, outbox.TASK_DISPATCH, task_dispatch_body(task), task_id=task.id)
+
+
+def match_batch(session: Session, limit: int = BATCH_SIZE) -> tuple[int, int]:
+    """Match one batch of due open tasks. Returns (tasks claimed, tasks assigned)."""
+    now = _utcnow()
+    tasks = session.exec(
+        select(Task)
+        .where(
+            Task.status == "posted",
+            Task.agent_profile_id.is_(None),
+            Task.deadline > now,
+            or_(Task.next_match_at.is_(None), Task.next_match_at <= now),
+        )
+        .order_by(Task.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not tasks:
+        return 0, 0
+
+    entries = {task.id: index.candidates(task.category) for task in tasks}
+    agents = _load_agents(session, {e.id for es in entries.values() for e in es})
+    seen = presence.last_seen(agents.values())
+    load = {agent_id: agent.active_task_count for agent_id, agent in agents.items()}
+
+    # Pick every task's agent first, then reserve in agent-id order: the
+    # agent row locks are held until commit, and a fixed order keeps replicas
+    # matching overlapping agents from deadlocking on them
+    picks = []
+    for task in tasks:
+        terms = task_terms(task)
+        best = None
+        for entry in entries[task.id]:
+            agent = agents.get(entry.id)
+            if agent is None or load[agent.id] >= agent.max_concurrent_tasks:
+                continue
+            match_score = score(
+                terms, entry, load[agent.id], agent.max_concurrent_tasks,
+                seen[agent.id], index.latency(agent.id),
+            )
+            if best is None or match_score > best[0]:
+                best = (match_score, agent.id)
+        if best is None:
+            task.next_match_at = now + timedelta(seconds=RETRY_SECONDS)
+            session.add(task)
+            continue
+        load[best[1]] += 1
+        picks.append((best[1], task, best[0]))
+
+    assigned = 0
+    # Reservations only touch agent rows; task writes go out together at commit
+    with session.no_autoflush:
+        for agent_id, task, match_score in sorted(picks, key=lambda p: p[0]):
+            # A slot lost to another replica leaves the task due for the next pass
+            if capacity.reserve(session, agents[agent_id], task):
+                _assign(session, task, agents[agent_id], match_score)
+                assigned += 1
+    session.commit()
+    return len(tasks), assigned
+
+
+def run_matching() -> int:
+    """Drain due open tasks batch by batch. Returns tasks assigned."""
+    total = 0
+    with Session(get_engine()) as session:
+        index.refresh_if_stale(session)
+        while True:
+            claimed, assigned = match_batch(session)
+            total += assigned
+            if claimed < BATCH_SIZE:
+                return total
+
+
+@periodic(MATCH_INTERVAL_SECONDS)
+def _match_job() -> None:
+    assigned = run_matching()
+    if assigned:
+        logger.info(f"Matched {assigned} open task(s) to agents")
@@ -1,7 +1,7 @@
 import uuid
 from datetime import UTC, datetime
 
-from sqlalchemy import JSON, Column, Text
+from sqlalchemy import JSON, Column, Index, Text
 from sqlmodel import Field, SQLModel
 
 
@@ -54,6 +54,12 @@ class User(SQLModel, table=True):
 
 class AgentProfile(SQLModel, table=True):
     __tablename__ = "agent_profiles"
+    __table_args__ = (
+        # Serves /agents/featured without sorting the whole catalogue
+        Index("ix_agent_profiles_featured", "is_featured", "is_docked", "avg_rating"),
+        # Keyset scans for the A2A change feed and vector index sync
+        Index("ix_agent_profiles_updated", "updated_at", "id"),
+    )
 
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     owner_id: uuid.UUID = Field(foreign_key="users.id", index=True)
@@ -162,10 +168,40 @@ class AgentProfile(SQLModel, table=True):
 
     last_seen_at: datetime | None = None
 
+    # Rendered A2A Agent Card, kept current by agent_cards.py
+    a2a_card: dict | None = Field(
+        default=None, sa_column=Column("a2a_card", JSON(none_as_null=True), nullable=True)
+    )
+
     created_at: datetime = Field(default_factory=_utcnow)
     updated_at: datetime = Field(default_factory=_utcnow)
 
 
+# ── Category Stats ───────────────────────────────────────────────────
+
+
+class CategoryStat(SQLModel, table=True):
+    """Docked agent count per category, kept in step with agent writes (see stats.py)."""
+
+    __tablename__ = "category_stats"
+
+    category: str = Field(primary_key=True)
+    docked_count: int = Field(default=0)
+    featured_count: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=_utcnow)
+
+
+class AgentTrendScore(SQLModel, table=True):
+    """Time-decayed activity score per agent, recomputed by ``trending.py``."""
+
+    __tablename__ = "agent_trend_scores"
+
+    agent_profile_id: uuid.UUID = Field(foreign_key="agent_profiles.id", primary_key=True)
+    score: float = Field(default=0.0, index=True)
+    star_count: int = Field(default=0)  # all-time stars on published posts
+    computed_at: datetime = Field(default_factory=_utcnow)
+
+
 # ── Agent API Key ─────────────────────────────────────────────────────
 
 
@@ -174,7 +210,7 @@ class AgentApiKey(SQLModel, table=True):
 
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     agent_id: uuid.UUID = Field(foreign_key="agent_profiles.id", index=True)
-    key_hash: str
+    key_hash: str = Field(unique=True, index=True)
     key_prefix: str  # first 8 chars for display
     name: str
     is_active: bool = Field(default=True)
@@ -187,6 +223,11 @@ class AgentApiKey(SQLModel, table=True):
 
 class Conversation(SQLModel, table=True):
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Inbox listing, newest first, for either participant
+        Index("ix_conversations_initiator_last", "initiator_id", "last_message_at"),
+        Index("ix_conversations_owner_last", "owner_id", "last_message_at"),
+    )
 
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     agent_profile_id: uuid.UUID = Field(foreign_key="agent_profiles.id", index=True)
@@ -196,6 +237,13 @@ class Conversation(SQLModel, table=True):
     last_message_at: datetime = Field(default_factory=_utcnow)
     is_read_by_owner: bool = Field(default=False)
     is_read_by_initiator: bool = Field(default=True)
+
+    # Denormalised from messages, maintained by routers/messages.py
+    last_message_preview: str | None = None
+    last_sender_id: uuid.UUID | None = None
+    unread_by_owner: int = Field(default=0)
+    unread_by_initiator: int = Field(default=0)
+
     created_at: datetime = Field(default_factory=_utcnow)
 
 
@@ -204,6 +252,11 @@ class Conversation(SQLModel, table=True):
 
 class Message(SQLModel, table=True):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Thread pages and the bulk mark-as-read UPDATE
+        Index("ix_messages_conversation_created", "conversation_id", "created_at", "id"),
+        Index("ix_messages_conversation_unread", "conversation_id", "is_read", "sender_id"),
+    )
 
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     conversation_id: uuid.UUID = Field(foreign_key="conversations.id", index=True)
@@ -221,6 +274,20 @@ class Message(SQLModel, table=True):
 
 class Task(SQLModel, table=True):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Per-agent task counts and "last task" lookups on the creator dashboard
+        Index("ix_tasks_agent_created", "agent_profile_id", "created_at"),
+        # Pull queue claims and expired-lease sweeps (work_queue.py)
+        Index("ix_tasks_agent_status", "agent_profile_id", "status", "created_at"),
+        Index("ix_tasks_status_leased", "status", "leased_until"),
+        # Slot recounts and expired-slot sweeps (capacity.py)
+        Index("ix_tasks_agent_slot", "agent_profile_id", "slot_expires_at"),
+        Index("ix_tasks_slot_expires", "slot_expires_at"),
+        # Open tasks due for matching (matching.py)
+        Index("ix_tasks_status_next_match", "status", "next_match_at"),
+        # Overdue task sweeps (expiry.py)
+        Index("ix_tasks_status_deadline", "status", "deadline"),
+    )
 
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
 
@@ -255,6 +322,13 @@ class Task(SQLModel, table=True):
 
     # Dispatch tracking
     dispatched_at: datetime | None = None
+    # Pull queue lease: set while an agent holds the task via /agents/{id}/work
+    lease_id: uuid.UUID | None = None
+    leased_until: datetime | None = None
+    # Set while the task holds one of the agent's concurrency slots (capacity.py)
+    slot_expires_at: datetime | None = None
+    # Open tasks no agent could take are retried from this time (matching.py)
+    next_match_at: datetime | None = None
     accepted_at: datetime | None = None
     completed_at: datetime | None = None
     failed_at: datetime | None = None
@@ -264,6 +338,8 @@ class Task(SQLModel, table=True):
         default=None,
         sa_column=Column("result_json", JSON, nullable=True),
     )
+    # Set when a blob store is configured and the result exceeded blobs.INLINE_MAX_BYTES
+    result_ref: str | None = None
     result_summary: str | None = None
     execution_time_seconds: int | None = None
     confidence_score: float | None = None
@@ -295,6 +371,32 @@ class TaskEvent(SQLModel, table=True):
     created_at: datetime = Field(default_factory=_utcnow)
 
 
+class WebhookDelivery(SQLModel, table=True):
+    """Outbox row for one webhook call to an agent, sent by ``outbox.py``."""
+
+    __tablename__ = "webhook_deliveries"
+    __table_args__ = (
+        Index("ix_webhook_deliveries_due", "status", "next_attempt_at"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    agent_profile_id: uuid.UUID = Field(foreign_key="agent_profiles.id", index=True)
+    task_id: uuid.UUID | None = Field(default=None, foreign_key="tasks.id", index=True)
+    event_type: str  # task.dispatch, a2a_task
+    body: dict = Field(
+        default_factory=dict,
+        sa_column=Column("body", JSON, nullable=False, server_default="{}"),
+    )
+    status: str = Field(default="pending")  # pending, delivered, dead, cancelled
+    attempts: int = Field(default=0)
+    # Due time while pending; pushed out by a lease while a dispatcher holds it
+    next_attempt_at: datetime = Field(default_factory=_utcnow)
+    last_status_code: int | None = None
+    last_error: str | None = Field(default=None, sa_column=Column("last_error", Text, nullable=True))
+    created_at: datetime = Field(default_factory=_utcnow)
+    delivered_at: datetime | None = None
+
+
 # ── Agent Post (tweet-like content) ──────────────────────────
 
 
@@ -357,6 +459,27 @@ class AgentPost(SQLModel, table=True):
     updated_at: datetime = Field(default_factory=_utcnow)
 
 
+class PostTag(SQLModel, table=True):
+    """One row per tag of a published post, maintained by ``tags.py``."""
+
+    __tablename__ = "post_tags"
+    __table_args__ = (Index("ix_post_tags_tag_created", "tag", "created_at", "post_id"),)
+
+    tag: str = Field(primary_key=True)
+    post_id: uuid.UUID = Field(foreign_key="agent_posts.id", primary_key=True, index=True)
+    created_at: datetime  # copied from the post for tag feeds
+
+
+class TagStat(SQLModel, table=True):
+    """Published post count and decayed trending score per tag (see ``tags.py``)."""
+
+    __tablename__ = "tag_stats"
+
+    tag: str = Field(primary_key=True)
+    post_count: int = Field(default=0)
+    trend_score: float = Field(default=0.0, index=True)
+
+
 # ── Agent Pricing Plan ──────────────────────────────────────
 
 
@@ -485,6 +608,11 @@ class CreditPurchase(SQLModel, table=True):
 
 class CreatorEarnings(SQLModel, table=True):
     __tablename__ = "creator_earnings"
+    __table_args__ = (
+        # Recent-earnings listing and the not-yet-rolled-up tail (see earnings.py)
+        Index("ix_creator_earnings_owner_created", "owner_id", "created_at"),
+        Index("ix_creator_earnings_created", "created_at"),
+    )
 
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     agent_profile_id: uuid.UUID = Field(foreign_key="agent_profiles.id", index=True)
@@ -496,6 +624,33 @@ class CreatorEarnings(SQLModel, table=True):
     created_at: datetime = Field(default_factory=_utcnow)
 
 
+class EarningsRollup(SQLModel, table=True):
+    """CreatorEarnings summed per (owner, agent) and hour or day (see earnings.py)."""
+
+    __tablename__ = "earnings_rollups"
+    __table_args__ = (
+        Index("ix_earnings_rollups_owner", "owner_id", "period", "bucket_start"),
+    )
+
+    period: str = Field(primary_key=True)  # hour, day
+    owner_id: uuid.UUID = Field(primary_key=True, foreign_key="users.id")
+    agent_profile_id: uuid.UUID = Field(primary_key=True, foreign_key="agent_profiles.id")
+    bucket_start: datetime = Field(primary_key=True)
+    gross_credits: int = Field(default=0)
+    platform_fee_credits: int = Field(default=0)
+    net_credits: int = Field(default=0)
+    earnings_count: int = Field(default=0)
+
+
+class RollupWatermark(SQLModel, table=True):
+    """Everything before ``rolled_until`` has been folded into the named rollup."""
+
+    __tablename__ = "rollup_watermarks"
+
+    name: str = Field(primary_key=True)
+    rolled_until: datetime
+
+
 # ── Agent Post Like ───────────────────────────────────────────────────
 
 
@@ -526,9 +681,33 @@ class TrialSession(SQLModel, table=True):
 
 class AgentPostLike(SQLModel, table=True):
     __tablename__ = "agent_post_likes"
+    __table_args__ = (
+        # One like per liker; NULLs keep user and agent likes apart
+        Index("uq_agent_post_likes_user", "post_id", "liker_user_id", unique=True),
+        Index("uq_agent_post_likes_agent", "post_id", "liker_agent_id", unique=True),
+    )
 
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     post_id: uuid.UUID = Field(foreign_key="agent_posts.id", index=True)
     liker_user_id: uuid.UUID | None = Field(default=None, foreign_key="users.id", index=True)
     liker_agent_id: uuid.UUID | None = Field(default=None, foreign_key="agent_profiles.id", index=True)
     created_at: datetime = Field(default_factory=_utcnow)
+
+
+# ── Activity Events ──────────────────────────────────────────────────
+
+
+class ActivityEvent(SQLModel, table=True):
+    """Append-only Mission Control feed entry, written where the activity happens."""
+
+    __tablename__ = "activity_events"
+    __table_args__ = (Index("ix_activity_events_owner_created", "owner_id", "created_at", "id"),)
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    owner_id: uuid.UUID = Field(foreign_key="users.id")  # owner of the agent
+    agent_profile_id: uuid.UUID = Field(foreign_key="agent_profiles.id")
+    agent_name: str
+    event_type: str  # task_started, task_completed, hive_post, license_purchased
+    description: str
+    subject_id: uuid.UUID | None = None  # task, post or license the event is about
+    created_at: datetime = Field(default_factory=_utcnow)
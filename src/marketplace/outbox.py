@@ -0,0 +1,420 @@
+"""Transactional webhook outbox.
+
+Writers call ``enqueue`` to add a ``webhook_deliveries`` row in the same
+transaction as the change it announces, so a committed task always gets
+delivered and a rolled-back one never is. A dispatcher running in each API
+process drains due rows:
+
+* rows are claimed with ``FOR UPDATE SKIP LOCKED`` and leased by pushing
+  ``next_attempt_at`` out, so replicas never send the same row at once and a
+  crashed sender's rows become due again when the lease ends;
+* sends share one pooled ``httpx.AsyncClient``, capped at ``MAX_IN_FLIGHT``
+  overall and ``MAX_PER_AGENT`` per agent in each process. The per-agent cap
+  is applied when claiming, so one agent's backlog cannot take every slot,
+  and a claimed row is sent straight away, well inside its lease;
+* the lease is the row's new ``next_attempt_at``; a result is recorded only
+  if the row still carries it, so a sender whose lease ran out and was
+  re-claimed elsewhere cannot overwrite the other attempt;
+* failures are retried with exponential backoff and full jitter. After
+  ``MAX_ATTEMPTS``, or on a non-retryable 4xx, the row is dead-lettered
+  (``status = 'dead'``) and its task marked ``dispatch_failed``.
+
+Bodies are signed at send time with the agent's current webhook secret, and
+carry ``X-Swarm-Delivery-Id`` so agents can drop retried duplicates.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+import httpx
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, col, select
+
+from . import capacity
+from .database import get_engine
+from .models import AgentProfile, Task, TaskEvent, WebhookDelivery, _utcnow
+from .webhook import sign_payload
+
+logger = logging.getLogger(__name__)
+
+TASK_DISPATCH = "task.dispatch"
+A2A_TASK = "a2a_task"
+
+MAX_IN_FLIGHT = 64
+MAX_PER_AGENT = 4
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 3600
+REQUEST_TIMEOUT_SECONDS = 30
+# Covers the request plus recording its outcome
+LEASE_SECONDS = 120
+# Due rows examined per claimed slot, so a busy agent's rows cannot fill a claim
+CLAIM_WINDOW_FACTOR = 4
+POLL_SECONDS = 2.0
+_RETRYABLE_4XX = {408, 425, 429}
+
+
+# ── Enqueue ──────────────────────────────────────────────────────────
+
+
+def enqueue(
+    session: Session,
+    agent: AgentProfile,
+    event_type: str,
+    body: dict,
+    task_id: uuid.UUID | None = None,
+) -> WebhookDelivery:
+    """Queue a webhook to ``agent``; it is sent once ``session`` commits."""
+    delivery = WebhookDelivery(
+        agent_profile_id=agent.id, task_id=task_id, event_type=event_type, body=body
+    )
+    session.add(delivery)
+    session.info["outbox_wakeup"] = True
+    return delivery
+
+
+def cancel_for_tasks(session: Session, task_ids: list[uuid.UUID], reason: str) -> None:
+    """Stop unsent deliveries for ``task_ids`` once ``session`` commits.
+
+    A send already in flight records nothing afterwards: its row is no
+    longer pending.
+    """
+    if not task_ids:
+        return
+    session.execute(
+        update(WebhookDelivery)
+        .where(col(WebhookDelivery.task_id).in_(task_ids), WebhookDelivery.status == "pending")
+        .values(status="cancelled", last_error=reason)
+        .execution_options(synchronize_session=False)
+    )
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _wake_on_commit(session):
+    if session.info.pop("outbox_wakeup", False):
+        dispatcher.wake()
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("outbox_wakeup", None)
+
+
+# ── Metrics ──────────────────────────────────────────────────────────
+
+
+class DeliveryMetrics:
+    """Per-process delivery counters, exposed on ``/health``."""
+
+    def __init__(self):
+        self._counts: dict[str, int] = defaultdict(int)
+        self._latency_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str, latency_ms: float | None = None) -> None:
+        with self._lock:
+            self._counts[outcome] += 1
+            if latency_ms is not None:
+                self._latency_ms += latency_ms
+
+    def snapshot(self, in_flight: int = 0) -> dict:
+        with self._lock:
+            delivered = self._counts["delivered"]
+            return {
+                "delivered": delivered,
+                "retried": self._counts["retried"],
+                "dead_lettered": self._counts["dead"],
+                "in_flight": in_flight,
+                "avg_delivery_ms": round(self._latency_ms / delivered, 1) if delivered else None,
+            }
+
+
+metrics = DeliveryMetrics()
+
+
+# ── Claim & record (worker threads) ──────────────────────────────────
+
+
+@dataclass
+class Claim:
+    delivery_id: uuid.UUID
+    agent_id: uuid.UUID
+    task_id: uuid.UUID | None
+    event_type: str
+    body: dict
+    attempts: int
+    url: str | None
+    secret_hash: str
+    leased_until: datetime
+
+
+def claim_due(limit: int, busy: dict[uuid.UUID, int]) -> tuple[list[Claim], bool]:
+    """Lease up to ``limit`` due deliveries to this process.
+
+    ``busy`` is this process's in-flight count per agent: agents already at
+    ``MAX_PER_AGENT`` are skipped, and no agent is given more than its
+    remaining share. Returns the claims and whether due rows were left
+    behind for that reason.
+    """
+    now = _utcnow()
+    leased_until = now + timedelta(seconds=LEASE_SECONDS)
+    saturated = [agent_id for agent_id, n in busy.items() if n >= MAX_PER_AGENT]
+    with Session(get_engine()) as session:
+        query = (
+            select(WebhookDelivery, AgentProfile)
+            .join(AgentProfile, AgentProfile.id == WebhookDelivery.agent_profile_id)
+            .where(WebhookDelivery.status == "pending", WebhookDelivery.next_attempt_at <= now)
+        )
+        if saturated:
+            query = query.where(col(WebhookDelivery.agent_profile_id).not_in(saturated))
+        rows = session.exec(
+            query.order_by(WebhookDelivery.next_attempt_at)
+            .limit(limit * CLAIM_WINDOW_FACTOR)
+            .with_for_update(of=WebhookDelivery, skip_locked=True)
+        ).all()
+        claims = []
+        taken: dict[uuid.UUID, int] = defaultdict(int)
+        held_back = False
+        for delivery, agent in rows:
+            if len(claims) == limit:
+                break
+            if busy.get(agent.id, 0) + taken[agent.id] >= MAX_PER_AGENT:
+                held_back = True  # left due, and unlocked at commit
+                continue
+            taken[agent.id] += 1
+            delivery.next_attempt_at = leased_until
+            session.add(delivery)
+            claims.append(Claim(
+                delivery_id=delivery.id,
+                agent_id=agent.id,
+                task_id=delivery.task_id,
+                event_type=delivery.event_type,
+                body=dict(delivery.body),
+                attempts=delivery.attempts,
+                url=agent.webhook_url,
+                secret_hash=agent.webhook_secret_hash or "",
+                leased_until=leased_until,
+            ))
+        session.commit()
+    return claims, held_back
+
+
+def _backoff(attempts: int) -> float:
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempts))
+
+
+def _on_delivered(session: Session, delivery: WebhookDelivery, response: dict | None) -> None:
+    if delivery.task_id is None:
+        return
+    task = session.get(Task, delivery.task_id)
+    if task is None or task.status not in ("posted", "assigned"):
+        return  # cancelled, or the agent already called back
+    task.status = "dispatched"
+    task.dispatched_at = _utcnow()
+    session.add(task)
+    session.add(TaskEvent(task_id=task.id, event_type="dispatched", event_data={"response": response}))
+
+
+def _on_dead(session: Session, delivery: WebhookDelivery, error: str) -> None:
+    if delivery.task_id is None:
+        return
+    task = session.get(Task, delivery.task_id)
+    if task is None or task.status not in ("posted", "assigned"):
+        return
+    task.status = "dispatch_failed"
+    task.error_message = error
+    session.add(task)
+    capacity.release(session, task)
+    session.add(TaskEvent(
+        task_id=task.id,
+        event_type="dispatch_failed",
+        event_data={"error": error, "attempts": delivery.attempts},
+    ))
+
+
+def record_result(
+    claim: Claim,
+    status_code: int | None,
+    response: dict | None = None,
+    error: str | None = None,
+) -> str:
+    """Store the outcome of one attempt. Returns delivered, retried, dead or stale.
+
+    ``stale`` means the lease had run out and the row was claimed again (or
+    settled) by another sender; this attempt's outcome is dropped.
+    """
+    with Session(get_engine()) as session:
+        delivery = session.exec(
+            select(WebhookDelivery)
+            .where(WebhookDelivery.id == claim.delivery_id)
+            .with_for_update()
+        ).first()
+        if (
+            delivery is None
+            or delivery.status != "pending"
+            or delivery.next_attempt_at != claim.leased_until
+        ):
+            return "stale"
+        delivery.attempts = claim.attempts + 1
+        delivery.last_status_code = status_code
+        if error is None:
+            outcome = "delivered"
+            delivery.status = "delivered"
+            delivery.delivered_at = _utcnow()
+            delivery.last_error = None
+            _on_delivered(session, delivery, response)
+        else:
+            permanent = (
+                status_code is not None
+                and 400 <= status_code < 500
+                and status_code not in _RETRYABLE_4XX
+            )
+            delivery.last_error = error
+            if permanent or delivery.attempts >= MAX_ATTEMPTS:
+                outcome = "dead"
+                delivery.status = "dead"
+                _on_dead(session, delivery, error)
+            else:
+                outcome = "retried"
+                delivery.next_attempt_at = _utcnow() + timedelta(seconds=_backoff(delivery.attempts))
+        session.add(delivery)
+        session.commit()
+    return outcome
+
+
+# ── Dispatcher (event loop) ──────────────────────────────────────────
+
+
+class Dispatcher:
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._in_flight: set[asyncio.Task] = set()
+        # Sends in flight per agent; agents drop out when they reach zero
+        self._agent_in_flight: dict[uuid.UUID, int] = {}
+
+    def wake(self) -> None:
+        """Check for due deliveries now. Safe to call from any thread."""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="webhook-dispatcher")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, *self._in_flight, return_exceptions=True)
+        self._task = None
+        self._loop = None
+
+    async def _run(self) -> None:
+        limits = httpx.Limits(max_connections=MAX_IN_FLIGHT, max_keepalive_connections=MAX_IN_FLIGHT)
+        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT_SECONDS, limits=limits) as client:
+            try:
+                while True:
+                    free = MAX_IN_FLIGHT - len(self._in_flight)
+                    claims, held_back = [], False
+                    if free > 0:
+                        try:
+                            claims, held_back = await asyncio.to_thread(
+                                claim_due, free, dict(self._agent_in_flight)
+                            )
+                        except Exception as e:
+                            logger.warning(f"Webhook outbox claim failed: {e}")
+                    for claim in claims:
+                        busy = self._agent_in_flight.get(claim.agent_id, 0)
+                        self._agent_in_flight[claim.agent_id] = busy + 1
+                        task = asyncio.create_task(self._process(client, claim))
+                        self._in_flight.add(task)
+                        task.add_done_callback(self._in_flight.discard)
+                    if claims and (len(claims) == free or held_back):
+                        continue  # more may be due, for agents not yet at their cap
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), POLL_SECONDS)
+                    except TimeoutError:
+                        pass
+            finally:
+                for task in self._in_flight:
+                    task.cancel()
+
+    async def _process(self, client: httpx.AsyncClient, claim: Claim) -> None:
+        try:
+            await self._deliver(client, claim)
+        finally:
+            remaining = self._agent_in_flight.get(claim.agent_id, 1) - 1
+            if remaining > 0:
+                self._agent_in_flight[claim.agent_id] = remaining
+            else:
+                self._agent_in_flight.pop(claim.agent_id, None)
+            self._wake.set()  # the agent may have more due rows waiting on its cap
+
+    async def _deliver(self, client: httpx.AsyncClient, claim: Claim) -> None:
+        status_code, response, error, latency_ms = await self._send(client, claim)
+        try:
+            outcome = await asyncio.to_thread(record_result, claim, status_code, response, error)
+        except Exception as e:
+            # The lease runs out and the delivery is retried
+            logger.warning(f"Could not record webhook delivery {claim.delivery_id}: {e}")
+            return
+        if outcome == "stale":
+            logger.info(f"Webhook delivery {claim.delivery_id} lease lost; outcome dropped")
+            return
+        metrics.record(outcome, latency_ms if outcome == "delivered" else None)
+        if outcome == "dead":
+            logger.warning(f"Webhook delivery {claim.delivery_id} dead-lettered: {error}")
+
+    async def _send(self, client: httpx.AsyncClient, claim: Claim):
+        if not claim.url:
+            return None, None, "Agent has no webhook configured", None
+        body = {**claim.body, "timestamp": datetime.now(UTC).isoformat()}
+        body_bytes = json.dumps(body).encode()
+        headers = {
+            "Content-Type": "application/json",
+            "X-Swarm-Signature": sign_payload(body_bytes, claim.secret_hash),
+            "X-Swarm-Delivery-Id": str(claim.delivery_id),
+        }
+        if claim.task_id:
+            headers["X-Swarm-Task-Id"] = str(claim.task_id)
+        started = time.monotonic()
+        try:
+            response = await client.post(claim.url, content=body_bytes, headers=headers)
+        except httpx.HTTPError as e:
+            return None, None, f"{type(e).__name__}: {e}", None
+        latency_ms = (time.monotonic() - started) * 1000
+        if response.is_error:
+            return response.status_code, None, f"HTTP {response.status_code}", latency_ms
+        try:
+            result = response.json()
+        except ValueError:
+            result = None
+        return response.status_code, result, None, latency_ms
+
+
+dispatcher = Dispatcher()
+
+
+def start() -> None:
+    dispatcher.start()
+
+
+async def stop() -> None:
+    await dispatcher.stop()
@@ -0,0 +1,37 @@
+"""Opaque keyset cursors for paginated and incremental endpoints.
+
+A cursor encodes the sort key of the last row a client has seen, usually a
+``(timestamp, id)`` pair, so the next page is a plain ``WHERE key > cursor``
+range scan instead of an ``OFFSET`` that re-reads every skipped row.
+"""
+
+import base64
+import uuid
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(ts: datetime | None, row_id: uuid.UUID) -> str:
+    raw = f"{ts.isoformat() if ts else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime | None, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, _, row_id = raw.partition("|")
+        return (datetime.fromisoformat(ts) if ts else None), uuid.UUID(row_id)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+
+
+def after_cursor(ts_column, id_column, ts: datetime, row_id: uuid.UUID):
+    """``(ts_column, id_column) > (ts, row_id)``, portable across backends."""
+    return or_(ts_column > ts, and_(ts_column == ts, id_column > row_id))
+
+
+def before_cursor(ts_column, id_column, ts: datetime, row_id: uuid.UUID):
+    """``(ts_column, id_column) < (ts, row_id)``, for newest-first feeds."""
+    return or_(ts_column < ts, and_(ts_column == ts, id_column < row_id))
@@ -0,0 +1,172 @@
+"""Agent presence from heartbeats.
+
+A heartbeat only records "agent X was seen at T" in a TTL map: process
+memory, or Redis when ``REDIS_URL`` is configured so every replica sees the
+same state. Agents seen within ``ONLINE_TTL_SECONDS`` are online. A periodic
+job copies recent sightings to ``agent_profiles.last_seen_at`` in one bulk
+``UPDATE``, so a heartbeat never writes to the database and a restart keeps
+the last known ``last_seen_at``.
+
+Without Redis each replica knows only the heartbeats it received itself, and
+falls back to the flushed column for the rest. That column lags by at most
+``FLUSH_INTERVAL_SECONDS``, which is well inside the online window.
+"""
+
+import logging
+import threading
+import uuid
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, update
+
+from .database import get_engine
+from .models import AgentProfile, _utcnow
+from .redis_client import get_redis
+from .scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+ONLINE_TTL_SECONDS = 90
+FLUSH_INTERVAL_SECONDS = 30
+_KEY_PREFIX = "presence:"
+_FLUSH_BATCH = 1000
+
+
+class _MemoryBackend:
+    def __init__(self):
+        self._seen: dict[str, datetime] = {}
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+
+    def beat(self, agent_id: str, at: datetime) -> None:
+        with self._lock:
+            self._seen[agent_id] = at
+            self._dirty.add(agent_id)
+
+    def last_seen(self, agent_ids: list[str]) -> dict[str, datetime]:
+        with self._lock:
+            return {a: self._seen[a] for a in agent_ids if a in self._seen}
+
+    def take_dirty(self) -> dict[str, datetime]:
+        cutoff = _utcnow() - timedelta(seconds=ONLINE_TTL_SECONDS)
+        with self._lock:
+            dirty = {a: self._seen[a] for a in self._dirty if a in self._seen}
+            self._dirty.clear()
+            # Expired sightings are persisted by now; the column takes over
+            self._seen = {a: t for a, t in self._seen.items() if t >= cutoff or a in dirty}
+        return dirty
+
+    def restore_dirty(self, dirty: dict[str, datetime]) -> None:
+        """Queue sightings from a failed flush for the next one."""
+        with self._lock:
+            for agent_id, at in dirty.items():
+                self._seen[agent_id] = max(at, self._seen.get(agent_id, at))
+                self._dirty.add(agent_id)
+
+
+class _RedisBackend:
+    def __init__(self, client):
+        self.client = client
+
+    def beat(self, agent_id: str, at: datetime) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(f"{_KEY_PREFIX}seen:{agent_id}", at.isoformat(), ex=ONLINE_TTL_SECONDS)
+        pipe.sadd(f"{_KEY_PREFIX}dirty", agent_id)
+        pipe.execute()
+
+    def last_seen(self, agent_ids: list[str]) -> dict[str, datetime]:
+        if not agent_ids:
+            return {}
+        values = self.client.mget([f"{_KEY_PREFIX}seen:{a}" for a in agent_ids])
+        return {
+            a: datetime.fromisoformat(v.decode() if isinstance(v, bytes) else v)
+            for a, v in zip(agent_ids, values)
+            if v is not None
+        }
+
+    def take_dirty(self) -> dict[str, datetime]:
+        dirty: dict[str, datetime] = {}
+        while True:
+            batch = self.client.spop(f"{_KEY_PREFIX}dirty", _FLUSH_BATCH) or []
+            ids = [a.decode() if isinstance(a, bytes) else a for a in batch]
+            dirty.update(self.last_seen(ids))
+            if len(batch) < _FLUSH_BATCH:
+                return dirty
+
+
+_memory_backend = _MemoryBackend()
+
+
+def _backend():
+    client = get_redis()
+    return _RedisBackend(client) if client is not None else _memory_backend
+
+
+def heartbeat(agent_id: uuid.UUID) -> datetime:
+    """Record that ``agent_id`` is alive. Returns the recorded time."""
+    now = _utcnow()
+    try:
+        _backend().beat(str(agent_id), now)
+    except Exception as e:
+        logger.warning(f"Presence backend unavailable, keeping heartbeat locally: {e}")
+        _memory_backend.beat(str(agent_id), now)
+    return now
+
+
+def last_seen(agents: Iterable[AgentProfile]) -> dict[uuid.UUID, datetime | None]:
+    """Latest sighting per agent: a live heartbeat, else the persisted column."""
+    agents = list(agents)
+    try:
+        live = _backend().last_seen([str(a.id) for a in agents])
+    except Exception as e:
+        logger.warning(f"Presence backend unavailable: {e}")
+        live = _memory_backend.last_seen([str(a.id) for a in agents])
+    result = {}
+    for agent in agents:
+        seen = [t for t in (live.get(str(agent.id)), agent.last_seen_at) if t is not None]
+        result[agent.id] = max(seen) if seen else None
+    return result
+
+
+def is_online(seen_at: datetime | None) -> bool:
+    return seen_at is not None and _utcnow() - seen_at < timedelta(seconds=ONLINE_TTL_SECONDS)
+
+
+def presence_fields(seen_at: datetime | None) -> dict:
+    """``is_online`` and ``last_seen_at`` as served by the API."""
+    return {
+        "is_online": is_online(seen_at),
+        "last_seen_at": seen_at.isoformat() if seen_at else None,
+    }
+
+
+def flush_presence() -> int:
+    """Persist recent heartbeats to ``agent_profiles.last_seen_at``. Returns agents updated."""
+    dirty = _memory_backend.take_dirty()
+    backend = _backend()
+    if backend is not _memory_backend:
+        dirty.update(backend.take_dirty())
+    if not dirty:
+        return 0
+    table = AgentProfile.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("agent_id"))
+        .values(last_seen_at=bindparam("seen_at"))
+    )
+    rows = [{"agent_id": uuid.UUID(a), "seen_at": t} for a, t in sorted(dirty.items())]
+    # Not a catalogue change: response caches are deliberately left alone
+    try:
+        with get_engine().begin() as conn:
+            conn.execute(stmt, rows)
+    except Exception:
+        # Redis has already popped its ids too, so both go back in memory
+        _memory_backend.restore_dirty(dirty)
+        raise
+    return len(rows)
+
+
+@periodic(FLUSH_INTERVAL_SECONDS, run_on_startup=False)
+def _flush_job() -> None:
+    flush_presence()
@@ -0,0 +1,250 @@
+"""Real-time push of per-user events to WebSocket and SSE clients.
+
+Writers call ``publish(session, user_ids, type, data)``; events are held on
+the session and sent only once it commits. Delivery goes through Postgres
+``NOTIFY`` on the ``swarm_events`` channel, and every API replica runs a
+``LISTEN`` bridge that fans received events out to its locally connected
+clients, so publishers (including ``worker.py``) never need to know where a
+user is connected. Without Postgres (local development, tests) events are
+delivered in-process.
+
+Payloads are a small JSON object ``{"user_ids": [...], "type": ..., "data":
+{...}}``. NOTIFY caps a payload at 8000 bytes, so events carry ids and short
+previews; clients fetch anything larger through the REST API.
+"""
+
+import asyncio
+import json
+import logging
+import select as io_select
+import threading
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.orm import object_session
+
+from .database import get_engine
+from .models import AgentProfile, Task
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "swarm_events"
+MAX_PAYLOAD_BYTES = 7900
+QUEUE_SIZE = 256
+LISTEN_POLL_SECONDS = 5.0
+RECONNECT_SECONDS = 5.0
+
+
+# ── Hub: local subscribers ───────────────────────────────────────────
+
+
+class Subscription:
+    """A connected client's queue of events, read from the event loop."""
+
+    def __init__(self, hub: "Hub", user_id: str, loop: asyncio.AbstractEventLoop):
+        self.hub = hub
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def _offer(self, evt: dict) -> None:
+        try:
+            self.queue.put_nowait(evt)
+        except asyncio.QueueFull:
+            logger.warning(f"Dropping push event for slow client of user {self.user_id}")
+
+    async def get(self, timeout: float) -> dict | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class Hub:
+    def __init__(self):
+        self._subs: dict[str, set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: uuid.UUID | str) -> Subscription:
+        sub = Subscription(self, str(user_id), asyncio.get_running_loop())
+        with self._lock:
+            self._subs[sub.user_id].add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.user_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.user_id]
+
+    def dispatch(self, message: dict) -> None:
+        """Hand an event to local subscribers. Safe to call from any thread."""
+        evt = {"id": message.get("id"), "type": message["type"], "data": message.get("data", {})}
+        with self._lock:
+            targets = [s for uid in message.get("user_ids", []) for s in self._subs.get(uid, ())]
+        for sub in targets:
+            sub.loop.call_soon_threadsafe(sub._offer, evt)
+
+    def connected_users(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+
+hub = Hub()
+
+
+# ── Publishing ───────────────────────────────────────────────────────
+
+
+def _message(user_ids: Iterable, event_type: str, data: dict) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_ids": sorted({str(u) for u in user_ids if u is not None}),
+        "type": event_type,
+        "data": jsonable_encoder(data),
+    }
+
+
+def publish(session, user_ids: Iterable, event_type: str, data: dict) -> None:
+    """Push ``event_type`` to ``user_ids`` once ``session`` commits."""
+    message = _message(user_ids, event_type, data)
+    if message["user_ids"]:
+        session.info.setdefault("push_events", []).append(message)
+
+
+def _uses_notify(engine) -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def _send(messages: list[dict]) -> None:
+    engine = get_engine()
+    if not _uses_notify(engine):
+        for message in messages:
+            hub.dispatch(message)
+        return
+    with engine.connect() as conn:
+        for message in messages:
+            payload = json.dumps(message, separators=(",", ":"))
+            if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+                logger.warning(f"Push event {message['type']} too large for NOTIFY; dropped")
+                continue
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                         {"channel": CHANNEL, "payload": payload})
+        conn.commit()
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _send_on_commit(session):
+    messages = session.info.pop("push_events", None)
+    if messages:
+        try:
+            _send(messages)
+        except Exception as e:
+            # Push is best-effort: clients still see the change on their next fetch
+            logger.warning(f"Push delivery failed: {e}")
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("push_events", None)
+
+
+# Task status transitions are published wherever they happen
+@event.listens_for(Task, "after_insert")
+@event.listens_for(Task, "after_update")
+def _task_status_changed(mapper, connection, task: Task) -> None:
+    history = inspect(task).attrs.status.history
+    session = object_session(task)
+    if not history.has_changes() or session is None:
+        return
+    owner_id = None
+    if task.agent_profile_id:
+        # Batched writes flush many tasks of one agent; look its owner up once
+        owners = session.info.setdefault("agent_owners", {})
+        if task.agent_profile_id not in owners:
+            owners[task.agent_profile_id] = connection.execute(
+                select(AgentProfile.owner_id).where(AgentProfile.id == task.agent_profile_id)
+            ).scalar()
+        owner_id = owners[task.agent_profile_id]
+    publish(
+        session,
+        [task.buyer_id, owner_id],
+        "task.status",
+        {
+            "task_id": task.id,
+            "agent_profile_id": task.agent_profile_id,
+            "status": task.status,
+            "previous_status": history.deleted[0] if history.deleted else None,
+        },
+    )
+
+
+# ── LISTEN bridge ────────────────────────────────────────────────────
+
+
+class _ListenBridge(threading.Thread):
+    """Relays NOTIFYs on ``CHANNEL`` from Postgres to the local hub."""
+
+    def __init__(self, engine):
+        super().__init__(name="push-listen", daemon=True)
+        self.engine = engine
+        self._stopping = threading.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.warning(f"Push LISTEN connection lost: {e}")
+                self._stopping.wait(RECONNECT_SECONDS)
+
+    def _listen(self) -> None:
+        raw = self.engine.raw_connection()
+        try:
+            conn = raw.driver_connection
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL}")
+            logger.info(f"Listening for push events on {CHANNEL}")
+            while not self._stopping.is_set():
+                if io_select.select([conn], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        hub.dispatch(json.loads(notify.payload))
+                    except (ValueError, KeyError) as e:
+                        logger.warning(f"Ignoring malformed push event: {e}")
+        finally:
+            raw.invalidate()
+
+
+_bridge: _ListenBridge | None = None
+
+
+def start() -> None:
+    global _bridge
+    engine = get_engine()
+    if _bridge is None and _uses_notify(engine):
+        _bridge = _ListenBridge(engine)
+        _bridge.start()
+
+
+def stop() -> None:
+    global _bridge
+    if _bridge is not None:
+        _bridge.stop()
+        _bridge = None
@@ -0,0 +1,31 @@
+import logging
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+_redis_checked = False
+
+
+def get_redis():
+    """Return a shared Redis client, or None when REDIS_URL is unset or redis is not installed."""
+    global _redis_client, _redis_checked
+    if not _redis_checked:
+        _redis_checked = True
+        url = get_settings().redis_url
+        if url:
+            try:
+                import redis as redis_lib
+
+                _redis_client = redis_lib.Redis.from_url(url)
+            except ImportError:
+                logger.warning("REDIS_URL is set but the redis package is not installed")
+    return _redis_client
+
+
+def set_redis(client) -> None:
+    """Override Redis client (for testing)."""
+    global _redis_client, _redis_checked
+    _redis_client = client
+    _redis_checked = True
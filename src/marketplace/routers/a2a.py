@@ -3,60 +3,30 @@ Google A2A (Agent-to-Agent) Protocol Integration.
 Spec: https://google.github.io/A2A
 """
 
+import json
 import uuid
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlmodel import Session, select
+from sqlmodel import Session, col, select
 
-from ..database import get_session
+from .. import activity, blobs, capacity, outbox, presence
+from ..agent_cards import card_for, card_with_presence, is_listed
+from ..cache import cached_json
+from ..database import get_engine, get_session
 from ..models import AgentProfile, Task
+from ..pagination import after_cursor, decode_cursor, encode_cursor
 
 router = APIRouter(prefix="/a2a", tags=["A2A"])
 
-RAILWAY_URL = "https://swarm-api.railway.app"  # override via env if needed
-
-
-# ── Helpers ──────────────────────────────────────────────────────────
-
-
-def _build_agent_card(agent: AgentProfile) -> dict:
-    skills = [
-        {
-            "id": cap.lower().replace(" ", "-"),
-            "name": cap,
-            "description": f"{agent.name} can handle: {cap}",
-        }
-        for cap in (agent.capabilities or [])
-    ] or [
-        {
-            "id": "general",
-            "name": "General Assistant",
-            "description": agent.tagline or agent.description or "",
-        }
-    ]
-
-    return {
-        "name": agent.name,
-        "description": agent.tagline or agent.description or "",
-        "url": f"{RAILWAY_URL}/a2a/agents/{agent.id}",
-        "version": "1.0",
-        "capabilities": {
-            "streaming": False,
-            "pushNotifications": bool(agent.webhook_url),
-        },
-        "skills": skills,
-        "defaultInputModes": ["text/plain"],
-        "defaultOutputModes": ["text/plain"],
-        "swarm_meta": {
-            "agent_id": str(agent.id),
-            "slug": agent.slug,
-            "category": agent.category,
-            "is_docked": agent.is_docked,
-            "status": agent.status,
-        },
-    }
+REGISTRY_PAGE_SIZE = 100
+REGISTRY_MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 500
+# The change feed stops this far behind "now" so rows from transactions that
+# are still committing cannot land behind a cursor a crawler already holds.
+CHANGES_SETTLE_SECONDS = 5
 
 
 # ── Schemas ──────────────────────────────────────────────────────────
@@ -81,12 +51,18 @@ class A2ATaskRequest(BaseModel):
 
 
 @router.get("/agents/{agent_id}/agent.json")
-def get_agent_card(agent_id: uuid.UUID, session: Session = Depends(get_session)):
-    """Return A2A Agent Card for the given agent."""
+def get_agent_card(
+    agent_id: uuid.UUID, session: Session = Depends(get_session)
+):
+    """Return A2A Agent Card for the given agent, with live presence.
+
+    Not response-cached: presence changes without any table write. The card
+    itself is precomputed, so this is one primary-key read.
+    """
     agent = session.get(AgentProfile, agent_id)
     if not agent or agent.status != "active":
         raise HTTPException(404, "Agent not found or inactive")
-    return _build_agent_card(agent)
+    return card_with_presence(agent, presence.last_seen([agent])[agent.id])
 
 
 @router.post("/agents/{agent_id}/tasks", status_code=201)
@@ -97,7 +73,7 @@ def create_a2a_task(
 ):
     """
     Accept an A2A task, map to SWARM Task model.
-    Dispatches to agent webhook if configured.
+    Queues delivery to the agent webhook if configured (see outbox.py).
     Returns A2A task response with status 'submitted'.
     """
     agent = session.get(AgentProfile, agent_id)
@@ -118,7 +94,8 @@ def create_a2a_task(
         category=agent.category,
         budget_cents=0,
         deadline=datetime(2099, 12, 31),
-        status="posted",
+        # Bound to the agent already: wait for the webhook or a pull, not matching
+        status="assigned",
         inputs_json={
             "a2a_client_task_id": req.id,
             "a2a_message": {
@@ -127,30 +104,26 @@ def create_a2a_task(
             },
         },
     )
+    if not capacity.reserve(session, agent, task, lease=capacity.OPEN_ENDED_LEASE):
+        raise HTTPException(429, "Agent is at max capacity")
     session.add(task)
+    session.add(activity.task_started(agent, task))
+    if agent.webhook_url:
+        outbox.enqueue(
+            session,
+            agent,
+            outbox.A2A_TASK,
+            {
+                "event": "a2a_task",
+                "task_id": str(task.id),
+                "a2a_client_task_id": req.id,
+                "message": task.inputs_json["a2a_message"],
+            },
+            task_id=task.id,
+        )
     session.commit()
     session.refresh(task)
 
-    # Optionally dispatch to webhook
-    if agent.webhook_url:
-        try:
-            import httpx
-            httpx.post(
-                agent.webhook_url,
-                json={
-                    "event": "a2a_task",
-                    "task_id": str(task.id),
-                    "a2a_client_task_id": req.id,
-                    "message": {
-                        "role": req.message.role,
-                        "parts": [{"type": p.type, "text": p.text} for p in req.message.parts],
-                    },
-                },
-                timeout=5,
-            )
-        except Exception:
-            pass  # best-effort dispatch
-
     return {
         "id": req.id,
         "swarm_task_id": str(task.id),
@@ -183,6 +156,7 @@ def get_a2a_task(
         "in_progress": "working",
         "completed": "completed",
         "failed": "failed",
+        "dispatch_failed": "failed",
         "cancelled": "canceled",
         "expired": "failed",
     }
@@ -195,24 +169,115 @@ def get_a2a_task(
         "created_at": task.created_at.isoformat(),
     }
 
-    if task.status == "completed" and task.result_json:
-        response["result"] = {
-            "role": "agent",
-            "parts": [{"type": "text", "text": task.result_summary or str(task.result_json)}],
-        }
-    elif task.status == "failed":
+    if task.status == "completed" and (task.result_json or task.result_ref):
+        text = task.result_summary
+        if not text and task.result_ref:
+            try:
+                text = blobs.read(task.result_ref).decode()
+            except blobs.BlobNotFound:
+                raise HTTPException(404, "Result payload is missing from the blob store")
+        elif not text:
+            text = str(task.result_json)
+        response["result"] = {"role": "agent", "parts": [{"type": "text", "text": text}]}
+    elif task.status in ("failed", "dispatch_failed"):
         response["error"] = task.error_message or "Task failed"
 
     return response
 
 
+def _listed_agents():
+    return select(AgentProfile).where(
+        AgentProfile.status == "active",
+        AgentProfile.is_docked == True,  # noqa: E712
+    )
+
+
 @router.get("/registry")
-def get_a2a_registry(session: Session = Depends(get_session)):
-    """Return all active agents as A2A Agent Cards — SWARM's public registry."""
-    agents = session.exec(
-        select(AgentProfile).where(
-            AgentProfile.status == "active",
-            AgentProfile.is_docked == True,  # noqa: E712
-        )
-    ).all()
-    return [_build_agent_card(a) for a in agents]
+def get_a2a_registry(
+    request: Request,
+    limit: int = Query(REGISTRY_PAGE_SIZE, ge=1, le=REGISTRY_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    session: Session = Depends(get_session),
+):
+    """Return active agents as A2A Agent Cards — SWARM's public registry.
+
+    Paginated by agent id; the next page is advertised in the ``Link`` and
+    ``X-Next-Cursor`` headers. Use ``/registry.ndjson`` to fetch everything in
+    one stream, and ``/registry/changes`` to follow updates incrementally.
+    """
+    def build():
+        query = _listed_agents().order_by(col(AgentProfile.id)).limit(limit)
+        if cursor:
+            _, after_id = decode_cursor(cursor)
+            query = query.where(AgentProfile.id > after_id)
+        agents = session.exec(query).all()
+        return [card_for(a) for a in agents]
+
+    def headers_for(cards: list[dict]) -> dict[str, str]:
+        if len(cards) < limit:
+            return {}
+        next_cursor = encode_cursor(None, uuid.UUID(cards[-1]["swarm_meta"]["agent_id"]))
+        next_url = request.url.include_query_params(cursor=next_cursor, limit=limit)
+        return {"Link": f'<{next_url}>; rel="next"', "X-Next-Cursor": next_cursor}
+
+    return cached_json(request, ["agent_profiles"], build, headers_for=headers_for)
+
+
+@router.get("/registry.ndjson")
+def stream_a2a_registry():
+    """Stream every active agent card as newline-delimited JSON."""
+    def generate():
+        # Own session: the response body outlives the request's dependencies
+        with Session(get_engine()) as session:
+            rows = session.exec(
+                _listed_agents()
+                .order_by(col(AgentProfile.id))
+                .execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE)
+            )
+            for agent in rows:
+                yield json.dumps(card_for(agent), separators=(",", ":")) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.get("/registry/changes")
+def get_a2a_registry_changes(
+    since: str | None = None,
+    limit: int = Query(REGISTRY_PAGE_SIZE, ge=1, le=REGISTRY_MAX_PAGE_SIZE),
+    session: Session = Depends(get_session),
+):
+    """Agents added, updated or removed from the registry since ``since``.
+
+    Pass the returned ``next_cursor`` back as ``since`` to continue; omit it to
+    start from the beginning. ``has_more`` is false once the feed is caught up.
+    """
+    settled = datetime.now(UTC).replace(tzinfo=None) - timedelta(seconds=CHANGES_SETTLE_SECONDS)
+    query = (
+        select(AgentProfile)
+        .where(AgentProfile.updated_at <= settled)
+        .order_by(col(AgentProfile.updated_at), col(AgentProfile.id))
+        .limit(limit)
+    )
+    if since:
+        ts, after_id = decode_cursor(since)
+        if ts is None:
+            raise HTTPException(400, "Invalid cursor")
+        query = query.where(after_cursor(AgentProfile.updated_at, AgentProfile.id, ts, after_id))
+    agents = session.exec(query).all()
+
+    changes = []
+    for agent in agents:
+        listed = is_listed(agent)
+        changes.append({
+            "agent_id": str(agent.id),
+            "updated_at": agent.updated_at.isoformat(),
+            "removed": not listed,
+            "card": card_for(agent) if listed else None,
+        })
+
+    next_cursor = encode_cursor(agents[-1].updated_at, agents[-1].id) if agents else since
+    return {
+        "changes": changes,
+        "next_cursor": next_cursor,
+        "has_more": len(agents) == limit,
+    }
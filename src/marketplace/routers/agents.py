@@ -1,17 +1,21 @@
 import uuid
 from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlmodel import Session, col, func, select
 
+from .. import activity
 from ..auth import get_current_user
+from ..cache import cached_json
 from ..database import get_session
 from ..licenses import create_license, generate_license_key
+from ..loaders import BatchLoader
 from ..models import (
     AGENT_CATEGORIES,
     AgentLicense,
     AgentPricingPlan,
     AgentProfile,
+    AgentTrendScore,
     Conversation,
     Message,
     ProxyUsageLog,
@@ -46,15 +50,19 @@ from ..schemas import (
 )
 from ..encryption import encrypt_api_key, mask_api_key
 from ..llm import validate_api_key, has_platform_key
-from ..slug import ensure_unique_slug, generate_slug
+from ..slug import flush_with_unique_slug, generate_slug
+from ..stats import get_category_counts, record_agent_change, stat_key
+from ..vector_index import get_agent_index, is_searchable
 from ..webhook import generate_webhook_secret, ping_webhook
 
 router = APIRouter(tags=["agents"])
 
 
-def _enrich(profile: AgentProfile, session: Session) -> AgentResponse:
+def _enrich(
+    profile: AgentProfile, session: Session, loader: BatchLoader | None = None
+) -> AgentResponse:
     resp = AgentResponse.model_validate(profile)
-    owner = session.get(User, profile.owner_id)
+    owner = (loader or BatchLoader(session)).get(User, profile.owner_id)
     resp.owner_display_name = (owner.display_name or owner.email) if owner else None
     has_llm = profile.has_api_key or has_platform_key()
     resp.is_chat_ready = bool((profile.system_prompt or profile.openai_assistant_id) and has_llm)
@@ -71,6 +79,11 @@ def _enrich(profile: AgentProfile, session: Session) -> AgentResponse:
     return resp
 
 
+def _enrich_many(profiles: list[AgentProfile], session: Session) -> list[AgentResponse]:
+    loader = BatchLoader(session).load(User, [p.owner_id for p in profiles])
+    return [_enrich(p, session, loader) for p in profiles]
+
+
 # ── Create / Dock ────────────────────────────────────────────────────
 
 
@@ -92,7 +105,6 @@ def create_agent_profile(
         raise HTTPException(400, f"Agent limit reached. Maximum {MAX_AGENTS_PER_USER} agents per user.")
 
     base_slug = generate_slug(data.name)
-    slug = ensure_unique_slug(session, base_slug)
 
     now = datetime.now(UTC).replace(tzinfo=None)
     if data.listing_type not in ("chat", "openclaw"):
@@ -105,7 +117,7 @@ def create_agent_profile(
     profile = AgentProfile(
         owner_id=user.id,
         name=data.name,
-        slug=slug,
+        slug=base_slug,
         tagline=data.tagline,
         description=data.description,
         category=data.category,
@@ -127,7 +139,8 @@ def create_agent_profile(
         openclaw_version=data.openclaw_version,
         price_per_message_credits=price_credits,
     )
-    session.add(profile)
+    flush_with_unique_slug(session, profile, base_slug)
+    record_agent_change(session, None, profile)
     session.commit()
     session.refresh(profile)
     return _enrich(profile, session)
@@ -140,7 +153,7 @@ def create_agent_profile(
 def browse_agents(
     category: str | None = None,
     search: str | None = None,
-    sort: str = Query(default="newest", pattern="^(newest|popular|rating)$"),
+    sort: str = Query(default="newest", pattern="^(newest|popular|rating|trending)$"),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=50),
     session: Session = Depends(get_session),
@@ -165,6 +178,14 @@ def browse_agents(
         query = query.order_by(col(AgentProfile.avg_rating).desc().nulls_last())
     elif sort == "popular":
         query = query.order_by(col(AgentProfile.total_hires).desc())
+    elif sort == "trending":
+        # Agents without recent activity follow, newest first
+        query = query.outerjoin(
+            AgentTrendScore, AgentTrendScore.agent_profile_id == AgentProfile.id
+        ).order_by(
+            func.coalesce(AgentTrendScore.score, 0).desc(),
+            col(AgentProfile.created_at).desc(),
+        )
     else:
         query = query.order_by(col(AgentProfile.created_at).desc())
 
@@ -172,41 +193,74 @@ def browse_agents(
     query = query.offset(offset).limit(limit)
 
     profiles = session.exec(query).all()
-    return [_enrich(p, session) for p in profiles]
+    return _enrich_many(profiles, session)
+
+
+# ── Semantic search (public) ─────────────────────────────────────────
+
+
+def _ranked_profiles(
+    hits: list[tuple[uuid.UUID, float]], session: Session, category: str | None, limit: int
+) -> list[AgentProfile]:
+    profiles = BatchLoader(session).get_many(AgentProfile, [agent_id for agent_id, _ in hits])
+    ranked = [
+        profiles[agent_id]
+        for agent_id, _ in hits
+        if agent_id in profiles
+        and is_searchable(profiles[agent_id])
+        and (category is None or profiles[agent_id].category == category)
+    ]
+    return ranked[:limit]
+
+
+@router.get("/agents/search", response_model=list[AgentResponse])
+def search_agents(
+    q: str = Query(min_length=1, max_length=500),
+    category: str | None = None,
+    limit: int = Query(default=10, ge=1, le=50),
+    session: Session = Depends(get_session),
+):
+    """Natural-language agent search, ranked by semantic similarity."""
+    index = get_agent_index()
+    index.sync_if_stale(session)
+    # Over-fetch so category filtering still fills the page
+    hits = index.query(q, k=limit * 5 if category else limit)
+    return _enrich_many(_ranked_profiles(hits, session, category, limit), session)
 
 
 # ── Featured (public) ────────────────────────────────────────────────
 
 
 @router.get("/agents/featured", response_model=list[AgentResponse])
-def get_featured_agents(session: Session = Depends(get_session)):
-    profiles = session.exec(
-        select(AgentProfile)
-        .where(
-            AgentProfile.is_featured == True,  # noqa: E712
-            AgentProfile.is_docked == True,  # noqa: E712
-        )
-        .order_by(col(AgentProfile.avg_rating).desc().nulls_last())
-        .limit(6)
-    ).all()
-    return [_enrich(p, session) for p in profiles]
+def get_featured_agents(request: Request, session: Session = Depends(get_session)):
+    def build():
+        profiles = session.exec(
+            select(AgentProfile)
+            .where(
+                AgentProfile.is_featured == True,  # noqa: E712
+                AgentProfile.is_docked == True,  # noqa: E712
+            )
+            .order_by(col(AgentProfile.avg_rating).desc().nulls_last())
+            .limit(6)
+        ).all()
+        return _enrich_many(profiles, session)
+
+    return cached_json(request, ["agent_profiles", "users"], build)
 
 
 # ── Categories (public) ──────────────────────────────────────────────
 
 
 @router.get("/agents/categories")
-def get_categories(session: Session = Depends(get_session)):
-    counts = session.exec(
-        select(AgentProfile.category, func.count(AgentProfile.id))
-        .where(AgentProfile.is_docked == True)  # noqa: E712
-        .group_by(AgentProfile.category)
-    ).all()
-    count_map = {cat: cnt for cat, cnt in counts}
-    return [
-        {"name": cat, "count": count_map.get(cat, 0)}
-        for cat in AGENT_CATEGORIES
-    ]
+def get_categories(request: Request, session: Session = Depends(get_session)):
+    def build():
+        count_map = get_category_counts(session)
+        return [
+            {"name": cat, "count": count_map.get(cat, 0)}
+            for cat in AGENT_CATEGORIES
+        ]
+
+    return cached_json(request, ["category_stats"], build)
 
 
 # ── My Agents (JWT) ─────────────────────────────────────────────────
@@ -222,20 +276,40 @@ def list_my_agents(
         .where(AgentProfile.owner_id == user.id)
         .order_by(col(AgentProfile.created_at).desc())
     ).all()
-    return [_enrich(p, session) for p in profiles]
+    return _enrich_many(profiles, session)
 
 
 # ── Get by slug (public) ────────────────────────────────────────────
 
 
 @router.get("/agents/{slug}", response_model=AgentResponse)
-def get_agent_by_slug(slug: str, session: Session = Depends(get_session)):
+def get_agent_by_slug(slug: str, request: Request, session: Session = Depends(get_session)):
+    def build():
+        profile = session.exec(
+            select(AgentProfile).where(AgentProfile.slug == slug)
+        ).first()
+        if not profile:
+            raise HTTPException(404, "Agent not found")
+        return _enrich(profile, session)
+
+    return cached_json(request, ["agent_profiles", "users"], build)
+
+
+@router.get("/agents/{slug}/similar", response_model=list[AgentResponse])
+def get_similar_agents(
+    slug: str,
+    limit: int = Query(default=5, ge=1, le=20),
+    session: Session = Depends(get_session),
+):
     profile = session.exec(
         select(AgentProfile).where(AgentProfile.slug == slug)
     ).first()
     if not profile:
         raise HTTPException(404, "Agent not found")
-    return _enrich(profile, session)
+    index = get_agent_index()
+    index.sync_if_stale(session)
+    hits = index.similar(profile, k=limit)
+    return _enrich_many(_ranked_profiles(hits, session, None, limit), session)
 
 
 # ── Update (JWT, owner) ─────────────────────────────────────────────
@@ -253,10 +327,7 @@ def update_agent_profile(
         raise HTTPException(404, "Agent not found")
 
     update_data = data.model_dump(exclude_unset=True)
-
-    if "name" in update_data and update_data["name"] != profile.name:
-        base_slug = generate_slug(update_data["name"])
-        update_data["slug"] = ensure_unique_slug(session, base_slug, exclude_id=id)
+    rename = "name" in update_data and update_data["name"] != profile.name
 
     if "category" in update_data and update_data["category"] not in AGENT_CATEGORIES:
         raise HTTPException(400, f"Invalid category. Must be one of: {AGENT_CATEGORIES}")
@@ -267,11 +338,15 @@ def update_agent_profile(
     if "listing_type" in update_data and update_data["listing_type"] not in ("chat", "openclaw"):
         raise HTTPException(400, "listing_type must be 'chat' or 'openclaw'")
 
+    before = stat_key(profile)
     for field, value in update_data.items():
         setattr(profile, field, value)
 
     profile.updated_at = datetime.now(UTC).replace(tzinfo=None)
+    if rename:
+        flush_with_unique_slug(session, profile, generate_slug(profile.name), exclude_id=id)
     session.add(profile)
+    record_agent_change(session, before, profile)
     session.commit()
     session.refresh(profile)
     return _enrich(profile, session)
@@ -291,10 +366,12 @@ def delete_agent_profile(
         raise HTTPException(404, "Agent not found")
 
     # Soft delete: undock the agent
+    before = stat_key(profile)
     profile.is_docked = False
     profile.status = "undocked"
     profile.updated_at = datetime.now(UTC).replace(tzinfo=None)
     session.add(profile)
+    record_agent_change(session, before, profile)
     session.commit()
 
 
@@ -545,6 +622,7 @@ def hire_agent(
         period_start=now,
     )
     session.add(license)
+    session.add(activity.license_purchased(agent, license, user))
 
     # Bump hire count
     agent.total_hires += 1
@@ -932,14 +1010,18 @@ def list_my_licenses(
         select(AgentLicense).where(AgentLicense.buyer_id == user.id)
     ).all()
 
+    loader = BatchLoader(session)
+    loader.load(AgentProfile, [lic.agent_profile_id for lic in licenses])
+    loader.load(AgentPricingPlan, [lic.pricing_plan_id for lic in licenses])
+
     results = []
     for lic in licenses:
         resp = LicenseResponse.model_validate(lic)
-        agent = session.get(AgentProfile, lic.agent_profile_id)
+        agent = loader.get(AgentProfile, lic.agent_profile_id)
         if agent:
             resp.agent_name = agent.name
             resp.agent_slug = agent.slug
-        plan = session.get(AgentPricingPlan, lic.pricing_plan_id)
+        plan = loader.get(AgentPricingPlan, lic.pricing_plan_id)
         if plan:
             resp.plan_name = plan.plan_name
             resp.plan_type = plan.plan_type
@@ -7,6 +7,7 @@ from sqlmodel import Session, select
 from ..auth import get_current_user
 from ..database import get_session
 from ..encryption import decrypt_api_key
+from ..loaders import BatchLoader
 from ..models import AgentLicense, AgentProfile, AgentSession, AgentChatMessage, User, _utcnow
 from ..schemas import (
     SessionResponse,
@@ -351,8 +352,5 @@ def list_my_sessions(
         .order_by(AgentSession.updated_at.desc())
     ).all()
 
-    result = []
-    for s in sessions:
-        agent = session.get(AgentProfile, s.agent_profile_id)
-        result.append(_session_response(s, agent))
-    return result
+    loader = BatchLoader(session).load(AgentProfile, [s.agent_profile_id for s in sessions])
+    return [_session_response(s, loader.get(AgentProfile, s.agent_profile_id)) for s in sessions]
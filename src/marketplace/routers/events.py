@@ -0,0 +1,104 @@
+"""Live event stream for the signed-in user (see push.py).
+
+Browsers' ``EventSource`` and ``WebSocket`` cannot set an Authorization
+header, so both endpoints also accept the JWT as a ``token`` query parameter.
+Events carry ids and short previews; on (re)connect clients should refetch
+the resources they display, then apply events as they arrive.
+"""
+
+import asyncio
+import json
+import uuid
+
+import jwt
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from ..auth import decode_jwt
+from ..database import get_engine
+from ..models import User
+from ..push import hub
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+KEEPALIVE_SECONDS = 15.0
+
+
+def _authenticate(authorization: str | None, token: str | None) -> uuid.UUID:
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(401, "Not authenticated")
+    try:
+        user_id = uuid.UUID(decode_jwt(token)["sub"])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(401, "Token expired")
+    except (jwt.InvalidTokenError, KeyError, ValueError):
+        raise HTTPException(401, "Invalid token")
+    with Session(get_engine()) as session:
+        if not session.get(User, user_id):
+            raise HTTPException(401, "User not found")
+    return user_id
+
+
+@router.get("/stream")
+async def stream_events(request: Request, token: str | None = None):
+    """Server-Sent Events stream of the user's messages, notifications and task updates."""
+    user_id = await asyncio.to_thread(
+        _authenticate, request.headers.get("authorization"), token
+    )
+    sub = hub.subscribe(user_id)
+
+    async def generate():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                evt = await sub.get(KEEPALIVE_SECONDS)
+                if evt is None:
+                    yield ": keepalive\n\n"
+                    continue
+                data = json.dumps(evt["data"], separators=(",", ":"))
+                yield f"id: {evt['id']}\nevent: {evt['type']}\ndata: {data}\n\n"
+        finally:
+            sub.close()
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def events_websocket(websocket: WebSocket, token: str | None = None):
+    """WebSocket carrying the same events as ``/events/stream`` as JSON frames."""
+    try:
+        user_id = await asyncio.to_thread(
+            _authenticate, websocket.headers.get("authorization"), token
+        )
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    sub = hub.subscribe(user_id)
+
+    async def drain_client():
+        # Clients do not send anything meaningful; reading detects disconnects
+        while True:
+            await websocket.receive_text()
+
+    reader = asyncio.create_task(drain_client())
+    try:
+        while not reader.done():
+            evt = await sub.get(KEEPALIVE_SECONDS)
+            if evt is None:
+                await websocket.send_json({"type": "keepalive"})
+            else:
+                await websocket.send_json(evt)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        reader.cancel()
+        sub.close()
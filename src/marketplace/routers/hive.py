@@ -5,13 +5,16 @@ The Hive — agent Twitter-style feed with likes.
 import uuid
 from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from pydantic import BaseModel
-from sqlmodel import Session, select
+from sqlmodel import Session
 
+from .. import activity, agent_keys, likes, tags
 from ..auth import get_current_user, get_optional_user
 from ..database import get_session
-from ..models import AgentApiKey, AgentPost, AgentPostLike, AgentProfile, User
+from ..loaders import BatchLoader
+from ..models import AgentPost, AgentProfile, User
+from ..pagination import encode_cursor
 
 router = APIRouter(prefix="/hive", tags=["Hive"])
 
@@ -19,24 +22,8 @@ router = APIRouter(prefix="/hive", tags=["Hive"])
 # ── Helpers ──────────────────────────────────────────────────────────
 
 
-def _hash_key(raw: str) -> str:
-    import hashlib
-    return hashlib.sha256(raw.encode()).hexdigest()
-
-
 def _get_agent_by_key_optional(x_agent_key: str | None, session: Session) -> AgentProfile | None:
-    if not x_agent_key:
-        return None
-    key_hash = _hash_key(x_agent_key)
-    api_key = session.exec(
-        select(AgentApiKey).where(
-            AgentApiKey.key_hash == key_hash,
-            AgentApiKey.is_active == True,  # noqa: E712
-        )
-    ).first()
-    if not api_key:
-        return None
-    return session.get(AgentProfile, api_key.agent_id)
+    return agent_keys.agent_for_key(x_agent_key, session)
 
 
 def _enrich_post(post: AgentPost, agent: AgentProfile | None) -> dict:
@@ -79,24 +66,39 @@ class HivePostRequest(BaseModel):
 
 @router.get("/posts")
 def get_hive_posts(
+    response: Response,
     limit: int = Query(20, le=50),
     offset: int = Query(0, ge=0),
+    tag: str | None = None,
+    cursor: str | None = None,
+    user: User | None = Depends(get_optional_user),
+    x_agent_key: str | None = Header(default=None, alias="X-Agent-Key"),
     session: Session = Depends(get_session),
 ):
-    """Public feed — newest first with author info and likes."""
-    posts = session.exec(
-        select(AgentPost)
-        .where(AgentPost.is_published == True)  # noqa: E712
-        .order_by(AgentPost.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-    ).all()
-
-    result = []
-    for post in posts:
-        agent = session.get(AgentProfile, post.agent_profile_id)
-        result.append(_enrich_post(post, agent))
-    return result
+    """Public feed — newest first with author info and likes.
+
+    ``liked_by_me`` reflects the signed-in user, or the agent behind
+    ``X-Agent-Key``; it is always false for anonymous readers.
+    """
+    query = tags.feed_query(tag, cursor)
+    if not cursor:
+        query = query.offset(offset)
+    posts = session.exec(query.limit(limit)).all()
+    if len(posts) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(posts[-1].created_at, posts[-1].id)
+
+    agent = None if user else _get_agent_by_key_optional(x_agent_key, session)
+    liked = likes.liked_post_ids(
+        session,
+        [p.id for p in posts],
+        user_id=user.id if user else None,
+        agent_id=agent.id if agent else None,
+    )
+    loader = BatchLoader(session).load(AgentProfile, [p.agent_profile_id for p in posts])
+    return [
+        {**_enrich_post(p, loader.get(AgentProfile, p.agent_profile_id)), "liked_by_me": p.id in liked}
+        for p in posts
+    ]
 
 
 @router.post("/posts", status_code=201)
@@ -136,6 +138,7 @@ def create_hive_post(
         link_url=data.link_url,
     )
     session.add(post)
+    session.add(activity.hive_post(agent, post))
     session.commit()
     session.refresh(post)
     return _enrich_post(post, agent)
@@ -162,38 +165,11 @@ def toggle_like(
         if not auth_agent:
             raise HTTPException(401, "Invalid agent key")
 
-    # Check for existing like
-    if user:
-        existing = session.exec(
-            select(AgentPostLike).where(
-                AgentPostLike.post_id == post_id,
-                AgentPostLike.liker_user_id == user.id,
-            )
-        ).first()
-    else:
-        existing = session.exec(
-            select(AgentPostLike).where(
-                AgentPostLike.post_id == post_id,
-                AgentPostLike.liker_agent_id == auth_agent.id,  # type: ignore
-            )
-        ).first()
-
-    if existing:
-        # Unlike
-        session.delete(existing)
-        post.likes_count = max(0, post.likes_count - 1)
-        liked = False
-    else:
-        # Like
-        like = AgentPostLike(
-            post_id=post_id,
-            liker_user_id=user.id if user else None,
-            liker_agent_id=auth_agent.id if auth_agent else None,
-        )
-        session.add(like)
-        post.likes_count = post.likes_count + 1
-        liked = True
-
-    session.add(post)
+    liked = likes.toggle_like(
+        session,
+        post_id,
+        user_id=user.id if user else None,
+        agent_id=auth_agent.id if auth_agent else None,
+    )
     session.commit()
-    return {"liked": liked, "likes_count": post.likes_count}
+    return {"liked": liked, "likes_count": likes.like_count(session, post_id)}
@@ -5,9 +5,11 @@ from datetime import datetime, timezone, timedelta
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlmodel import Session, select, text
 
+from .. import blobs
 from ..auth import get_current_user
 from ..database import get_session
 from ..models import User, AgentProfile, AgentLicense
@@ -55,7 +57,8 @@ class JobRunResponse(BaseModel):
     started_at: str
     completed_at: str | None
     status: str
-    result: str | None
+    result: str | None  # a preview when the full output is in the blob store
+    result_ref: str | None = None
     error: str | None
     credits_charged: int
     created_at: str
@@ -99,6 +102,7 @@ def _row_to_run(row) -> dict:
         "completed_at": _fmt_dt(row.get("completed_at")),
         "status": row["status"],
         "result": row.get("result"),
+        "result_ref": row.get("result_ref"),
         "error": row.get("error"),
         "credits_charged": row["credits_charged"],
         "created_at": _fmt_dt(row["created_at"]),
@@ -277,6 +281,46 @@ def get_job(
     }
 
 
+@router.get("/{job_id}/runs/{run_id}/result")
+def get_job_run_result(
+    job_id: str,
+    run_id: str,
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """Full output of one run, streamed from the blob store when it was offloaded."""
+    engine = session.get_bind()
+
+    try:
+        job_uuid = uuid.UUID(job_id)
+        run_uuid = uuid.UUID(run_id)
+    except ValueError:
+        raise HTTPException(400, "Invalid job_id or run_id")
+
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("""
+                SELECT jr.result, jr.result_ref
+                FROM job_runs jr
+                JOIN background_jobs bj ON bj.id = jr.job_id
+                WHERE jr.id = :run_id AND jr.job_id = :job_id AND bj.user_id = :user_id
+            """),
+            {"run_id": run_uuid, "job_id": job_uuid, "user_id": user.id},
+        ).fetchone()
+
+    if not row:
+        raise HTTPException(404, "Run not found")
+    if not row.result_ref:
+        if row.result is None:
+            raise HTTPException(404, "Run has no result")
+        return StreamingResponse(iter([row.result.encode()]), media_type="text/plain; charset=utf-8")
+    try:
+        body = blobs.stream(row.result_ref)
+    except blobs.BlobNotFound:
+        raise HTTPException(404, "Run output is missing from the blob store")
+    return StreamingResponse(body, media_type="text/plain; charset=utf-8")
+
+
 @router.patch("/{job_id}")
 def update_job(
     job_id: str,
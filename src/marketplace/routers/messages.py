@@ -1,12 +1,18 @@
+import logging
 import uuid
 from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, col, func, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import case, update
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, col, func, or_, select
 
 from ..auth import get_current_user
 from ..database import get_session
+from ..loaders import BatchLoader
 from ..models import AgentProfile, Conversation, Message, User
+from ..pagination import before_cursor, decode_cursor, encode_cursor
+from ..push import publish
 from ..schemas import (
     ConversationResponse,
     MessageResponse,
@@ -14,41 +20,117 @@ from ..schemas import (
     StartConversationRequest,
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/conversations", tags=["messages"])
 
 
-def _enrich_conversation(
-    conv: Conversation, current_user: User, session: Session
+PREVIEW_LENGTH = 100
+INBOX_PAGE_SIZE = 50
+INBOX_MAX_PAGE_SIZE = 100
+THREAD_PAGE_SIZE = 100
+THREAD_MAX_PAGE_SIZE = 500
+
+
+def _display_name(user: User | None) -> str | None:
+    return (user.display_name or user.email) if user else None
+
+
+def _conversation_response(
+    conv: Conversation,
+    current_user: User,
+    agent: AgentProfile | None,
+    other_user: User | None,
 ) -> ConversationResponse:
     resp = ConversationResponse.model_validate(conv)
-
-    agent = session.get(AgentProfile, conv.agent_profile_id)
     resp.agent_name = agent.name if agent else None
     resp.agent_avatar_url = agent.avatar_url if agent else None
+    resp.other_party_name = _display_name(other_user)
+    resp.unread_count = (
+        conv.unread_by_initiator if conv.initiator_id == current_user.id else conv.unread_by_owner
+    )
+    return resp
+
 
+def _enrich_conversation(
+    conv: Conversation, current_user: User, session: Session
+) -> ConversationResponse:
     other_id = conv.owner_id if conv.initiator_id == current_user.id else conv.initiator_id
-    other_user = session.get(User, other_id)
-    resp.other_party_name = (other_user.display_name or other_user.email) if other_user else None
+    return _conversation_response(
+        conv,
+        current_user,
+        session.get(AgentProfile, conv.agent_profile_id),
+        session.get(User, other_id),
+    )
 
-    last_msg = session.exec(
-        select(Message)
-        .where(Message.conversation_id == conv.id)
-        .order_by(col(Message.created_at).desc())
-        .limit(1)
-    ).first()
-    if last_msg:
-        resp.last_message_preview = last_msg.content[:100]
 
-    unread = session.exec(
-        select(func.count(Message.id)).where(
+def _mark_read_for(session: Session, conv: Conversation, user: User) -> None:
+    """Mark the other party's messages read and clear ``user``'s unread counter."""
+    session.execute(
+        update(Message)
+        .where(
             Message.conversation_id == conv.id,
-            Message.sender_id != current_user.id,
+            Message.sender_id != user.id,
             Message.is_read == False,  # noqa: E712
         )
-    ).one()
-    resp.unread_count = unread
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
 
-    return resp
+    if conv.initiator_id == user.id:
+        conv.is_read_by_initiator = True
+        conv.unread_by_initiator = 0
+    else:
+        conv.is_read_by_owner = True
+        conv.unread_by_owner = 0
+    session.add(conv)
+
+
+def _publish_message(session: Session, conv: Conversation, msg: Message) -> None:
+    publish(
+        session,
+        [conv.initiator_id, conv.owner_id],
+        "message.created",
+        {
+            "conversation_id": conv.id,
+            "message_id": msg.id,
+            "sender_id": msg.sender_id,
+            "preview": msg.content[:PREVIEW_LENGTH],
+            "created_at": msg.created_at,
+        },
+    )
+
+
+def backfill_conversation_summaries(engine) -> None:
+    """Fill the denormalised inbox columns for conversations that predate them."""
+    def unread_from_other_party(reader):
+        return select(func.count(Message.id)).where(
+            Message.conversation_id == Conversation.id,
+            Message.sender_id != reader,
+            Message.is_read == False,  # noqa: E712
+        ).scalar_subquery()
+
+    last = (
+        select(Message.id)
+        .where(Message.conversation_id == Conversation.id)
+        .order_by(col(Message.created_at).desc())
+        .limit(1)
+    )
+    with engine.begin() as conn:
+        result = conn.execute(
+            update(Conversation)
+            .where(Conversation.last_sender_id == None)  # noqa: E711
+            .values(
+                last_message_preview=last.with_only_columns(
+                    func.substr(Message.content, 1, PREVIEW_LENGTH)
+                ).scalar_subquery(),
+                last_sender_id=last.with_only_columns(Message.sender_id).scalar_subquery(),
+                unread_by_owner=unread_from_other_party(Conversation.owner_id),
+                unread_by_initiator=unread_from_other_party(Conversation.initiator_id),
+            )
+        )
+        if result.rowcount:
+            logger.info(f"Backfilled inbox summaries for {result.rowcount} conversation(s)")
 
 
 # ── Create conversation ──────────────────────────────────────────────
@@ -77,6 +159,9 @@ def create_conversation(
         last_message_at=now,
         is_read_by_owner=False,
         is_read_by_initiator=True,
+        last_message_preview=data.message[:PREVIEW_LENGTH],
+        last_sender_id=user.id,
+        unread_by_owner=1,
     )
     session.add(conv)
     session.flush()
@@ -87,6 +172,7 @@ def create_conversation(
         content=data.message,
     )
     session.add(msg)
+    _publish_message(session, conv, msg)
     session.commit()
     session.refresh(conv)
 
@@ -98,17 +184,42 @@ def create_conversation(
 
 @router.get("", response_model=list[ConversationResponse])
 def list_conversations(
+    response: Response,
+    limit: int = Query(INBOX_PAGE_SIZE, ge=1, le=INBOX_MAX_PAGE_SIZE),
+    cursor: str | None = None,
     user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ):
-    convs = session.exec(
-        select(Conversation)
-        .where(
-            (Conversation.initiator_id == user.id) | (Conversation.owner_id == user.id)
+    """The user's inbox, most recent first, one query per page.
+
+    Pass the ``X-Next-Cursor`` response header back as ``cursor`` for older pages.
+    """
+    other_user = aliased(User)
+    other_id = case(
+        (Conversation.initiator_id == user.id, Conversation.owner_id),
+        else_=Conversation.initiator_id,
+    )
+    query = (
+        select(Conversation, AgentProfile, other_user)
+        .outerjoin(AgentProfile, AgentProfile.id == Conversation.agent_profile_id)
+        .outerjoin(other_user, other_user.id == other_id)
+        .where(or_(Conversation.initiator_id == user.id, Conversation.owner_id == user.id))
+        .order_by(col(Conversation.last_message_at).desc(), col(Conversation.id).desc())
+        .limit(limit)
+    )
+    if cursor:
+        ts, before_id = decode_cursor(cursor)
+        if ts is None:
+            raise HTTPException(400, "Invalid cursor")
+        query = query.where(
+            before_cursor(Conversation.last_message_at, Conversation.id, ts, before_id)
         )
-        .order_by(col(Conversation.last_message_at).desc())
-    ).all()
-    return [_enrich_conversation(c, user, session) for c in convs]
+    rows = session.exec(query).all()
+
+    if len(rows) == limit:
+        last = rows[-1][0]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.last_message_at, last.id)
+    return [_conversation_response(conv, user, agent, other) for conv, agent, other in rows]
 
 
 # ── Get conversation with messages ───────────────────────────────────
@@ -117,9 +228,15 @@ def list_conversations(
 @router.get("/{id}")
 def get_conversation(
     id: uuid.UUID,
+    limit: int = Query(THREAD_PAGE_SIZE, ge=1, le=THREAD_MAX_PAGE_SIZE),
+    before: str | None = None,
     user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ):
+    """A conversation and its latest ``limit`` messages, oldest first.
+
+    ``next_cursor`` is set when older messages exist; pass it as ``before``.
+    """
     conv = session.get(Conversation, id)
     if not conv:
         raise HTTPException(404, "Conversation not found")
@@ -127,41 +244,38 @@ def get_conversation(
         raise HTTPException(403, "Not a participant")
 
     # Mark messages as read for the current user
-    unread_msgs = session.exec(
-        select(Message).where(
-            Message.conversation_id == id,
-            Message.sender_id != user.id,
-            Message.is_read == False,  # noqa: E712
-        )
-    ).all()
-    for m in unread_msgs:
-        m.is_read = True
-        session.add(m)
-
-    # Update conversation read status
-    if conv.initiator_id == user.id:
-        conv.is_read_by_initiator = True
-    else:
-        conv.is_read_by_owner = True
-    session.add(conv)
+    _mark_read_for(session, conv, user)
     session.commit()
 
-    messages = session.exec(
+    query = (
         select(Message)
         .where(Message.conversation_id == id)
-        .order_by(col(Message.created_at).asc())
-    ).all()
+        .order_by(col(Message.created_at).desc(), col(Message.id).desc())
+        .limit(limit)
+    )
+    if before:
+        ts, before_id = decode_cursor(before)
+        if ts is None:
+            raise HTTPException(400, "Invalid cursor")
+        query = query.where(before_cursor(Message.created_at, Message.id, ts, before_id))
+    messages = session.exec(query).all()
+    next_cursor = (
+        encode_cursor(messages[-1].created_at, messages[-1].id) if len(messages) == limit else None
+    )
+    messages.reverse()
 
+    # Only the two participants can have sent messages
+    senders = BatchLoader(session).get_many(User, {m.sender_id for m in messages})
     msg_responses = []
     for m in messages:
         resp = MessageResponse.model_validate(m)
-        sender = session.get(User, m.sender_id)
-        resp.sender_name = (sender.display_name or sender.email) if sender else None
+        resp.sender_name = _display_name(senders.get(m.sender_id))
         msg_responses.append(resp)
 
     return {
         "conversation": _enrich_conversation(conv, user, session),
         "messages": msg_responses,
+        "next_cursor": next_cursor,
     }
 
 
@@ -189,13 +303,21 @@ def send_message(
     )
     session.add(msg)
 
-    conv.last_message_at = now
-    # Mark as unread for the other party
+    # Mark as unread for the other party. The counter is bumped in SQL so
+    # concurrent sends cannot lose increments.
+    values = {
+        "last_message_at": now,
+        "last_message_preview": data.content[:PREVIEW_LENGTH],
+        "last_sender_id": user.id,
+    }
     if conv.initiator_id == user.id:
-        conv.is_read_by_owner = False
+        values.update(is_read_by_owner=False, unread_by_owner=Conversation.unread_by_owner + 1)
     else:
-        conv.is_read_by_initiator = False
-    session.add(conv)
+        values.update(
+            is_read_by_initiator=False, unread_by_initiator=Conversation.unread_by_initiator + 1
+        )
+    session.execute(update(Conversation).where(Conversation.id == conv.id).values(**values))
+    _publish_message(session, conv, msg)
     session.commit()
     session.refresh(msg)
 
@@ -220,21 +342,5 @@ def mark_read(
         raise HTTPException(403, "Not a participant")
 
     # Mark all messages from the other party as read
-    unread = session.exec(
-        select(Message).where(
-            Message.conversation_id == id,
-            Message.sender_id != user.id,
-            Message.is_read == False,  # noqa: E712
-        )
-    ).all()
-    for m in unread:
-        m.is_read = True
-        session.add(m)
-
-    # Update conversation read status
-    if conv.initiator_id == user.id:
-        conv.is_read_by_initiator = True
-    else:
-        conv.is_read_by_owner = True
-    session.add(conv)
+    _mark_read_for(session, conv, user)
     session.commit()
@@ -1,23 +1,31 @@
 """Mission Control — enriched stats, agent army, and activity feed for the creator dashboard."""
 
-import uuid
 from datetime import UTC, datetime, timedelta
 
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, func, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlmodel import Session, col, func, select
 
+from .. import presence
 from ..auth import get_current_user
 from ..database import get_session
-from ..models import AgentLicense, AgentPost, AgentProfile, CreatorEarnings, Task, User
+from ..earnings import net_credits_by_agent, total_net_credits
+from ..models import ActivityEvent, AgentPost, AgentProfile, Task, User
+from ..pagination import before_cursor, decode_cursor, encode_cursor
 
 router = APIRouter(prefix="/mission-control", tags=["Mission Control"])
 
+FEED_PAGE_SIZE = 30
+FEED_MAX_PAGE_SIZE = 100
 
-def _user_agent_ids(user: User, session: Session) -> list[uuid.UUID]:
-    rows = session.exec(
-        select(AgentProfile.id).where(AgentProfile.owner_id == user.id)
-    ).all()
-    return list(rows)
+
+def _per_agent(model, value, *where):
+    """Grouped ``value`` per ``model.agent_profile_id``, as a joinable subquery."""
+    return (
+        select(model.agent_profile_id.label("agent_id"), value.label("value"))
+        .where(*where)
+        .group_by(model.agent_profile_id)
+        .subquery()
+    )
 
 
 @router.get("/stats")
@@ -26,50 +34,39 @@ def get_stats(
     session: Session = Depends(get_session),
 ):
     """KPI summary for the mission control header bar."""
-    agent_ids = _user_agent_ids(user, session)
-
-    # Active agents
-    active_agents = session.exec(
-        select(func.count(AgentProfile.id)).where(
-            AgentProfile.owner_id == user.id,
-            AgentProfile.status == "active",
-        )
-    ).one() or 0
+    owned = select(AgentProfile.id).where(AgentProfile.owner_id == user.id)
+    cutoff = datetime.now(UTC).replace(tzinfo=None) - timedelta(hours=24)
 
+    active_agents = (
+        select(func.count(AgentProfile.id))
+        .where(AgentProfile.owner_id == user.id, AgentProfile.status == "active")
+        .scalar_subquery()
+    )
     # Tasks assigned to user's agents in the last 24 h
-    cutoff = datetime.now(UTC).replace(tzinfo=None) - timedelta(hours=24)
-    tasks_today = 0
-    if agent_ids:
-        tasks_today = session.exec(
-            select(func.count(Task.id)).where(
-                Task.agent_profile_id.in_(agent_ids),
-                Task.created_at >= cutoff,
-            )
-        ).one() or 0
-
-    # Credits earned (sum net_credits across all CreatorEarnings for this user)
-    credits_earned_result = session.exec(
-        select(func.sum(CreatorEarnings.net_credits)).where(
-            CreatorEarnings.owner_id == user.id,
+    tasks_today = (
+        select(func.count(Task.id))
+        .where(col(Task.agent_profile_id).in_(owned), Task.created_at >= cutoff)
+        .scalar_subquery()
+    )
+    credits_earned = total_net_credits(user.id)
+    hive_posts = (
+        select(func.count(AgentPost.id))
+        .where(
+            col(AgentPost.agent_profile_id).in_(owned),
+            AgentPost.is_published == True,  # noqa: E712
         )
+        .scalar_subquery()
+    )
+
+    row = session.exec(
+        select(active_agents, tasks_today, credits_earned, hive_posts)
     ).one()
-    credits_earned = credits_earned_result or 0
-
-    # Hive posts across all user's agents
-    hive_posts = 0
-    if agent_ids:
-        hive_posts = session.exec(
-            select(func.count(AgentPost.id)).where(
-                AgentPost.agent_profile_id.in_(agent_ids),
-                AgentPost.is_published == True,  # noqa: E712
-            )
-        ).one() or 0
 
     return {
-        "active_agents": int(active_agents),
-        "tasks_today": int(tasks_today),
-        "credits_earned": int(credits_earned),
-        "hive_posts": int(hive_posts),
+        "active_agents": int(row[0] or 0),
+        "tasks_today": int(row[1] or 0),
+        "credits_earned": int(row[2] or 0),
+        "hive_posts": int(row[3] or 0),
     }
 
 
@@ -79,37 +76,36 @@ def get_agents(
     session: Session = Depends(get_session),
 ):
     """User's agents enriched with per-agent stats."""
-    agents = session.exec(
-        select(AgentProfile).where(AgentProfile.owner_id == user.id)
+    owned = select(AgentProfile.id).where(AgentProfile.owner_id == user.id)
+    tasks = (
+        select(
+            Task.agent_profile_id.label("agent_id"),
+            func.count(Task.id).label("total"),
+            func.max(Task.created_at).label("last_at"),
+        )
+        .where(col(Task.agent_profile_id).in_(owned))
+        .group_by(Task.agent_profile_id)
+        .subquery()
+    )
+    credits = net_credits_by_agent(user.id)
+    posts = _per_agent(
+        AgentPost,
+        func.count(AgentPost.id),
+        col(AgentPost.agent_profile_id).in_(owned),
+        AgentPost.is_published == True,  # noqa: E712
+    )
+
+    rows = session.exec(
+        select(AgentProfile, tasks.c.total, tasks.c.last_at, credits.c.value, posts.c.value)
+        .outerjoin(tasks, tasks.c.agent_id == AgentProfile.id)
+        .outerjoin(credits, credits.c.agent_id == AgentProfile.id)
+        .outerjoin(posts, posts.c.agent_id == AgentProfile.id)
+        .where(AgentProfile.owner_id == user.id)
     ).all()
 
+    seen = presence.last_seen(row[0] for row in rows)
     result = []
-    for agent in agents:
-        tasks_total = session.exec(
-            select(func.count(Task.id)).where(Task.agent_profile_id == agent.id)
-        ).one() or 0
-
-        credits_result = session.exec(
-            select(func.sum(CreatorEarnings.net_credits)).where(
-                CreatorEarnings.agent_profile_id == agent.id
-            )
-        ).one()
-        credits_earned = credits_result or 0
-
-        posts_count = session.exec(
-            select(func.count(AgentPost.id)).where(
-                AgentPost.agent_profile_id == agent.id,
-                AgentPost.is_published == True,  # noqa: E712
-            )
-        ).one() or 0
-
-        last_task_at = session.exec(
-            select(Task.created_at)
-            .where(Task.agent_profile_id == agent.id)
-            .order_by(Task.created_at.desc())  # type: ignore[union-attr]
-            .limit(1)
-        ).first()
-
+    for agent, tasks_total, last_task_at, credits_earned, posts_count in rows:
         result.append({
             "id": str(agent.id),
             "name": agent.name,
@@ -117,10 +113,10 @@ def get_agents(
             "category": agent.category,
             "status": agent.status,
             "avatar_url": agent.avatar_url,
-            "tasks_total": int(tasks_total),
-            "credits_earned": int(credits_earned),
-            "hive_posts_count": int(posts_count),
-            "last_seen_at": agent.last_seen_at.isoformat() if agent.last_seen_at else None,
+            "tasks_total": int(tasks_total or 0),
+            "credits_earned": int(credits_earned or 0),
+            "hive_posts_count": int(posts_count or 0),
+            **presence.presence_fields(seen[agent.id]),
             "last_task_at": last_task_at.isoformat() if last_task_at else None,
         })
 
@@ -129,85 +125,41 @@ def get_agents(
 
 @router.get("/feed")
 def get_feed(
+    response: Response,
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=FEED_MAX_PAGE_SIZE),
+    cursor: str | None = None,
     user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ):
-    """Last 30 activity events across all user's agents, newest first."""
-    agent_ids = _user_agent_ids(user, session)
-    events: list[dict] = []
-
-    if not agent_ids:
-        return events
-
-    # Tasks (recent 15)
-    tasks = session.exec(
-        select(Task)
-        .where(Task.agent_profile_id.in_(agent_ids))
-        .order_by(Task.created_at.desc())  # type: ignore[union-attr]
-        .limit(15)
-    ).all()
-
-    for task in tasks:
-        agent = session.get(AgentProfile, task.agent_profile_id)
-        agent_name = agent.name if agent else "Unknown"
-        if task.status == "completed":
-            events.append({
-                "type": "task_completed",
-                "agent_name": agent_name,
-                "agent_id": str(task.agent_profile_id),
-                "description": f"Completed: {task.title}",
-                "timestamp": (task.completed_at or task.updated_at).isoformat(),
-            })
-        else:
-            events.append({
-                "type": "task_started",
-                "agent_name": agent_name,
-                "agent_id": str(task.agent_profile_id),
-                "description": f"New task: {task.title}",
-                "timestamp": task.created_at.isoformat(),
-            })
-
-    # Hive posts (recent 10)
-    posts = session.exec(
-        select(AgentPost)
-        .where(AgentPost.agent_profile_id.in_(agent_ids))
-        .order_by(AgentPost.created_at.desc())  # type: ignore[union-attr]
-        .limit(10)
-    ).all()
-
-    for post in posts:
-        agent = session.get(AgentProfile, post.agent_profile_id)
-        agent_name = agent.name if agent else "Unknown"
-        snippet = post.content[:80] + ("..." if len(post.content) > 80 else "")
-        events.append({
-            "type": "hive_post",
-            "agent_name": agent_name,
-            "agent_id": str(post.agent_profile_id),
-            "description": snippet,
-            "timestamp": post.created_at.isoformat(),
-        })
-
-    # License purchases (recent 10)
-    licenses = session.exec(
-        select(AgentLicense)
-        .where(AgentLicense.agent_profile_id.in_(agent_ids))
-        .order_by(AgentLicense.created_at.desc())  # type: ignore[union-attr]
-        .limit(10)
-    ).all()
-
-    for lic in licenses:
-        agent = session.get(AgentProfile, lic.agent_profile_id)
-        buyer = session.get(User, lic.buyer_id)
-        agent_name = agent.name if agent else "Unknown"
-        buyer_name = (buyer.display_name or buyer.email[:20]) if buyer else "Unknown"
-        events.append({
-            "type": "license_purchased",
-            "agent_name": agent_name,
-            "agent_id": str(lic.agent_profile_id),
-            "description": f"New access: {buyer_name} licensed {agent_name}",
-            "timestamp": lic.created_at.isoformat(),
-        })
-
-    # Sort newest first and cap at 30
-    events.sort(key=lambda e: e["timestamp"], reverse=True)
-    return events[:30]
+    """Activity events across all user's agents, newest first.
+
+    Pass the ``X-Next-Cursor`` response header back as ``cursor`` for older events.
+    """
+    query = (
+        select(ActivityEvent)
+        .where(ActivityEvent.owner_id == user.id)
+        .order_by(col(ActivityEvent.created_at).desc(), col(ActivityEvent.id).desc())
+        .limit(limit)
+    )
+    if cursor:
+        ts, before_id = decode_cursor(cursor)
+        if ts is None:
+            raise HTTPException(400, "Invalid cursor")
+        query = query.where(
+            before_cursor(ActivityEvent.created_at, ActivityEvent.id, ts, before_id)
+        )
+    events = session.exec(query).all()
+
+    if len(events) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(events[-1].created_at, events[-1].id)
+
+    return [
+        {
+            "type": e.event_type,
+            "agent_name": e.agent_name,
+            "agent_id": str(e.agent_profile_id),
+            "description": e.description,
+            "timestamp": e.created_at.isoformat(),
+        }
+        for e in events
+    ]
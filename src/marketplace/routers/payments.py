@@ -2,13 +2,16 @@ import logging
 import uuid
 
 import stripe
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 from sqlmodel import Session, select
 
 from ..auth import get_current_user
+from ..cache import cached_json
 from ..config import get_settings
 from ..database import get_session
+from ..earnings import INTERVALS, earnings_series, total_net_credits
+from ..loaders import BatchLoader
 from ..models import AgentProfile, CreditPack, CreditPurchase, CreatorEarnings, User
 
 logger = logging.getLogger(__name__)
@@ -54,23 +57,26 @@ class PurchaseHistoryItem(BaseModel):
 
 
 @router.get("/credit-packs")
-def list_credit_packs(session: Session = Depends(get_session)):
+def list_credit_packs(request: Request, session: Session = Depends(get_session)):
     """Public endpoint — list all active credit packs."""
-    packs = session.exec(
-        select(CreditPack).where(CreditPack.is_active == True).order_by(CreditPack.price_cents)  # noqa: E712
-    ).all()
-    return [
-        {
-            "id": str(p.id),
-            "name": p.name,
-            "credits": p.credits,
-            "price_cents": p.price_cents,
-            "bonus_credits": p.bonus_credits,
-            "total_credits": p.credits + p.bonus_credits,
-            "stripe_price_id": p.stripe_price_id,
-        }
-        for p in packs
-    ]
+    def build():
+        packs = session.exec(
+            select(CreditPack).where(CreditPack.is_active == True).order_by(CreditPack.price_cents)  # noqa: E712
+        ).all()
+        return [
+            {
+                "id": str(p.id),
+                "name": p.name,
+                "credits": p.credits,
+                "price_cents": p.price_cents,
+                "bonus_credits": p.bonus_credits,
+                "total_credits": p.credits + p.bonus_credits,
+                "stripe_price_id": p.stripe_price_id,
+            }
+            for p in packs
+        ]
+
+    return cached_json(request, ["credit_packs"], build)
 
 
 @router.post("/checkout", response_model=CheckoutResponse)
@@ -229,13 +235,12 @@ def get_purchase_history(
         .offset(offset)
         .limit(limit)
     ).all()
+    loader = BatchLoader(session).load(CreditPack, [p.pack_id for p in purchases])
 
     result = []
     for p in purchases:
-        pack_name = None
-        if p.pack_id:
-            pack = session.get(CreditPack, p.pack_id)
-            pack_name = pack.name if pack else None
+        pack = loader.get(CreditPack, p.pack_id)
+        pack_name = pack.name if pack else None
         result.append(
             {
                 "id": str(p.id),
@@ -256,18 +261,18 @@ def get_creator_earnings(
     user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ):
-    """Creator earnings breakdown — credits earned across all owned agents."""
+    """Creator earnings breakdown — recent earnings and the all-time net total."""
     earnings_rows = session.exec(
         select(CreatorEarnings)
         .where(CreatorEarnings.owner_id == user.id)
         .order_by(CreatorEarnings.created_at.desc())  # type: ignore[union-attr]
         .limit(200)
     ).all()
+    loader = BatchLoader(session).load(AgentProfile, [e.agent_profile_id for e in earnings_rows])
 
-    total_net = 0
     result = []
     for e in earnings_rows:
-        agent = session.get(AgentProfile, e.agent_profile_id)
+        agent = loader.get(AgentProfile, e.agent_profile_id)
         result.append(
             {
                 "id": str(e.id),
@@ -279,6 +284,24 @@ def get_creator_earnings(
                 "created_at": e.created_at.isoformat(),
             }
         )
-        total_net += e.net_credits
 
-    return {"earnings": result, "total_net_credits": total_net}
+    total_net = session.exec(select(total_net_credits(user.id))).one()
+    return {"earnings": result, "total_net_credits": int(total_net)}
+
+
+@router.get("/earnings/series")
+def get_creator_earnings_series(
+    interval: str = "day",
+    periods: int = Query(30, ge=1, le=366),
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """Earnings per day, week or month for the last ``periods`` periods."""
+    if interval not in INTERVALS:
+        raise HTTPException(400, f"interval must be one of {', '.join(INTERVALS)}")
+    series = earnings_series(session, user.id, interval, periods)
+    return {
+        "interval": interval,
+        "series": series,
+        "total_net_credits": sum(p["net_credits"] for p in series),
+    }
@@ -1,12 +1,16 @@
 import uuid
 from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, func, select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlmodel import Session, select
 
+from .. import activity, tags
 from ..auth import get_current_user
+from ..cache import cached_json
 from ..database import get_session
-from ..models import AgentPost, AgentProfile, User
+from ..loaders import BatchLoader
+from ..models import AgentPost, AgentProfile, AgentTrendScore, User
+from ..pagination import encode_cursor
 from ..schemas import PostCreateRequest, PostResponse, PostUpdateRequest
 
 router = APIRouter(tags=["Posts"])
@@ -22,73 +26,67 @@ def _enrich(post: AgentPost, agent: AgentProfile | None) -> PostResponse:
     return resp
 
 
+def _enrich_many(posts: list[AgentPost], session: Session) -> list[PostResponse]:
+    loader = BatchLoader(session).load(AgentProfile, [p.agent_profile_id for p in posts])
+    return [_enrich(p, loader.get(AgentProfile, p.agent_profile_id)) for p in posts]
+
+
 # ── Public ────────────────────────────────────────────────────
 
 
 @router.get("/posts", response_model=list[PostResponse])
 def get_feed(
+    response: Response,
     page: int = 1,
     limit: int = 20,
     tag: str | None = None,
+    cursor: str | None = None,
     session: Session = Depends(get_session),
 ):
-    query = (
-        select(AgentPost)
-        .where(AgentPost.is_published == True)  # noqa: E712
-        .order_by(AgentPost.created_at.desc())
-    )
-    offset = (page - 1) * min(limit, 50)
-    posts = session.exec(query.offset(offset).limit(min(limit, 50))).all()
+    """Published posts, newest first.
+
+    Pass the ``X-Next-Cursor`` response header back as ``cursor`` for the next
+    page; ``page`` is still honoured when no cursor is given.
+    """
+    limit = min(limit, 50)
+    query = tags.feed_query(tag, cursor)
+    if not cursor:
+        query = query.offset((page - 1) * limit)
+    posts = session.exec(query.limit(limit)).all()
 
-    results = []
-    for post in posts:
-        if tag and tag not in (post.tags or []):
-            continue
-        agent = session.get(AgentProfile, post.agent_profile_id)
-        results.append(_enrich(post, agent))
-    return results
+    if len(posts) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(posts[-1].created_at, posts[-1].id)
+    return _enrich_many(posts, session)
 
 
 @router.get("/posts/trending-agents")
-def trending_agents(session: Session = Depends(get_session)):
-    """Top agents by total star_count on their posts."""
-    query = (
-        select(
-            AgentPost.agent_profile_id,
-            func.sum(AgentPost.star_count).label("total_stars"),
-        )
-        .where(AgentPost.is_published == True)  # noqa: E712
-        .group_by(AgentPost.agent_profile_id)
-        .order_by(func.sum(AgentPost.star_count).desc())
-        .limit(10)
-    )
-    rows = session.exec(query).all()
-    results = []
-    for agent_id, total_stars in rows:
-        agent = session.get(AgentProfile, agent_id)
-        if agent:
-            results.append({
+def trending_agents(request: Request, session: Session = Depends(get_session)):
+    """Top agents by recent activity, from the precomputed ranking (see trending.py)."""
+    def build():
+        rows = session.exec(
+            select(AgentTrendScore, AgentProfile)
+            .join(AgentProfile, AgentProfile.id == AgentTrendScore.agent_profile_id)
+            .order_by(AgentTrendScore.score.desc())
+            .limit(10)
+        ).all()
+        return [
+            {
                 "agent_name": agent.name,
                 "agent_slug": agent.slug,
                 "agent_avatar_url": agent.avatar_url,
-                "star_count": total_stars or 0,
-            })
-    return results
+                "star_count": rank.star_count,
+                "score": round(rank.score, 4),
+            }
+            for rank, agent in rows
+        ]
+
+    return cached_json(request, ["agent_trend_scores", "agent_profiles"], build)
 
 
 @router.get("/posts/trending-tags")
 def trending_tags(session: Session = Depends(get_session)):
-    """Popular tags across all posts."""
-    posts = session.exec(
-        select(AgentPost)
-        .where(AgentPost.is_published == True)  # noqa: E712
-    ).all()
-    tag_counts: dict[str, int] = {}
-    for post in posts:
-        for tag in (post.tags or []):
-            tag_counts[tag] = tag_counts.get(tag, 0) + 1
-    sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:20]
-    return [{"tag": t, "count": c} for t, c in sorted_tags]
+    """Tags ranked by recent use, with a one-day half-life."""
+    return tags.trending_tags(session)
 
 
 @router.get("/posts/mine", response_model=list[PostResponse])
@@ -108,12 +106,7 @@ def my_posts(
         .where(AgentPost.agent_profile_id.in_(agent_ids))  # type: ignore
         .order_by(AgentPost.created_at.desc())
     ).all()
-
-    results = []
-    for post in posts:
-        agent = session.get(AgentProfile, post.agent_profile_id)
-        results.append(_enrich(post, agent))
-    return results
+    return _enrich_many(posts, session)
 
 
 @router.get("/posts/{post_id}", response_model=PostResponse)
@@ -173,6 +166,7 @@ def create_post(
         link_url=data.link_url,
     )
     session.add(post)
+    session.add(activity.hive_post(agent, post))
     session.commit()
     session.refresh(post)
     return _enrich(post, agent)
@@ -3,18 +3,17 @@ Agent Self-Docking API — headless/pilotless agent registration.
 Agents register programmatically; no human UI required.
 """
 
-import hashlib
-import secrets
 import uuid
-from datetime import UTC, datetime
 
 from fastapi import APIRouter, Depends, Header, HTTPException
 from pydantic import BaseModel
 from sqlmodel import Session, select
 
+from .. import activity, agent_keys, presence
 from ..database import get_session
 from ..models import AgentApiKey, AgentPost, AgentProfile, User
-from ..slug import ensure_unique_slug, generate_slug
+from ..slug import flush_with_unique_slug, generate_slug
+from ..stats import record_agent_change
 
 router = APIRouter(tags=["Self-Dock"])
 
@@ -22,37 +21,15 @@ router = APIRouter(tags=["Self-Dock"])
 # ── Helpers ──────────────────────────────────────────────────────────
 
 
-def _hash_key(raw: str) -> str:
-    return hashlib.sha256(raw.encode()).hexdigest()
-
-
-def _generate_agent_key() -> tuple[str, str, str]:
-    """Returns (raw_key, key_hash, key_prefix)."""
-    raw = "swrm_agent_" + secrets.token_urlsafe(32)
-    return raw, _hash_key(raw), raw[:8]
-
-
 def _get_agent_by_key(x_agent_key: str, session: Session) -> AgentProfile:
-    """Authenticate via X-Agent-Key header."""
-    key_hash = _hash_key(x_agent_key)
-    api_key = session.exec(
-        select(AgentApiKey).where(
-            AgentApiKey.key_hash == key_hash,
-            AgentApiKey.is_active == True,  # noqa: E712
-        )
-    ).first()
-    if not api_key:
+    """Authenticate via X-Agent-Key header. Read-only; see agent_keys.py."""
+    snapshot = agent_keys.key_snapshot(x_agent_key, session)
+    if not snapshot:
         raise HTTPException(401, "Invalid or inactive agent key")
 
-    agent = session.get(AgentProfile, api_key.agent_id)
+    agent = session.get(AgentProfile, snapshot.agent_id)
     if not agent or agent.status != "active":
         raise HTTPException(401, "Agent not found or inactive")
-
-    # Update last_used_at
-    api_key.last_used_at = datetime.now(UTC).replace(tzinfo=None)
-    session.add(api_key)
-    session.commit()
-
     return agent
 
 
@@ -109,12 +86,11 @@ def self_dock_agent(
 
     # Create agent profile
     base_slug = generate_slug(data.name)
-    slug = ensure_unique_slug(session, base_slug)
 
     agent = AgentProfile(
         owner_id=agent_uuid,
         name=data.name,
-        slug=slug,
+        slug=base_slug,
         tagline=data.tagline,
         description=data.description,
         category=data.category,
@@ -123,11 +99,11 @@ def self_dock_agent(
         status="active",
         is_docked=True,
     )
-    session.add(agent)
-    session.flush()  # get agent.id
+    flush_with_unique_slug(session, agent, base_slug)  # also assigns agent.id
+    record_agent_change(session, None, agent)
 
     # Generate API key
-    raw_key, key_hash, key_prefix = _generate_agent_key()
+    raw_key, key_hash, key_prefix = agent_keys.generate_agent_key()
     api_key_row = AgentApiKey(
         agent_id=agent.id,
         key_hash=key_hash,
@@ -155,10 +131,11 @@ def self_dock_agent(
 
 @router.get("/agents/{agent_id}/status")
 def agent_status(agent_id: uuid.UUID, session: Session = Depends(get_session)):
-    """Public — returns agent profile summary."""
+    """Public — returns agent profile summary and presence."""
     agent = session.get(AgentProfile, agent_id)
     if not agent:
         raise HTTPException(404, "Agent not found")
+    seen_at = presence.last_seen([agent])[agent.id]
     return {
         "id": str(agent.id),
         "name": agent.name,
@@ -168,7 +145,7 @@ def agent_status(agent_id: uuid.UUID, session: Session = Depends(get_session)):
         "status": agent.status,
         "is_active": agent.status == "active",
         "is_docked": agent.is_docked,
-        "last_seen_at": agent.last_seen_at.isoformat() if agent.last_seen_at else None,
+        **presence.presence_fields(seen_at),
         "created_at": agent.created_at.isoformat(),
     }
 
@@ -196,6 +173,7 @@ def agent_post(
         link_url=data.link_url,
     )
     session.add(post)
+    session.add(activity.hive_post(agent, post))
     session.commit()
     session.refresh(post)
 
@@ -212,16 +190,21 @@ def agent_heartbeat(
     x_agent_key: str = Header(..., alias="X-Agent-Key"),
     session: Session = Depends(get_session),
 ):
-    """Agent-authenticated. Updates last_seen_at on AgentProfile."""
-    agent = _get_agent_by_key(x_agent_key, session)
-    if agent.id != agent_id:
-        raise HTTPException(403, "Key does not match agent")
+    """Agent-authenticated. Marks the agent online (see presence.py).
 
-    agent.last_seen_at = datetime.now(UTC).replace(tzinfo=None)
-    session.add(agent)
-    session.commit()
+    Served from the key cache and presence map: no database writes, and no
+    reads once the key is cached.
+    """
+    snapshot = agent_keys.key_snapshot(x_agent_key, session)
+    if not snapshot:
+        raise HTTPException(401, "Invalid or inactive agent key")
+    if snapshot.agent_status != "active":
+        raise HTTPException(401, "Agent not found or inactive")
+    if snapshot.agent_id != agent_id:
+        raise HTTPException(403, "Key does not match agent")
 
-    return {"status": "ok", "last_seen_at": agent.last_seen_at.isoformat()}
+    seen_at = presence.heartbeat(agent_id)
+    return {"status": "ok", "last_seen_at": seen_at.isoformat()}
 
 
 # ── API Key management (user-authenticated) ───────────────────────────
@@ -260,7 +243,7 @@ def create_agent_api_key(
     if not agent:
         raise HTTPException(404, "Agent not found")
 
-    raw_key, key_hash, key_prefix = _generate_agent_key()
+    raw_key, key_hash, key_prefix = agent_keys.generate_agent_key()
     name = body.get("name", "default")
 
     api_key_row = AgentApiKey(
@@ -295,3 +278,4 @@ def revoke_agent_api_key(
     key.is_active = False
     session.add(key)
     session.commit()
+    agent_keys.forget_key(key.key_hash)
@@ -2,22 +2,32 @@ import uuid
 from datetime import UTC, datetime
 
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, col, select
 
+from .. import activity, blobs, capacity, outbox
 from ..auth import get_current_user, get_optional_user
-from ..config import get_settings
 from ..database import get_session
+from ..loaders import BatchLoader
 from ..models import AgentProfile, Task, TaskEvent, User
 from ..schemas import (
     TaskCreateRequest,
     TaskEventResponse,
     TaskResponse,
+    TaskResultBatch,
     TaskResultCallback,
+    TaskStatusQuery,
+    TaskStatusResponse,
 )
-from ..webhook import dispatch_task_to_agent, verify_callback_signature
+from ..task_results import accepts_result, apply_result, apply_results
+from ..webhook import task_dispatch_body, verify_callback_signature
 
 router = APIRouter(tags=["tasks"])
 
+# Cap on task ids per bulk status query and results per batch callback
+MAX_BATCH = 500
+
 
 def _utcnow() -> datetime:
     return datetime.now(UTC).replace(tzinfo=None)
@@ -31,24 +41,33 @@ def _log_event(
     )
 
 
-def _enrich_task_response(session: Session, task: Task) -> TaskResponse:
+def _enrich_task_response(
+    session: Session, task: Task, loader: BatchLoader | None = None
+) -> TaskResponse:
+    loader = loader or BatchLoader(session)
     resp = TaskResponse.model_validate(task)
-    if task.agent_profile_id:
-        agent = session.get(AgentProfile, task.agent_profile_id)
-        if agent:
-            resp.agent_name = agent.name
-            resp.agent_slug = agent.slug
-    buyer = session.get(User, task.buyer_id)
+    agent = loader.get(AgentProfile, task.agent_profile_id)
+    if agent:
+        resp.agent_name = agent.name
+        resp.agent_slug = agent.slug
+    buyer = loader.get(User, task.buyer_id)
     if buyer:
         resp.buyer_display_name = buyer.display_name or buyer.email
     return resp
 
 
+def _enrich_task_responses(session: Session, tasks: list[Task]) -> list[TaskResponse]:
+    loader = BatchLoader(session)
+    loader.load(AgentProfile, [t.agent_profile_id for t in tasks])
+    loader.load(User, [t.buyer_id for t in tasks])
+    return [_enrich_task_response(session, t, loader) for t in tasks]
+
+
 # ── Create & Dispatch ────────────────────────────────────────────────
 
 
 @router.post("/tasks", response_model=TaskResponse, status_code=201)
-async def create_task(
+def create_task(
     data: TaskCreateRequest,
     user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
@@ -72,9 +91,7 @@ async def create_task(
         agent = session.get(AgentProfile, data.agent_profile_id)
         if not agent or not agent.is_docked:
             raise HTTPException(400, "Agent not found or not docked")
-        if not agent.webhook_url:
-            raise HTTPException(400, "Agent does not have a webhook configured")
-        if agent.active_task_count >= agent.max_concurrent_tasks:
+        if not capacity.reserve(session, agent, task):
             raise HTTPException(429, "Agent is at max capacity")
 
         task.status = "assigned"
@@ -89,41 +106,16 @@ async def create_task(
             "assigned",
             {"agent_id": str(data.agent_profile_id)},
         )
+        session.add(activity.task_started(agent, task))
 
-    session.commit()
-    session.refresh(task)
-
-    # If agent assigned and has webhook, dispatch async
-    if task.agent_profile_id and agent and agent.webhook_url:
-        try:
-            settings = get_settings()
-            callback_url = f"{settings.base_url}/hooks/task-result/{task.id}"
-            result = await dispatch_task_to_agent(
-                webhook_url=agent.webhook_url,
-                webhook_secret_hash=agent.webhook_secret_hash or "",
-                task_id=str(task.id),
-                payload={
-                    "title": task.title,
-                    "description": task.description,
-                    "inputs": task.inputs_json,
-                    "constraints": task.constraints_json,
-                },
-                callback_url=callback_url,
+        # Webhook agents get the task from the outbox dispatcher once this
+        # commits; the others pull it from /agents/{id}/work (work_queue.py)
+        if agent.webhook_url:
+            outbox.enqueue(
+                session, agent, outbox.TASK_DISPATCH, task_dispatch_body(task), task_id=task.id
             )
-            task.status = "dispatched"
-            task.dispatched_at = _utcnow()
-            agent.active_task_count += 1
-            session.add(task)
-            session.add(agent)
-            _log_event(session, task.id, "dispatched", {"response": result})
-            session.commit()
-        except Exception as e:
-            task.status = "dispatch_failed"
-            task.error_message = str(e)
-            session.add(task)
-            _log_event(session, task.id, "dispatch_failed", {"error": str(e)})
-            session.commit()
 
+    session.commit()
     session.refresh(task)
     return _enrich_task_response(session, task)
 
@@ -142,7 +134,7 @@ def list_my_tasks(
         query = query.where(Task.status == status)
     query = query.order_by(col(Task.created_at).desc())
     tasks = session.exec(query).all()
-    return [_enrich_task_response(session, t) for t in tasks]
+    return _enrich_task_responses(session, tasks)
 
 
 # ── Incoming Tasks (creator — tasks on my agents) ────────────────────
@@ -165,7 +157,27 @@ def list_incoming_tasks(
         query = query.where(Task.status == status)
     query = query.order_by(col(Task.created_at).desc())
     tasks = session.exec(query).all()
-    return [_enrich_task_response(session, t) for t in tasks]
+    return _enrich_task_responses(session, tasks)
+
+
+# ── Bulk Status ──────────────────────────────────────────────────────
+
+
+@router.post("/tasks/status", response_model=list[TaskStatusResponse])
+def get_task_statuses(
+    data: TaskStatusQuery,
+    user: User | None = Depends(get_optional_user),
+    session: Session = Depends(get_session),
+):
+    """Status of up to ``MAX_BATCH`` tasks in one query; unknown ids are left out."""
+    if len(data.task_ids) > MAX_BATCH:
+        raise HTTPException(400, f"At most {MAX_BATCH} task ids per request")
+    if not data.task_ids:
+        return []
+    tasks = session.exec(
+        select(Task).where(col(Task.id).in_(set(data.task_ids)))
+    ).all()
+    return [TaskStatusResponse.model_validate(t) for t in tasks]
 
 
 # ── Task Detail ──────────────────────────────────────────────────────
@@ -184,6 +196,34 @@ def get_task(
     return _enrich_task_response(session, task)
 
 
+@router.get("/tasks/{task_id}/result")
+def get_task_result(
+    task_id: uuid.UUID,
+    request: Request,
+    user: User | None = Depends(get_optional_user),
+    session: Session = Depends(get_session),
+):
+    """Full result of a completed task, streamed from the blob store if offloaded."""
+    task = session.get(Task, task_id)
+    if not task:
+        raise HTTPException(404, "Task not found")
+    if task.result_ref is None:
+        if task.result_json is None:
+            raise HTTPException(404, "Task has no result")
+        return task.result_json
+
+    # Stored gzip bytes go out as-is to clients that accept them
+    gzip_ok = "gzip" in request.headers.get("accept-encoding", "")
+    try:
+        body = blobs.stream(task.result_ref, compressed=gzip_ok)
+    except blobs.BlobNotFound:
+        raise HTTPException(404, "Result payload is missing from the blob store")
+    headers = {"Vary": "Accept-Encoding"}
+    if gzip_ok:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type="application/json", headers=headers)
+
+
 # ── Task Events (timeline) ──────────────────────────────────────────
 
 
@@ -257,11 +297,17 @@ def reject_result(
         raise HTTPException(403, "Only the buyer can reject results")
     if task.status != "completed":
         raise HTTPException(400, "Task is not in completed status")
+    if task.deadline <= _utcnow():
+        raise HTTPException(400, "Task deadline has passed")
 
     task.buyer_accepted = False
     task.buyer_feedback = feedback
     task.status = "assigned"  # back to assigned so agent can retry
+    agent = session.get(AgentProfile, task.agent_profile_id) if task.agent_profile_id else None
+    if agent:
+        capacity.reserve(session, agent, task, enforce=False)
     task.result_json = None
+    task.result_ref = None
     task.result_summary = None
     task.completed_at = None
     task.updated_at = _utcnow()
@@ -288,7 +334,8 @@ async def receive_task_result(
     request: Request,
     session: Session = Depends(get_session),
 ):
-    task = session.get(Task, task_id)
+    # Locked so the expiry sweep cannot close the task under us
+    task = session.get(Task, task_id, with_for_update=True)
     if not task:
         raise HTTPException(404, "Task not found")
 
@@ -302,32 +349,66 @@ async def receive_task_result(
     if not verify_callback_signature(body, signature, agent.webhook_secret_hash):
         raise HTTPException(401, "Invalid signature")
 
-    # Update task with results
-    if data.status == "completed":
-        task.status = "completed"
-        task.completed_at = _utcnow()
-        task.result_json = data.result
-        if data.result:
-            task.result_summary = data.result.get("summary")
-            task.execution_time_seconds = data.result.get("execution_time_seconds")
-            task.confidence_score = data.result.get("confidence_score")
-        agent.active_task_count = max(0, agent.active_task_count - 1)
-        agent.tasks_completed += 1
-    elif data.status == "failed":
-        task.status = "failed"
-        task.failed_at = _utcnow()
-        task.error_message = data.error
-        agent.active_task_count = max(0, agent.active_task_count - 1)
+    if not accepts_result(task):
+        return {"status": "skipped"}
 
-    task.updated_at = _utcnow()
-    session.add(task)
-    session.add(agent)
-    _log_event(
-        session,
-        task.id,
-        data.status,
-        {"result": data.result, "error": data.error},
-    )
+    # Large results are compressed and written to the blob store; keep that off the loop
+    await run_in_threadpool(apply_result, session, task, agent, data.status, data.result, data.error)
     session.commit()
 
     return {"status": "received"}
+
+
+@router.post("/hooks/task-results/{agent_id}")
+async def receive_task_results(
+    agent_id: uuid.UUID,
+    data: TaskResultBatch,
+    request: Request,
+    session: Session = Depends(get_session),
+):
+    """Many results from one agent in a single request, signed once over the body.
+
+    Applied in one transaction. Results for tasks that are not this agent's,
+    or that already ended (``task_results.CLOSED_STATUSES``), are skipped and
+    reported back, so a retried batch is harmless.
+    """
+    if len(data.results) > MAX_BATCH:
+        raise HTTPException(400, f"At most {MAX_BATCH} results per request")
+
+    agent = session.get(AgentProfile, agent_id)
+    if not agent or not agent.webhook_secret_hash:
+        raise HTTPException(400, "Agent not found or webhook not configured")
+
+    body = await request.body()
+    signature = request.headers.get("X-Swarm-Signature", "")
+    if not verify_callback_signature(body, signature, agent.webhook_secret_hash):
+        raise HTTPException(401, "Invalid signature")
+
+    tasks = {
+        t.id: t
+        for t in session.exec(
+            select(Task)
+            .where(
+                col(Task.id).in_({r.task_id for r in data.results}),
+                Task.agent_profile_id == agent.id,
+            )
+            .with_for_update()
+        )
+    }
+    outcomes, statuses = [], {}
+    for r in data.results:
+        task = tasks.get(r.task_id)
+        if task is None:
+            statuses[r.task_id] = "not_found"
+        elif not accepts_result(task) or r.task_id in statuses:
+            statuses.setdefault(r.task_id, "skipped")
+        else:
+            outcomes.append((task, r.status, r.result, r.error))
+            statuses[r.task_id] = "received"
+    await run_in_threadpool(apply_results, session, agent, outcomes)
+    session.commit()
+
+    return {
+        "received": len(outcomes),
+        "results": [{"task_id": task_id, "status": s} for task_id, s in statuses.items()],
+    }
@@ -0,0 +1,148 @@
+"""Pull API for agents without a public webhook (see work_queue.py).
+
+All endpoints authenticate with the agent's ``X-Agent-Key``. Lease
+operations take the ``lease_id`` returned by the poll, so a worker whose
+lease expired cannot complete a task another worker has since claimed.
+"""
+
+import asyncio
+import time
+import uuid
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from pydantic import BaseModel
+from sqlmodel import Session
+
+from .. import agent_keys, work_queue
+from ..database import get_engine, get_session
+from ..models import AgentProfile
+from ..push import hub
+from ..task_results import apply_result
+
+router = APIRouter(tags=["Work Queue"])
+
+MAX_WAIT_SECONDS = 30
+# Re-check the queue this often even without a wakeup
+RECHECK_SECONDS = 5.0
+
+
+# ── Schemas ──────────────────────────────────────────────────────────
+
+
+class LeaseRequest(BaseModel):
+    lease_id: uuid.UUID
+
+
+class AckRequest(LeaseRequest):
+    status: str  # completed, failed
+    result: dict | None = None
+    error: str | None = None
+
+
+class ExtendRequest(LeaseRequest):
+    seconds: int = work_queue.DEFAULT_LEASE_SECONDS
+
+
+class NackRequest(LeaseRequest):
+    error: str | None = None
+
+
+# ── Helpers ──────────────────────────────────────────────────────────
+
+
+def _require_agent(x_agent_key: str, agent_id: uuid.UUID, session: Session) -> None:
+    snapshot = agent_keys.key_snapshot(x_agent_key, session)
+    if not snapshot:
+        raise HTTPException(401, "Invalid or inactive agent key")
+    if snapshot.agent_status != "active":
+        raise HTTPException(401, "Agent not found or inactive")
+    if snapshot.agent_id != agent_id:
+        raise HTTPException(403, "Key does not match agent")
+
+
+def _authenticate(x_agent_key: str, agent_id: uuid.UUID) -> None:
+    with Session(get_engine()) as session:
+        _require_agent(x_agent_key, agent_id, session)
+
+
+# ── Endpoints ────────────────────────────────────────────────────────
+
+
+@router.get("/agents/{agent_id}/work")
+async def poll_work(
+    agent_id: uuid.UUID,
+    request: Request,
+    max_tasks: int = Query(1, alias="max", ge=1, le=work_queue.MAX_BATCH),
+    wait: float = Query(25, ge=0, le=MAX_WAIT_SECONDS),
+    lease: int = Query(work_queue.DEFAULT_LEASE_SECONDS, ge=10, le=work_queue.MAX_LEASE_SECONDS),
+    x_agent_key: str = Header(..., alias="X-Agent-Key"),
+):
+    """Claim up to ``max`` tasks, waiting up to ``wait`` seconds for one to arrive."""
+    await asyncio.to_thread(_authenticate, x_agent_key, agent_id)
+
+    # Subscribe before the first claim so a task assigned in between still wakes us
+    sub = hub.subscribe(agent_id)
+    try:
+        deadline = time.monotonic() + wait
+        while True:
+            tasks = await asyncio.to_thread(work_queue.claim, agent_id, max_tasks, lease)
+            remaining = deadline - time.monotonic()
+            if tasks or remaining <= 0 or await request.is_disconnected():
+                return {"tasks": tasks}
+            await sub.get(min(remaining, RECHECK_SECONDS))
+    finally:
+        sub.close()
+
+
+@router.post("/agents/{agent_id}/work/{task_id}/ack")
+def ack_work(
+    agent_id: uuid.UUID,
+    task_id: uuid.UUID,
+    data: AckRequest,
+    x_agent_key: str = Header(..., alias="X-Agent-Key"),
+    session: Session = Depends(get_session),
+):
+    """Report the outcome of a leased task and end the lease."""
+    if data.status not in ("completed", "failed"):
+        raise HTTPException(400, "status must be completed or failed")
+    _require_agent(x_agent_key, agent_id, session)
+    task = work_queue.held_task(session, agent_id, task_id, data.lease_id)
+    agent = session.get(AgentProfile, agent_id)
+    work_queue.end_lease(task)
+    apply_result(session, task, agent, data.status, data.result, data.error)
+    session.commit()
+    return {"status": task.status}
+
+
+@router.post("/agents/{agent_id}/work/{task_id}/extend")
+def extend_work(
+    agent_id: uuid.UUID,
+    task_id: uuid.UUID,
+    data: ExtendRequest,
+    x_agent_key: str = Header(..., alias="X-Agent-Key"),
+    session: Session = Depends(get_session),
+):
+    """Keep holding a task for another ``seconds`` from now."""
+    if not 10 <= data.seconds <= work_queue.MAX_LEASE_SECONDS:
+        raise HTTPException(400, f"seconds must be between 10 and {work_queue.MAX_LEASE_SECONDS}")
+    _require_agent(x_agent_key, agent_id, session)
+    task = work_queue.held_task(session, agent_id, task_id, data.lease_id)
+    work_queue.extend(session, task, data.seconds)
+    session.commit()
+    return {"lease_id": str(task.lease_id), "lease_expires_at": task.leased_until.isoformat()}
+
+
+@router.post("/agents/{agent_id}/work/{task_id}/nack")
+def nack_work(
+    agent_id: uuid.UUID,
+    task_id: uuid.UUID,
+    data: NackRequest,
+    x_agent_key: str = Header(..., alias="X-Agent-Key"),
+    session: Session = Depends(get_session),
+):
+    """Give a leased task back to the queue without a result."""
+    _require_agent(x_agent_key, agent_id, session)
+    task = work_queue.held_task(session, agent_id, task_id, data.lease_id)
+    work_queue.release(session, task, "lease_released", {"error": data.error})
+    session.commit()
+    return {"status": task.status}
@@ -0,0 +1,68 @@
+"""In-process periodic jobs for the API service.
+
+Modules register housekeeping functions with ``@periodic(seconds)``; they are
+started on application startup and run in a worker thread so they never block
+the event loop. Jobs must be idempotent: every API replica runs them.
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PeriodicJob:
+    name: str
+    interval_seconds: float
+    func: Callable[[], None]
+    run_on_startup: bool = True
+
+
+_jobs: list[PeriodicJob] = []
+_running: list[asyncio.Task] = []
+
+
+def periodic(interval_seconds: float, run_on_startup: bool = True):
+    """Register ``func`` to run every ``interval_seconds`` while the API is up."""
+
+    def decorator(func: Callable[[], None]) -> Callable[[], None]:
+        _jobs.append(
+            PeriodicJob(
+                name=f"{func.__module__}.{func.__name__}",
+                interval_seconds=interval_seconds,
+                func=func,
+                run_on_startup=run_on_startup,
+            )
+        )
+        return func
+
+    return decorator
+
+
+async def _run(job: PeriodicJob) -> None:
+    if not job.run_on_startup:
+        await asyncio.sleep(job.interval_seconds)
+    while True:
+        try:
+            await asyncio.to_thread(job.func)
+        except Exception as e:
+            logger.error(f"Periodic job {job.name} failed: {e}")
+        await asyncio.sleep(job.interval_seconds)
+
+
+def start() -> None:
+    if _running:
+        return
+    for job in _jobs:
+        _running.append(asyncio.create_task(_run(job), name=job.name))
+    logger.info(f"Started {len(_running)} periodic job(s)")
+
+
+async def stop() -> None:
+    for task in _running:
+        task.cancel()
+    await asyncio.gather(*_running, return_exceptions=True)
+    _running.clear()
@@ -167,6 +167,7 @@ class ConversationResponse(BaseModel):
     agent_avatar_url: str | None = None
     other_party_name: str | None = None
     last_message_preview: str | None = None
+    last_sender_id: uuid.UUID | None = None
     unread_count: int = 0
 
 
@@ -272,6 +273,7 @@ class TaskResponse(BaseModel):
     completed_at: datetime | None
     failed_at: datetime | None
     result_json: dict | None
+    result_ref: str | None = None  # full result at GET /tasks/{id}/result
     result_summary: str | None
     execution_time_seconds: int | None
     confidence_score: float | None
@@ -304,6 +306,28 @@ class TaskResultCallback(BaseModel):
     error: str | None = None
 
 
+class TaskResultBatch(BaseModel):
+    results: list[TaskResultCallback]
+
+
+class TaskStatusQuery(BaseModel):
+    task_ids: list[uuid.UUID]
+
+
+class TaskStatusResponse(BaseModel):
+    model_config = {"from_attributes": True}
+
+    id: uuid.UUID
+    agent_profile_id: uuid.UUID | None
+    status: str
+    dispatched_at: datetime | None
+    completed_at: datetime | None
+    failed_at: datetime | None
+    result_summary: str | None
+    error_message: str | None
+    updated_at: datetime
+
+
 # ── Posts ─────────────────────────────────────────────────────
 
 
@@ -1,9 +1,12 @@
 import re
 
-from sqlmodel import Session, select
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, col, or_, select
 
 from .models import AgentProfile
 
+SLUG_INSERT_ATTEMPTS = 5
+
 
 def generate_slug(name: str) -> str:
     slug = name.lower().strip()
@@ -13,14 +16,50 @@ def generate_slug(name: str) -> str:
 
 
 def ensure_unique_slug(session: Session, base_slug: str, exclude_id=None) -> str:
-    slug = base_slug
+    """Pick ``base_slug`` or the lowest free ``base_slug-N`` with a single prefix query."""
+    query = select(AgentProfile.slug).where(
+        or_(
+            AgentProfile.slug == base_slug,
+            col(AgentProfile.slug).like(f"{base_slug}-%"),
+        )
+    )
+    if exclude_id:
+        query = query.where(AgentProfile.id != exclude_id)
+    taken = set(session.exec(query).all())
+    if base_slug not in taken:
+        return base_slug
+
+    prefix = f"{base_slug}-"
+    suffixes = {
+        int(s[len(prefix):]) for s in taken if s[len(prefix):].isdigit()
+    }
     counter = 1
-    while True:
-        query = select(AgentProfile).where(AgentProfile.slug == slug)
-        if exclude_id:
-            query = query.where(AgentProfile.id != exclude_id)
-        existing = session.exec(query).first()
-        if not existing:
-            return slug
-        slug = f"{base_slug}-{counter}"
+    while counter in suffixes:
         counter += 1
+    return f"{prefix}{counter}"
+
+
+def flush_with_unique_slug(
+    session: Session, profile: AgentProfile, base_slug: str, exclude_id=None
+) -> None:
+    """Assign a unique slug to ``profile`` and flush it.
+
+    Two requests can pick the same free slug at once; the loser hits the
+    unique constraint inside a SAVEPOINT and retries with a fresh lookup
+    instead of failing the whole transaction. The slug is only set once the
+    SAVEPOINT is open: ``begin_nested`` flushes pending changes first, and a
+    renamed profile is already persistent, so a conflicting slug set earlier
+    would fail outside it.
+    """
+    for attempt in range(SLUG_INSERT_ATTEMPTS):
+        with session.no_autoflush:
+            slug = ensure_unique_slug(session, base_slug, exclude_id)
+        try:
+            with session.begin_nested():
+                profile.slug = slug
+                session.add(profile)
+                session.flush()
+            return
+        except IntegrityError:
+            if attempt == SLUG_INSERT_ATTEMPTS - 1:
+                raise
@@ -0,0 +1,165 @@
+"""Incrementally maintained marketplace statistics.
+
+``category_stats`` holds the number of docked (and featured) agents per
+category so the catalogue pages never aggregate over ``agent_profiles``.
+Agent writes call ``record_agent_change`` inside their own transaction; a
+periodic reconciliation recomputes the table from scratch, under row locks,
+to repair any drift.
+"""
+
+import logging
+from typing import NamedTuple
+
+from sqlalchemy import case, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, func, select
+
+from .cache import invalidate, mark_dirty
+from .database import get_engine
+from .models import AgentProfile, CategoryStat, _utcnow
+from .scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL_SECONDS = 15 * 60
+
+
+class AgentStatKey(NamedTuple):
+    category: str
+    is_docked: bool
+    is_featured: bool
+
+
+def stat_key(profile: AgentProfile | None) -> AgentStatKey | None:
+    """Snapshot the fields that affect statistics, taken before a write."""
+    if profile is None:
+        return None
+    return AgentStatKey(profile.category, bool(profile.is_docked), bool(profile.is_featured))
+
+
+def _bump(session: Session, category: str, docked: int, featured: int) -> None:
+    # Upsert, so two transactions adding the first agent of a new category
+    # cannot both insert the row
+    insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(
+        session.get_bind().dialect.name
+    )
+    if insert is not None:
+        session.execute(
+            insert(CategoryStat)
+            .values(
+                category=category,
+                docked_count=max(docked, 0),
+                featured_count=max(featured, 0),
+                updated_at=_utcnow(),
+            )
+            .on_conflict_do_update(
+                index_elements=["category"],
+                set_={
+                    "docked_count": CategoryStat.docked_count + docked,
+                    "featured_count": CategoryStat.featured_count + featured,
+                    "updated_at": _utcnow(),
+                },
+            )
+        )
+        return
+    result = session.execute(
+        update(CategoryStat)
+        .where(CategoryStat.category == category)
+        .values(
+            docked_count=CategoryStat.docked_count + docked,
+            featured_count=CategoryStat.featured_count + featured,
+            updated_at=_utcnow(),
+        )
+    )
+    if result.rowcount == 0:
+        # First agent in a category the table has not seen yet
+        session.add(
+            CategoryStat(
+                category=category,
+                docked_count=max(docked, 0),
+                featured_count=max(featured, 0),
+            )
+        )
+
+
+def record_agent_change(
+    session: Session, before: AgentStatKey | None, profile: AgentProfile | None
+) -> None:
+    """Apply the stats delta between ``before`` and ``profile``'s current state.
+
+    Call before committing so the counters move in the same transaction as
+    the agent row. ``before`` is None for creates, ``profile`` None for deletes.
+    """
+    after = stat_key(profile)
+    if before == after:
+        return
+
+    deltas: dict[str, list[int]] = {}
+    if before and before.is_docked:
+        d = deltas.setdefault(before.category, [0, 0])
+        d[0] -= 1
+        d[1] -= int(before.is_featured)
+    if after and after.is_docked:
+        d = deltas.setdefault(after.category, [0, 0])
+        d[0] += 1
+        d[1] += int(after.is_featured)
+
+    # Category order, like the reconciler's row locks
+    for category, (docked, featured) in sorted(deltas.items()):
+        if docked or featured:
+            _bump(session, category, docked, featured)
+    mark_dirty(session, "category_stats")
+
+
+def get_category_counts(session: Session) -> dict[str, int]:
+    rows = session.exec(select(CategoryStat.category, CategoryStat.docked_count)).all()
+    return {category: count for category, count in rows}
+
+
+def reconcile_category_stats(session: Session) -> None:
+    """Recompute every category row from ``agent_profiles``.
+
+    The rows are locked before counting: a ``record_agent_change`` that bumped
+    one has then committed its agent write, which the count sees, and any
+    later one waits and applies its delta on top of the recount.
+    """
+    existing = {
+        s.category: s
+        for s in session.exec(
+            select(CategoryStat).order_by(CategoryStat.category).with_for_update()
+        ).all()
+    }
+    rows = session.exec(
+        select(
+            AgentProfile.category,
+            func.count(AgentProfile.id),
+            func.sum(case((AgentProfile.is_featured == True, 1), else_=0)),  # noqa: E712
+        )
+        .where(AgentProfile.is_docked == True)  # noqa: E712
+        .group_by(AgentProfile.category)
+    ).all()
+    actual = {cat: (int(cnt or 0), int(feat or 0)) for cat, cnt, feat in rows}
+
+    now = _utcnow()
+    for category in set(existing) | set(actual):
+        docked, featured = actual.get(category, (0, 0))
+        stat = existing.get(category)
+        if stat is None:
+            session.add(CategoryStat(category=category, docked_count=docked, featured_count=featured))
+        elif (stat.docked_count, stat.featured_count) != (docked, featured):
+            logger.info(
+                f"Reconciled category_stats[{category}]: "
+                f"{stat.docked_count} -> {docked} docked, {stat.featured_count} -> {featured} featured"
+            )
+            stat.docked_count = docked
+            stat.featured_count = featured
+            stat.updated_at = now
+            session.add(stat)
+    session.commit()
+    invalidate("category_stats")
+
+
+@periodic(RECONCILE_INTERVAL_SECONDS)
+def _reconcile_job() -> None:
+    with Session(get_engine()) as session:
+        reconcile_category_stats(session)
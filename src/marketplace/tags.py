@@ -0,0 +1,262 @@
+"""Post tag index and trending tags.
+
+``post_tags`` holds one row per (tag, published post), with the post's
+``created_at`` copied in so a tag's feed is an index range scan. ``tag_stats``
+keeps per-tag post counts and an exponentially decayed trending score. Both
+are maintained by mapper events on ``AgentPost``, so every write path stays
+in step inside its own transaction.
+
+Trending scores use a moving epoch to avoid touching every tag as time
+passes: a post adds ``2 ** ((created_at - epoch) / HALF_LIFE)``, so newer
+posts weigh more and ordering by the stored score is ordering by decayed
+score. An hourly job moves the epoch to now and scales all scores down to
+keep the numbers small.
+"""
+
+import logging
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import event, func, inspect, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, col, delete, select
+
+from .database import get_engine
+from .models import AgentPost, PostTag, RollupWatermark, TagStat, _utcnow
+from .pagination import before_cursor, decode_cursor
+from .scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+HALF_LIFE_SECONDS = 24 * 3600
+EPOCH_MARK = "tag_trend_epoch"
+REBASE_INTERVAL_SECONDS = 3600
+# Tags with no posts left are dropped once their score has decayed this far
+MIN_SCORE = 1e-6
+
+
+def normalise_tags(tags) -> set[str]:
+    return {t.strip() for t in (tags or []) if isinstance(t, str) and t.strip()}
+
+
+def _weight(created_at: datetime, epoch: datetime) -> float:
+    return 2.0 ** ((created_at - epoch).total_seconds() / HALF_LIFE_SECONDS)
+
+
+def _decay(epoch: datetime, now: datetime) -> float:
+    return 2.0 ** (-(now - epoch).total_seconds() / HALF_LIFE_SECONDS)
+
+
+def _insert_for(connection):
+    return {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(connection.dialect.name)
+
+
+def _epoch(connection) -> datetime:
+    query = select(RollupWatermark.rolled_until).where(RollupWatermark.name == EPOCH_MARK)
+    if connection.dialect.name == "postgresql":
+        # Shared lock: writers may run together, but not during a rebase
+        query = query.with_for_update(read=True)
+    epoch = connection.execute(query).scalar()
+    if epoch is None:
+        epoch = _utcnow()
+        insert = _insert_for(connection)
+        if insert is not None:
+            connection.execute(
+                insert(RollupWatermark)
+                .values(name=EPOCH_MARK, rolled_until=epoch)
+                .on_conflict_do_nothing(index_elements=["name"])
+            )
+        else:
+            connection.execute(
+                RollupWatermark.__table__.insert().values(name=EPOCH_MARK, rolled_until=epoch)
+            )
+        epoch = connection.execute(query).scalar()
+    return epoch
+
+
+def _bump_stat(connection, tag: str, count: int, score: float) -> None:
+    insert = _insert_for(connection)
+    if insert is not None:
+        connection.execute(
+            insert(TagStat)
+            .values(tag=tag, post_count=count, trend_score=score)
+            .on_conflict_do_update(
+                index_elements=["tag"],
+                set_={
+                    "post_count": TagStat.post_count + count,
+                    "trend_score": TagStat.trend_score + score,
+                },
+            )
+        )
+        return
+    result = connection.execute(
+        update(TagStat)
+        .where(TagStat.tag == tag)
+        .values(post_count=TagStat.post_count + count, trend_score=TagStat.trend_score + score)
+    )
+    if result.rowcount == 0:
+        connection.execute(
+            TagStat.__table__.insert().values(tag=tag, post_count=count, trend_score=score)
+        )
+
+
+def _index(connection, post: AgentPost, added: set[str], removed: set[str]) -> None:
+    if not added and not removed:
+        return
+    weight = _weight(post.created_at, _epoch(connection))
+    if removed:
+        connection.execute(
+            delete(PostTag).where(PostTag.post_id == post.id, col(PostTag.tag).in_(removed))
+        )
+    if added:
+        connection.execute(
+            PostTag.__table__.insert(),
+            [{"tag": t, "post_id": post.id, "created_at": post.created_at} for t in added],
+        )
+    for tag in sorted(added | removed):  # fixed order avoids lock-order deadlocks
+        sign = 1 if tag in added else -1
+        _bump_stat(connection, tag, sign, sign * weight)
+
+
+def _published_tags(tags, is_published) -> set[str]:
+    return normalise_tags(tags) if is_published else set()
+
+
+@event.listens_for(AgentPost, "after_insert")
+def _post_inserted(mapper, connection, post: AgentPost) -> None:
+    _index(connection, post, _published_tags(post.tags, post.is_published), set())
+
+
+@event.listens_for(AgentPost, "after_update")
+def _post_updated(mapper, connection, post: AgentPost) -> None:
+    state = inspect(post)
+    tags_hist = state.attrs.tags.history
+    published_hist = state.attrs.is_published.history
+    if not tags_hist.has_changes() and not published_hist.has_changes():
+        return
+    before = _published_tags(
+        tags_hist.deleted[0] if tags_hist.deleted else post.tags,
+        published_hist.deleted[0] if published_hist.deleted else post.is_published,
+    )
+    after = _published_tags(post.tags, post.is_published)
+    _index(connection, post, after - before, before - after)
+
+
+# Before the post row goes: post_tags.post_id references it
+@event.listens_for(AgentPost, "before_delete")
+def _post_deleted(mapper, connection, post: AgentPost) -> None:
+    _index(connection, post, set(), _published_tags(post.tags, post.is_published))
+
+
+# ── Reads ────────────────────────────────────────────────────────────
+
+
+def feed_query(tag: str | None = None, cursor: str | None = None):
+    """Published posts newest first, optionally only those tagged ``tag``.
+
+    Pages continue from ``cursor``, as made by ``encode_cursor(post.created_at,
+    post.id)`` for the last post of the previous page.
+    """
+    if tag:
+        ts_col, id_col = PostTag.created_at, PostTag.post_id
+        query = (
+            select(AgentPost)
+            .join(PostTag, PostTag.post_id == AgentPost.id)
+            .where(PostTag.tag == tag.strip())
+        )
+    else:
+        ts_col, id_col = AgentPost.created_at, AgentPost.id
+        query = select(AgentPost).where(AgentPost.is_published == True)  # noqa: E712
+    if cursor:
+        ts, post_id = decode_cursor(cursor)
+        if ts is None:
+            raise HTTPException(400, "Invalid cursor")
+        query = query.where(before_cursor(ts_col, id_col, ts, post_id))
+    return query.order_by(col(ts_col).desc(), col(id_col).desc())
+
+
+def trending_tags(session: Session, limit: int = 20) -> list[dict]:
+    epoch = session.exec(
+        select(RollupWatermark.rolled_until).where(RollupWatermark.name == EPOCH_MARK)
+    ).first()
+    stats = session.exec(
+        select(TagStat)
+        .where(TagStat.post_count > 0)
+        .order_by(col(TagStat.trend_score).desc())
+        .limit(limit)
+    ).all()
+    decay = _decay(epoch, _utcnow()) if epoch else 1.0
+    return [
+        {"tag": s.tag, "count": s.post_count, "score": round(s.trend_score * decay, 4)}
+        for s in stats
+    ]
+
+
+# ── Maintenance ──────────────────────────────────────────────────────
+
+
+def rebuild_tag_index(session: Session) -> int:
+    """Recompute ``post_tags`` and ``tag_stats`` from ``agent_posts``."""
+    now = _utcnow()
+    session.exec(delete(PostTag))
+    session.exec(delete(TagStat))
+    mark = session.get(RollupWatermark, EPOCH_MARK) or RollupWatermark(name=EPOCH_MARK, rolled_until=now)
+    mark.rolled_until = now
+    session.add(mark)
+
+    stats: dict[str, list] = {}
+    rows = []
+    for post_id, tags, created_at in session.exec(
+        select(AgentPost.id, AgentPost.tags, AgentPost.created_at).where(
+            AgentPost.is_published == True  # noqa: E712
+        )
+    ):
+        weight = _weight(created_at, now)
+        for tag in normalise_tags(tags):
+            rows.append({"tag": tag, "post_id": post_id, "created_at": created_at})
+            stat = stats.setdefault(tag, [0, 0.0])
+            stat[0] += 1
+            stat[1] += weight
+    if rows:
+        session.execute(PostTag.__table__.insert(), rows)
+    if stats:
+        session.execute(
+            TagStat.__table__.insert(),
+            [{"tag": t, "post_count": c, "trend_score": s} for t, (c, s) in stats.items()],
+        )
+    session.commit()
+    return len(rows)
+
+
+def ensure_tag_index(session: Session) -> None:
+    """Build the tag index the first time it exists alongside older posts."""
+    has_stats = session.exec(select(func.count()).select_from(TagStat)).one()
+    has_posts = session.exec(select(func.count()).select_from(AgentPost)).one()
+    if has_posts and not has_stats:
+        indexed = rebuild_tag_index(session)
+        logger.info(f"Indexed {indexed} post tag(s)")
+
+
+def rebase_trend_scores(session: Session) -> None:
+    """Move the trending epoch to now, scaling every score to match."""
+    mark = session.exec(
+        select(RollupWatermark).where(RollupWatermark.name == EPOCH_MARK).with_for_update()
+    ).first()
+    if mark is None:
+        return
+    now = _utcnow()
+    session.exec(
+        update(TagStat).values(trend_score=TagStat.trend_score * _decay(mark.rolled_until, now))
+    )
+    session.exec(
+        delete(TagStat).where(TagStat.post_count <= 0, TagStat.trend_score < MIN_SCORE)
+    )
+    mark.rolled_until = now
+    session.add(mark)
+    session.commit()
+
+
+@periodic(REBASE_INTERVAL_SECONDS, run_on_startup=False)
+def _rebase_job() -> None:
+    with Session(get_engine()) as session:
+        rebase_trend_scores(session)
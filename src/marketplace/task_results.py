@@ -0,0 +1,95 @@
+"""Applying an agent's reported outcome to a task.
+
+Shared by the signed webhook callbacks (``/hooks/task-result`` and the
+batched ``/hooks/task-results``) and the pull queue's ack
+(``/agents/{id}/work/{task_id}/ack``).
+"""
+
+import json
+
+from sqlmodel import Session
+
+from . import activity, blobs, capacity
+from .models import AgentProfile, Task, TaskEvent, _utcnow
+
+FINAL_STATUSES = ("completed", "failed")
+# Tasks in these statuses take no more results; late or retried callbacks are skipped
+CLOSED_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def accepts_result(task: Task) -> bool:
+    return task.status not in CLOSED_STATUSES
+
+
+def _record(
+    session: Session,
+    task: Task,
+    agent: AgentProfile,
+    status: str,
+    result: dict | None,
+    error: str | None,
+) -> None:
+    event_data = {"result": result, "error": error}
+    encoded = json.dumps(result).encode() if result else b""
+    offload = blobs.enabled() and len(encoded) > blobs.INLINE_MAX_BYTES
+    ref = blobs.put(encoded) if offload else None
+    if ref:
+        # Keep the row and its event small; the payload is fetched on demand
+        event_data["result"] = {"result_ref": ref, "size_bytes": len(encoded)}
+
+    if status == "completed":
+        task.status = "completed"
+        task.completed_at = _utcnow()
+        task.result_json = None if ref else result
+        task.result_ref = ref
+        if result:
+            task.result_summary = result.get("summary") or (
+                blobs.preview(encoded.decode()) if ref else None
+            )
+            task.execution_time_seconds = result.get("execution_time_seconds")
+            task.confidence_score = result.get("confidence_score")
+        agent.tasks_completed += 1
+        session.add(activity.task_completed(agent, task))
+    elif status == "failed":
+        task.status = "failed"
+        task.failed_at = _utcnow()
+        task.error_message = error
+
+    task.updated_at = _utcnow()
+    session.add(task)
+    session.add(agent)
+    session.add(TaskEvent(task_id=task.id, event_type=status, event_data=event_data))
+
+
+def apply_result(
+    session: Session,
+    task: Task,
+    agent: AgentProfile,
+    status: str,
+    result: dict | None = None,
+    error: str | None = None,
+) -> None:
+    """Record ``status`` (completed, failed, partial) for ``task``; caller commits."""
+    if status in FINAL_STATUSES:
+        capacity.release(session, task)
+    _record(session, task, agent, status, result, error)
+
+
+def apply_results(
+    session: Session,
+    agent: AgentProfile,
+    outcomes: list[tuple[Task, str, dict | None, str | None]],
+) -> None:
+    """``apply_result`` for many of ``agent``'s tasks, which the caller holds locked.
+
+    Slots are given back in one statement and events go out in one insert at
+    flush; the caller commits.
+    """
+    released = 0
+    for task, status, result, error in outcomes:
+        if status in FINAL_STATUSES and task.slot_expires_at is not None:
+            task.slot_expires_at = None
+            released += 1
+        _record(session, task, agent, status, result, error)
+    if released:
+        capacity.release_many(session, {agent.id: released})
@@ -0,0 +1,143 @@
+"""Precomputed trending agents.
+
+A periodic job scores every agent with activity in the last ``WINDOW_DAYS``:
+posts (weighted up by their stars), likes on those posts, hires (licenses
+and assigned tasks) and chat messages from users each add a weight that
+halves every ``HALF_LIFE_HOURS``. Events are counted per agent and hour in
+SQL, then decayed and summed with NumPy, and the scores replace the
+contents of ``agent_trend_scores``. Readers get the ranking from one
+indexed query; it is at most ``RANK_INTERVAL_SECONDS`` stale.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, col, delete, func, select
+
+from .cache import mark_dirty
+from .database import get_engine
+from .earnings import trunc_hour
+from .models import (
+    AgentChatMessage,
+    AgentLicense,
+    AgentPost,
+    AgentPostLike,
+    AgentSession,
+    AgentTrendScore,
+    Task,
+    _utcnow,
+)
+from .scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+RANK_INTERVAL_SECONDS = 300
+WINDOW_DAYS = 14
+HALF_LIFE_HOURS = 48.0
+
+POST_WEIGHT = 3.0
+STAR_WEIGHT = 1.0
+LIKE_WEIGHT = 1.0
+HIRE_WEIGHT = 5.0
+CHAT_WEIGHT = 0.2
+
+
+def _hourly(agent_col, ts_col, amount, *where, joins=()):
+    """(agent_id, hour, amount) rows for events at or after the window start."""
+    hour = trunc_hour(ts_col)
+    query = select(agent_col, hour, amount)
+    for target, on in joins:
+        query = query.join(target, on)
+    return query.where(*where).group_by(agent_col, hour)
+
+
+def _activity_queries(since: datetime) -> list[tuple[float, object]]:
+    P, L, S, M = AgentPost, AgentPostLike, AgentSession, AgentChatMessage
+    published = P.is_published == True  # noqa: E712
+    return [
+        (1.0, _hourly(
+            P.agent_profile_id, P.created_at,
+            func.sum(POST_WEIGHT + STAR_WEIGHT * P.star_count),
+            published, P.created_at >= since,
+        )),
+        (LIKE_WEIGHT, _hourly(
+            P.agent_profile_id, L.created_at, func.count(L.id),
+            published, L.created_at >= since,
+            joins=[(P, P.id == L.post_id)],
+        )),
+        (HIRE_WEIGHT, _hourly(
+            AgentLicense.agent_profile_id, AgentLicense.created_at, func.count(AgentLicense.id),
+            AgentLicense.created_at >= since,
+        )),
+        (HIRE_WEIGHT, _hourly(
+            Task.agent_profile_id, Task.created_at, func.count(Task.id),
+            Task.agent_profile_id != None, Task.created_at >= since,  # noqa: E711
+        )),
+        (CHAT_WEIGHT, _hourly(
+            S.agent_profile_id, M.created_at, func.count(M.id),
+            M.role == "user", M.created_at >= since,
+            joins=[(S, S.id == M.session_id)],
+        )),
+    ]
+
+
+def compute_scores(session: Session, now: datetime) -> dict:
+    """Decayed activity score per agent id."""
+    agent_ids, hours, weights = [], [], []
+    for weight, query in _activity_queries(now - timedelta(days=WINDOW_DAYS)):
+        for agent_id, hour, amount in session.exec(query).all():
+            agent_ids.append(agent_id)
+            hours.append((now - hour).total_seconds() / 3600.0)
+            weights.append(weight * float(amount or 0))
+    if not agent_ids:
+        return {}
+
+    # Events are stamped with the start of their hour; age them from mid-hour
+    ages = np.maximum(np.asarray(hours) - 0.5, 0.0)
+    decayed = np.asarray(weights) * np.exp2(-ages / HALF_LIFE_HOURS)
+    keys, index = np.unique(np.asarray([str(a) for a in agent_ids]), return_inverse=True)
+    totals = np.bincount(index, weights=decayed)
+    by_key = {str(a): a for a in agent_ids}
+    return {by_key[k]: float(t) for k, t in zip(keys, totals) if t > 0}
+
+
+def rank_agents(session: Session) -> int:
+    """Recompute ``agent_trend_scores``. Returns the number of agents ranked."""
+    now = _utcnow()
+    scores = compute_scores(session, now)
+    stars = dict(
+        session.exec(
+            select(AgentPost.agent_profile_id, func.sum(AgentPost.star_count))
+            .where(
+                AgentPost.is_published == True,  # noqa: E712
+                col(AgentPost.agent_profile_id).in_(list(scores)),
+            )
+            .group_by(AgentPost.agent_profile_id)
+        ).all()
+    ) if scores else {}
+
+    session.exec(delete(AgentTrendScore))
+    for agent_id, score in scores.items():
+        session.add(AgentTrendScore(
+            agent_profile_id=agent_id,
+            score=score,
+            star_count=int(stars.get(agent_id) or 0),
+            computed_at=now,
+        ))
+    mark_dirty(session, "agent_trend_scores")
+    session.commit()
+    return len(scores)
+
+
+@periodic(RANK_INTERVAL_SECONDS)
+def _rank_job() -> None:
+    with Session(get_engine()) as session:
+        try:
+            ranked = rank_agents(session)
+        except IntegrityError:
+            # Another replica replaced the ranking at the same time
+            session.rollback()
+            return
+    logger.debug(f"Ranked {ranked} trending agent(s)")
@@ -0,0 +1,318 @@
+"""Vector index of docked agents for semantic search.
+
+Vectors live in a float32 matrix memory-mapped from ``vectors.f32``, so a
+large index sits in the page cache rather than the heap; row bookkeeping and
+document frequencies stay in memory. Each process owns its own scratch copy
+in ``VECTOR_INDEX_DIR/pid-<pid>``, since the memmap is written in place and
+uvicorn workers must not share one. Nothing is reused across restarts: a new
+process rebuilds its index from the database. Scoring is
+cosine similarity computed in row chunks with NumPy, optionally IDF-weighted
+for count-based embedders.
+
+The index follows ``agent_profiles`` incrementally: ``sync`` re-embeds only
+agents whose ``updated_at`` is at or after the last watermark. The watermark
+trails the clock by ``SYNC_SETTLE_SECONDS``, since ``updated_at`` is stamped
+before commit and a slow transaction can land behind a newer one. The first
+query in a process builds the index if the periodic job has not; after that,
+queries only top up the index and never wait on a running sync.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from sqlmodel import Session, col, select
+
+from .config import get_settings
+from .database import get_engine
+from .embeddings import Embedder, agent_document, get_embedder
+from .models import AgentProfile
+from .pagination import after_cursor
+from .scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL_SECONDS = 60
+# Queries re-check for changed profiles at most this often
+QUERY_SYNC_SECONDS = 10
+# Rows stamped this recently may still be uncommitted; re-read them next sync
+SYNC_SETTLE_SECONDS = 5
+SYNC_BATCH_SIZE = 500
+SCORE_CHUNK_ROWS = 65536
+MIN_CAPACITY = 256
+
+
+def is_searchable(agent: AgentProfile) -> bool:
+    return bool(agent.is_docked) and agent.status != "undocked"
+
+
+class AgentVectorIndex:
+    def __init__(self, directory: str | Path, embedder: Embedder):
+        self.directory = Path(directory)
+        self.embedder = embedder
+        self.dim = embedder.dim
+        self._lock = threading.RLock()
+        # Serialises syncs; embedding runs outside _lock so queries are not held up
+        self._sync_lock = threading.Lock()
+        self._vectors_path = self.directory / "vectors.f32"
+
+        self._ids: list[uuid.UUID | None] = []  # row -> agent id; None marks a free row
+        self._rows: dict[uuid.UUID, int] = {}
+        self._free: list[int] = []
+        self._df = np.zeros(self.dim, dtype=np.int64)
+        self._capacity = 0
+        self._vectors: np.memmap | None = None
+        self._norms: np.ndarray | None = None  # cached weighted row norms
+        self.synced_at: datetime | None = None
+        self._last_sync = 0.0  # monotonic time of the last sync in this process
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._reset()
+
+    # ── Storage ──────────────────────────────────────────────────────
+
+    def _reset(self) -> None:
+        self._ids, self._rows, self._free = [], {}, []
+        self._df = np.zeros(self.dim, dtype=np.int64)
+        self._capacity = 0
+        self._vectors = None
+        self._norms = None
+        self.synced_at = None
+        self._vectors_path.unlink(missing_ok=True)
+        self._ensure_capacity(MIN_CAPACITY)
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows <= self._capacity:
+            return
+        new_capacity = max(rows, self._capacity * 2, MIN_CAPACITY)
+        tmp = self._vectors_path.with_suffix(".tmp")
+        grown = np.memmap(tmp, dtype=np.float32, mode="w+", shape=(new_capacity, self.dim))
+        if self._vectors is not None:
+            grown[: len(self._ids)] = self._vectors[: len(self._ids)]
+        grown.flush()
+        del grown
+        self._vectors = None
+        os.replace(tmp, self._vectors_path)
+        self._vectors = np.memmap(
+            self._vectors_path, dtype=np.float32, mode="r+", shape=(new_capacity, self.dim)
+        )
+        self._capacity = new_capacity
+
+    # ── Writes ───────────────────────────────────────────────────────
+
+    def _upsert_rows(self, ids: list[uuid.UUID], vectors: np.ndarray) -> None:
+        for agent_id, vec in zip(ids, vectors):
+            row = self._rows.get(agent_id)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                    self._ids[row] = agent_id
+                else:
+                    row = len(self._ids)
+                    self._ensure_capacity(row + 1)
+                    self._ids.append(agent_id)
+                self._rows[agent_id] = row
+            else:
+                self._df -= self._vectors[row] != 0
+            self._vectors[row] = vec
+            self._df += vec != 0
+        self._norms = None
+
+    def _remove_rows(self, ids: list[uuid.UUID]) -> None:
+        for agent_id in ids:
+            row = self._rows.pop(agent_id, None)
+            if row is None:
+                continue
+            self._df -= self._vectors[row] != 0
+            self._vectors[row] = 0
+            self._ids[row] = None
+            self._free.append(row)
+        self._norms = None
+
+    def _sync(self, session: Session) -> int:
+        settled = datetime.now(UTC).replace(tzinfo=None) - timedelta(seconds=SYNC_SETTLE_SECONDS)
+        query = select(AgentProfile).order_by(col(AgentProfile.updated_at), col(AgentProfile.id))
+        if self.synced_at is not None:
+            # >= so rows sharing the watermark timestamp are never skipped
+            query = query.where(AgentProfile.updated_at >= self.synced_at)
+
+        touched = 0
+        watermark = self.synced_at
+        last = None
+        while True:
+            # Keyset pages: rows updated mid-sync cannot shift others out of view
+            page = query
+            if last is not None:
+                page = page.where(
+                    after_cursor(AgentProfile.updated_at, AgentProfile.id, last.updated_at, last.id)
+                )
+            batch = session.exec(page.limit(SYNC_BATCH_SIZE)).all()
+            if not batch:
+                break
+            last = batch[-1]
+            live = [a for a in batch if is_searchable(a)]
+            vectors = self.embedder.embed([agent_document(a) for a in live]) if live else None
+            with self._lock:
+                if live:
+                    self._upsert_rows([a.id for a in live], vectors)
+                self._remove_rows([a.id for a in batch if not is_searchable(a)])
+            touched += len(batch)
+            watermark = last.updated_at
+
+        if watermark is not None:
+            watermark = min(watermark, settled)
+            if self.synced_at is not None:
+                watermark = max(watermark, self.synced_at)
+        with self._lock:
+            self.synced_at = watermark or datetime.min
+            self._last_sync = time.monotonic()
+        return touched
+
+    def sync(self, session: Session) -> int:
+        """Re-embed agents changed since the last sync. Returns rows touched."""
+        with self._sync_lock:
+            return self._sync(session)
+
+    def sync_if_stale(self, session: Session, max_age: float = QUERY_SYNC_SECONDS) -> None:
+        """Top up the index from a request; skipped while another sync runs.
+
+        An index that has never been built is built here, waiting on any sync
+        already in progress, so search works without the periodic job.
+        """
+        if self.synced_at is None:
+            with self._sync_lock:
+                if self.synced_at is None:
+                    self._sync(session)
+            return
+        if time.monotonic() - self._last_sync < max_age:
+            return
+        if self._sync_lock.acquire(blocking=False):
+            try:
+                self._sync(session)
+            finally:
+                self._sync_lock.release()
+
+    def rebuild(self, session: Session) -> int:
+        with self._sync_lock:
+            with self._lock:
+                self._reset()
+            return self._sync(session)
+
+    # ── Queries ──────────────────────────────────────────────────────
+
+    def _weights(self) -> np.ndarray:
+        if not self.embedder.reweight_idf:
+            return np.ones(self.dim, dtype=np.float32)
+        n_docs = len(self._rows)
+        idf = np.log((1.0 + n_docs) / (1.0 + self._df)) + 1.0
+        return (idf * idf).astype(np.float32)
+
+    def _row_norms(self, weights: np.ndarray) -> np.ndarray:
+        if self._norms is None:
+            n = len(self._ids)
+            norms = np.empty(n, dtype=np.float32)
+            for start in range(0, n, SCORE_CHUNK_ROWS):
+                block = self._vectors[start : min(start + SCORE_CHUNK_ROWS, n)]
+                norms[start : start + len(block)] = np.sqrt((block * block) @ weights)
+            self._norms = norms
+        return self._norms
+
+    def _top_k(
+        self, queries: np.ndarray, k: int, exclude: list[uuid.UUID | None]
+    ) -> list[list[tuple[uuid.UUID, float]]]:
+        """Cosine top-k for each row of ``queries`` against every indexed agent."""
+        n = len(self._ids)
+        if n == 0 or not self._rows:
+            return [[] for _ in range(len(queries))]
+
+        weights = self._weights()
+        weighted = queries * weights  # (q, dim)
+        q_norms = np.sqrt(np.einsum("ij,ij->i", queries, weighted))
+        row_norms = self._row_norms(weights)
+
+        scores = np.empty((len(queries), n), dtype=np.float32)
+        for start in range(0, n, SCORE_CHUNK_ROWS):
+            block = self._vectors[start : min(start + SCORE_CHUNK_ROWS, n)]
+            scores[:, start : start + len(block)] = weighted @ block.T
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores /= np.outer(q_norms, row_norms)
+        scores[~np.isfinite(scores)] = 0.0
+        if self._free:
+            scores[:, self._free] = -np.inf
+
+        results = []
+        for qi, skip in enumerate(exclude):
+            row_scores = scores[qi]
+            if skip is not None and skip in self._rows:
+                row_scores[self._rows[skip]] = -np.inf
+            kk = min(k, n)
+            top = np.argpartition(-row_scores, kk - 1)[:kk]
+            top = top[np.argsort(-row_scores[top])]
+            results.append(
+                [(self._ids[r], float(row_scores[r])) for r in top if row_scores[r] > 0]
+            )
+        return results
+
+    def query_many(self, texts: list[str], k: int = 10) -> list[list[tuple[uuid.UUID, float]]]:
+        queries = self.embedder.embed(texts)
+        with self._lock:
+            return self._top_k(queries, k, [None] * len(texts))
+
+    def query(self, text: str, k: int = 10) -> list[tuple[uuid.UUID, float]]:
+        return self.query_many([text], k)[0]
+
+    def similar(self, agent: AgentProfile, k: int = 5) -> list[tuple[uuid.UUID, float]]:
+        with self._lock:
+            row = self._rows.get(agent.id)
+            if row is not None:
+                vector = np.array(self._vectors[row : row + 1])
+            else:
+                vector = self.embedder.embed([agent_document(agent)])
+            return self._top_k(vector, k, [agent.id])[0]
+
+
+_index: AgentVectorIndex | None = None
+_index_lock = threading.Lock()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _prune_stale_dirs(root: Path) -> None:
+    """Remove copies left by processes that have exited."""
+    for path in root.glob("pid-*"):
+        pid = path.name.removeprefix("pid-")
+        if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def get_agent_index() -> AgentVectorIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            root = Path(get_settings().vector_index_dir)
+            _prune_stale_dirs(root)
+            _index = AgentVectorIndex(root / f"pid-{os.getpid()}", get_embedder())
+        return _index
+
+
+@periodic(SYNC_INTERVAL_SECONDS)
+def _sync_job() -> None:
+    with Session(get_engine()) as session:
+        touched = get_agent_index().sync(session)
+    if touched:
+        logger.info(f"Vector index synced {touched} agent(s)")
@@ -6,6 +6,9 @@ from datetime import UTC, datetime
 
 import httpx
 
+from .config import get_settings
+from .models import Task
+
 
 def generate_webhook_secret() -> tuple[str, str, str]:
     """Returns (full_secret, prefix_for_display, hash_for_storage)."""
@@ -28,38 +31,20 @@ def verify_callback_signature(
     return hmac.compare_digest(expected, signature)
 
 
-async def dispatch_task_to_agent(
-    webhook_url: str,
-    webhook_secret_hash: str,
-    task_id: str,
-    payload: dict,
-    callback_url: str,
-) -> dict:
-    """Send task to agent's webhook. Returns response or raises."""
-    body = json.dumps(
-        {
-            "task_id": task_id,
-            "task_type": "execute",
-            "payload": payload,
-            "callback_url": callback_url,
-            "timestamp": datetime.now(UTC).isoformat(),
-        }
-    )
-    body_bytes = body.encode()
-    signature = sign_payload(body_bytes, webhook_secret_hash)
-
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.post(
-            webhook_url,
-            content=body_bytes,
-            headers={
-                "Content-Type": "application/json",
-                "X-Swarm-Signature": signature,
-                "X-Swarm-Task-Id": task_id,
-            },
-        )
-        response.raise_for_status()
-        return response.json()
+def task_dispatch_body(task: Task) -> dict:
+    """Webhook body asking an agent to run ``task``; outbox.py adds ``timestamp``."""
+    return {
+        "task_id": str(task.id),
+        "task_type": "execute",
+        "payload": {
+            "title": task.title,
+            "description": task.description,
+            "inputs": task.inputs_json,
+            "constraints": task.constraints_json,
+        },
+        "callback_url": f"{get_settings().base_url}/hooks/task-result/{task.id}",
+        "batch_callback_url": f"{get_settings().base_url}/hooks/task-results/{task.agent_profile_id}",
+    }
 
 
 async def ping_webhook(webhook_url: str, webhook_secret_hash: str) -> bool:
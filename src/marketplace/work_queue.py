@@ -0,0 +1,154 @@
+"""Pull-based task delivery for agents without a public webhook.
+
+Tasks assigned to an agent wait in ``assigned`` (A2A tasks from before they
+were created that way may still sit in ``posted`` with an agent set). The agent long-polls
+``GET /agents/{id}/work`` (routers/work.py), which claims up to N of them
+with ``FOR UPDATE SKIP LOCKED`` and leases each to the caller: the task
+becomes ``dispatched`` with a fresh ``lease_id`` and ``leased_until``. The
+holder then acks with the result, extends the lease while it works, or nacks
+to hand the task back. Leases that run out are returned to ``assigned`` by a
+sweeper, so a crashed worker only delays its tasks.
+
+Any change that makes a task claimable publishes ``work.available`` through
+push.py, addressed to the agent id, which wakes the agent's pending long
+polls on every replica.
+"""
+
+import logging
+import uuid
+from datetime import timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import event, exists, inspect
+from sqlalchemy.orm import object_session
+from sqlmodel import Session, select
+
+from . import push
+from .database import get_engine
+from .models import Task, TaskEvent, WebhookDelivery, _utcnow
+from .scheduler import periodic
+from .webhook import task_dispatch_body
+
+logger = logging.getLogger(__name__)
+
+WORK_EVENT = "work.available"
+DEFAULT_LEASE_SECONDS = 300
+MAX_LEASE_SECONDS = 3600
+MAX_BATCH = 10
+SWEEP_INTERVAL_SECONDS = 15
+SWEEP_BATCH_SIZE = 500
+# Agent-bound tasks in these statuses are waiting to be pulled
+_WAITING_STATUSES = ("posted", "assigned")
+
+
+@event.listens_for(Task, "after_insert")
+@event.listens_for(Task, "after_update")
+def _announce_work(mapper, connection, task: Task) -> None:
+    history = inspect(task).attrs.status.history
+    session = object_session(task)
+    if history.has_changes() and task.status == "assigned" and task.agent_profile_id and session:
+        push.publish(session, [task.agent_profile_id], WORK_EVENT, {"task_id": task.id})
+
+
+def _log(session: Session, task: Task, event_type: str, data: dict) -> None:
+    session.add(TaskEvent(task_id=task.id, event_type=event_type, event_data=data))
+
+
+def claim(agent_id: uuid.UUID, limit: int, lease_seconds: int) -> list[dict]:
+    """Lease up to ``limit`` waiting tasks to the caller, oldest first."""
+    now = _utcnow()
+    pending_webhook = exists().where(
+        WebhookDelivery.task_id == Task.id, WebhookDelivery.status == "pending"
+    )
+    with Session(get_engine()) as session:
+        tasks = session.exec(
+            select(Task)
+            .where(
+                Task.agent_profile_id == agent_id,
+                Task.status.in_(_WAITING_STATUSES),
+                ~pending_webhook,
+            )
+            .order_by(Task.created_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        claimed = []
+        for task in tasks:
+            task.status = "dispatched"
+            task.dispatched_at = task.dispatched_at or now
+            task.lease_id = uuid.uuid4()
+            task.leased_until = now + timedelta(seconds=lease_seconds)
+            task.updated_at = now
+            session.add(task)
+            _log(session, task, "leased", {"lease_id": str(task.lease_id)})
+            claimed.append({
+                **task_dispatch_body(task),
+                "lease_id": str(task.lease_id),
+                "lease_expires_at": task.leased_until.isoformat(),
+            })
+        session.commit()
+    return claimed
+
+
+def held_task(
+    session: Session, agent_id: uuid.UUID, task_id: uuid.UUID, lease_id: uuid.UUID
+) -> Task:
+    """The task under a live lease ``lease_id``, locked for update."""
+    task = session.exec(select(Task).where(Task.id == task_id).with_for_update()).first()
+    if not task or task.agent_profile_id != agent_id:
+        raise HTTPException(404, "Task not found")
+    if (
+        task.status != "dispatched"
+        or task.lease_id != lease_id
+        or task.leased_until is None
+        or task.leased_until < _utcnow()
+    ):
+        raise HTTPException(409, "Lease expired or held by another worker")
+    return task
+
+
+def end_lease(task: Task) -> None:
+    task.lease_id = None
+    task.leased_until = None
+
+
+def extend(session: Session, task: Task, seconds: int) -> None:
+    task.leased_until = _utcnow() + timedelta(seconds=seconds)
+    session.add(task)
+
+
+def release(session: Session, task: Task, reason: str, data: dict | None = None) -> None:
+    """Put a leased task back in the queue for the next poll."""
+    end_lease(task)
+    task.status = "assigned"
+    task.updated_at = _utcnow()
+    session.add(task)
+    _log(session, task, reason, data or {})
+
+
+def requeue_expired(session: Session, limit: int = SWEEP_BATCH_SIZE) -> int:
+    """Return up to ``limit`` tasks whose lease ran out to the queue. Returns tasks requeued."""
+    expired = session.exec(
+        select(Task)
+        .where(Task.status == "dispatched", Task.leased_until < _utcnow())
+        .order_by(Task.leased_until)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    for task in expired:
+        release(session, task, "lease_expired", {"lease_id": str(task.lease_id)})
+    session.commit()
+    return len(expired)
+
+
+@periodic(SWEEP_INTERVAL_SECONDS)
+def _requeue_job() -> None:
+    requeued = 0
+    with Session(get_engine()) as session:
+        while True:
+            n = requeue_expired(session)
+            requeued += n
+            if n < SWEEP_BATCH_SIZE:
+                break
+    if requeued:
+        logger.info(f"Requeued {requeued} task(s) with expired leases")
@@ -5,7 +5,9 @@ Runs as a separate Railway service.
 Start command: python src/worker.py
 """
 import os
+import json
 import time
+import uuid
 import logging
 from datetime import datetime, timezone, timedelta
 
@@ -15,6 +17,8 @@ import openai
 import anthropic
 import resend
 
+from marketplace import blobs
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -30,6 +34,27 @@ def get_db():
     return psycopg2.connect(DATABASE_URL, cursor_factory=psycopg2.extras.RealDictCursor)
 
 
+# Same channel and payload shape as marketplace/push.py
+PUSH_CHANNEL = "swarm_events"
+
+
+def push_notification(cur, user_id, notification: dict):
+    """Notify connected API clients of a new notification when the transaction commits."""
+    payload = {
+        "id": str(uuid.uuid4()),
+        "user_ids": [str(user_id)],
+        "type": "notification.created",
+        "data": {
+            "id": str(notification["id"]),
+            "type": notification["type"],
+            "title": notification["title"],
+            "job_id": str(notification["job_id"]) if notification.get("job_id") else None,
+            "created_at": notification["created_at"].isoformat(),
+        },
+    }
+    cur.execute("SELECT pg_notify(%s, %s)", (PUSH_CHANNEL, json.dumps(payload)))
+
+
 def run_agent(agent: dict, job: dict) -> str:
     """Execute the agent's LLM call with the user's config as context."""
     system_prompt = agent.get("system_prompt", "You are a helpful AI agent.")
@@ -193,6 +218,7 @@ def process_job(job: dict, db):
                 """
                 INSERT INTO notifications (user_id, job_id, type, title, body)
                 VALUES (%s, %s, 'low_balance', 'Agent paused — low balance', %s)
+                RETURNING id, job_id, type, title, created_at
                 """,
                 (
                     job["user_id"],
@@ -200,18 +226,27 @@ def process_job(job: dict, db):
                     f'Your agent "{agent["name"]}" was paused because your balance is too low. Add funds to resume.',
                 ),
             )
+            push_notification(cur, job["user_id"], cur.fetchone())
             db.commit()
             logger.warning(f"Job {job_id} paused due to insufficient credits")
             return
 
+        # With a shared blob store configured, large outputs go there and the
+        # row keeps a reference and a preview; otherwise they stay inline
+        stored_result, result_ref = result, None
+        if blobs.enabled() and len(result.encode()) > blobs.INLINE_MAX_BYTES:
+            result_ref = blobs.put(result.encode())
+            stored_result = blobs.preview(result, 500)
+
         # Mark run as completed
         cur.execute(
             """
             UPDATE job_runs
-            SET status = 'completed', result = %s, completed_at = NOW(), credits_charged = %s
+            SET status = 'completed', result = %s, result_ref = %s, completed_at = NOW(),
+                credits_charged = %s
             WHERE id = %s
             """,
-            (result, credits_to_charge, run_id),
+            (stored_result, result_ref, credits_to_charge, run_id),
         )
 
         # Update job stats
@@ -239,11 +274,12 @@ def process_job(job: dict, db):
             )
 
         # Create in-app notification
-        result_preview = result[:200] + ("..." if len(result) > 200 else "")
+        result_preview = blobs.preview(result)
         cur.execute(
             """
             INSERT INTO notifications (user_id, job_id, job_run_id, type, title, body)
             VALUES (%s, %s, %s, 'job_result', %s, %s)
+            RETURNING id, job_id, type, title, created_at
             """,
             (
                 job["user_id"],
@@ -253,6 +289,7 @@ def process_job(job: dict, db):
                 result_preview,
             ),
         )
+        push_notification(cur, job["user_id"], cur.fetchone())
 
         db.commit()
         logger.info(f"Job {job_id} completed successfully, charged {credits_to_charge} credits")
@@ -0,0 +1,50 @@
+import os
+
+os.environ.setdefault("BACKGROUND_JOBS_ENABLED", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import create_engine
+
+from marketplace.database import set_engine
+from marketplace.main import app
+
+
+@pytest.fixture(name="engine")
+def engine_fixture(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False}
+    )
+
+    # Enforce foreign keys the way Postgres does
+    @event.listens_for(engine, "connect")
+    def _foreign_keys(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    set_engine(engine)
+    yield engine
+    set_engine(None)
+    engine.dispose()
+
+
+@pytest.fixture(name="client")
+def client_fixture(engine):
+    with TestClient(app) as c:
+        yield c
+
+
+# ── helpers ───────────────────────────────────────────────────────────
+
+
+def register_user(client: TestClient, email: str = "user@test.com") -> dict:
+    """Register a user and return auth headers."""
+    r = client.post("/auth/register", json={"email": email, "password": "password123"})
+    assert r.status_code in (200, 201), r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+def create_agent(client: TestClient, headers: dict, name: str = "Bot") -> str:
+    r = client.post("/agents", json={"name": name, "category": "research"}, headers=headers)
+    assert r.status_code in (200, 201), r.text
+    return r.json()["id"]
@@ -0,0 +1,37 @@
+"""Response cache invalidation (cache.py)."""
+import uuid
+
+from sqlmodel import Session
+
+from marketplace import cache
+from marketplace.models import AgentProfile, User
+from tests.conftest import create_agent, register_user
+
+
+def test_counter_writes_keep_cached_agent(client, engine):
+    cache.clear()
+    headers = register_user(client)
+    agent_id = uuid.UUID(create_agent(client, headers))
+    etag = client.get("/agents/bot").headers["ETag"]
+
+    with Session(engine) as session:
+        agent = session.get(AgentProfile, agent_id)
+        agent.tasks_completed += 1
+        agent.total_earned_credits += 5
+        owner = session.get(User, agent.owner_id)
+        owner.credit_balance += 5
+        session.add_all([agent, owner])
+        session.commit()
+
+    r = client.get("/agents/bot", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+
+    with Session(engine) as session:
+        agent = session.get(AgentProfile, agent_id)
+        agent.tagline = "Now with a tagline"
+        session.add(agent)
+        session.commit()
+
+    r = client.get("/agents/bot", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()["tagline"] == "Now with a tagline"
@@ -0,0 +1,24 @@
+"""Unique slug allocation (slug.py)."""
+from marketplace import slug
+from tests.conftest import create_agent, register_user
+
+
+def test_rename_retries_slug_taken_concurrently(client, monkeypatch):
+    headers = register_user(client)
+    create_agent(client, headers, name="Bot")
+    agent_id = create_agent(client, headers, name="Other")
+
+    # The first lookup misses "bot", as if the other agent committed after it ran
+    lookup = slug.ensure_unique_slug
+    calls = []
+
+    def racing_lookup(session, base_slug, exclude_id=None):
+        calls.append(base_slug)
+        return base_slug if len(calls) == 1 else lookup(session, base_slug, exclude_id)
+
+    monkeypatch.setattr(slug, "ensure_unique_slug", racing_lookup)
+
+    r = client.patch(f"/agents/{agent_id}", json={"name": "Bot"}, headers=headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["slug"] == "bot-1"
+    assert len(calls) == 2
@@ -0,0 +1,25 @@
+"""Tag index maintenance (tags.py)."""
+from sqlmodel import Session, select
+
+from marketplace.models import PostTag, TagStat
+from tests.conftest import create_agent, register_user
+
+
+def test_delete_tagged_post(client, engine):
+    headers = register_user(client)
+    agent_id = create_agent(client, headers)
+    r = client.post(
+        "/posts",
+        json={"agent_profile_id": agent_id, "content": "hello", "tags": ["python", "ml"]},
+        headers=headers,
+    )
+    assert r.status_code == 201, r.text
+    post_id = r.json()["id"]
+
+    r = client.delete(f"/posts/{post_id}", headers=headers)
+    assert r.status_code == 204
+
+    with Session(engine) as session:
+        assert session.exec(select(PostTag)).all() == []
+        counts = {s.tag: s.post_count for s in session.exec(select(TagStat))}
+    assert counts == {"python": 0, "ml": 0}